@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+
+"""
+benchmark.py
+
+Micro-benchmarks for the Jiten-pai dictionary code, run against
+synthetic dictionary files.  No network access or installed dictionaries
+are needed: EDICT, kanjidic and kanjidic2.xml files of the requested
+sizes are generated deterministically from a seed.
+
+With --replay, the searches recorded in a query log are run instead,
+against the dictionaries named in the log.
+
+This file is part of Jiten-pai.
+
+Copyright (c) 2021 Urban Wallasch <irrwahn35@freenet.de>
+
+Jiten-pai is distributed under the Modified ("3-clause") BSD License.
+See `LICENSE` file for more information.
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import random
+import platform
+import tempfile
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+import edict
+from edict import eprint, die, ScanMode
+
+_BENCH_VERSION = 1
+
+
+############################################################
+# synthetic dictionary files
+#
+# Entries are random, but only the shape matters: headwords of 1-4 kanji,
+# kana readings, a few glosses drawn from a small English vocabulary and
+# the usual word class tags.  The same seed and size always yield the
+# same file.
+
+_GEN_HIRA = ''.join(chr(c) for c in range(ord('ぁ'), ord('ゖ') + 1))
+_GEN_KATA = ''.join(chr(c) for c in range(ord('ァ'), ord('ヶ') + 1))
+_GEN_KANJI = '日本語学生先火水木金土山川田中人大小上下時間食飲行来見話書読高安新古長出入体心手目口耳足力'
+_GEN_WORDS = ('heart mind spirit water fire tree gold earth mountain river field middle person big '
+              'small up down time interval eat drink go come see talk write read high cheap new '
+              'old long exit enter body hand eye mouth ear foot power study school teacher').split()
+_GEN_TAGS = ['(n)', '(n,vs)', '(v1,vt)', '(v5k,vt)', '(v5r,vi)', '(v5m,vt)', '(adj-i)', '(adj-na)', '(adv)', '(exp)']
+_GEN_ROMAJI = ('a i u e o ka ki ku ke ko sa shi su se so ta chi tsu te to na ni nu ne no '
+               'ha hi fu he ho ma mi mu me mo ya yu yo ra ri ru re ro wa n ga gi gu ge go '
+               'za ji zu ze zo da de do ba bi bu be bo pa pi pu pe po kya kyu kyo sha shu sho '
+               'cha chu cho').split()
+
+def _gen_kana(rnd, lo, hi, chars=_GEN_HIRA):
+    return ''.join(rnd.choice(chars) for _ in range(rnd.randint(lo, hi)))
+
+def _gen_kanji(rnd, lo, hi):
+    return ''.join(rnd.choice(_GEN_KANJI) for _ in range(rnd.randint(lo, hi)))
+
+def _gen_gloss(rnd, lo, hi):
+    return ' '.join(rnd.choice(_GEN_WORDS) for _ in range(rnd.randint(lo, hi)))
+
+def _gen_edict(fname, size, seed):
+    rnd = random.Random(seed)
+    with open(fname, 'w') as f:
+        f.write('　？？？ /EDICT, synthetic benchmark data/\n')
+        for i in range(size):
+            reading = _gen_kana(rnd, 2, 6)
+            if rnd.random() < 0.15:
+                # katakana word without reading
+                line = '%s /' % _gen_kana(rnd, 2, 6, _GEN_KATA)
+            else:
+                hw = _gen_kanji(rnd, 1, 4)
+                if rnd.random() < 0.1:
+                    hw += ';' + _gen_kanji(rnd, 1, 4) + '(oK)'
+                line = '%s [%s] /' % (hw, reading)
+            glosses = [_gen_gloss(rnd, 1, 4) for _ in range(rnd.randint(1, 4))]
+            line += '%s %s%s/EntL%07dX/\n' % (rnd.choice(_GEN_TAGS), '(P) ' if rnd.random() < 0.2 else '',
+                                              '/'.join(glosses), 1000000 + i)
+            f.write(line)
+
+def _gen_kanjidic1(fname, size, seed):
+    rnd = random.Random(seed)
+    with open(fname, 'w') as f:
+        f.write('# KANJIDIC JIS X 0208 Kanji Information File, synthetic benchmark data\n')
+        for i in range(size):
+            kanji = chr(0x4e00 + i % 0x5200)
+            line = '%s %04X U%x B%d G%d S%d F%d N%d Y%s W%s %s %s T1 %s {%s} {%s}\n' % (
+                kanji, 0x3021 + i % 0x5e00, ord(kanji), rnd.randint(1, 214), rnd.randint(1, 10),
+                rnd.randint(1, 30), rnd.randint(1, 2500), rnd.randint(1, 5000),
+                rnd.choice(_GEN_ROMAJI), rnd.choice(_GEN_ROMAJI),
+                _gen_kana(rnd, 1, 3, _GEN_KATA), _gen_kana(rnd, 1, 4) + '.' + _gen_kana(rnd, 1, 2),
+                _gen_kana(rnd, 2, 3), rnd.choice(_GEN_WORDS), _gen_gloss(rnd, 1, 3))
+            f.write(line)
+
+def _gen_kanjidic2(fname, size, seed):
+    rnd = random.Random(seed)
+    with open(fname, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kanjidic2>\n')
+        for i in range(size):
+            kanji = chr(0x4e00 + i % 0x5200)
+            f.write('<character>\n<literal>%s</literal>\n'
+                    '<misc>\n<grade>%d</grade>\n<stroke_count>%d</stroke_count>\n<freq>%d</freq>\n</misc>\n'
+                    '<reading_meaning>\n<rmgroup>\n'
+                    '<reading r_type="pinyin">%s</reading>\n<reading r_type="korean_r">%s</reading>\n'
+                    '<reading r_type="ja_on">%s</reading>\n<reading r_type="ja_kun">%s</reading>\n'
+                    '<meaning>%s</meaning>\n<meaning>%s</meaning>\n<meaning m_lang="fr">%s</meaning>\n'
+                    '</rmgroup>\n<nanori>%s</nanori>\n</reading_meaning>\n</character>\n' % (
+                    kanji, rnd.randint(1, 10), rnd.randint(1, 30), rnd.randint(1, 2500),
+                    rnd.choice(_GEN_ROMAJI), rnd.choice(_GEN_ROMAJI),
+                    _gen_kana(rnd, 1, 3, _GEN_KATA), _gen_kana(rnd, 1, 4),
+                    rnd.choice(_GEN_WORDS), _gen_gloss(rnd, 1, 3), rnd.choice(_GEN_WORDS),
+                    _gen_kana(rnd, 2, 3)))
+        f.write('</kanjidic2>\n')
+
+_GEN_FILES = {
+    # format: 'kind': (generator, file name pattern)
+    'edict': (_gen_edict, 'edict-%d-%d.utf8'),
+    'kanjidic1': (_gen_kanjidic1, 'kanjidic-%d-%d.utf8'),
+    'kanjidic2': (_gen_kanjidic2, 'kanjidic2-%d-%d.xml'),
+}
+
+# generate a file unless an identical one is already present in datadir
+def _gen_file(datadir, kind, size, seed):
+    gen, pattern = _GEN_FILES[kind]
+    fname = os.path.join(datadir, pattern % (size, seed))
+    if not os.access(fname, os.R_OK):
+        t = time.perf_counter()
+        gen(fname + '.tmp', size, seed)
+        os.replace(fname + '.tmp', fname)
+        eprint('generated %s (%.1f s)' % (fname, time.perf_counter() - t))
+    return fname
+
+
+############################################################
+# measurement
+#
+# Single calls of the cheaper functions take about a microsecond, so
+# these are timed in batches of consecutive calls, and each batch yields
+# one per call latency sample.  Whole file loads are one sample each.
+
+def _percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+def _stats(samples, ops, elapsed):
+    samples = sorted(samples)
+    return {
+        'ops': ops,
+        'seconds': round(elapsed, 6),
+        'ops_per_sec': round(ops / elapsed, 1) if elapsed else None,
+        'p50_us': round(_percentile(samples, 50) * 1e6, 3),
+        'p90_us': round(_percentile(samples, 90) * 1e6, 3),
+        'p99_us': round(_percentile(samples, 99) * 1e6, 3),
+        'max_us': round(samples[-1] * 1e6, 3),
+    }
+
+# call func(arg) for every arg, in batches of batch calls
+def _bench_calls(func, args, batch):
+    clock = time.perf_counter
+    samples = []
+    t0 = clock()
+    for i in range(0, len(args), batch):
+        chunk = args[i:i + batch]
+        t = clock()
+        for a in chunk:
+            func(a)
+        samples.append((clock() - t) / len(chunk))
+    return _stats(samples, len(args), clock() - t0)
+
+# call func() repeat times; ops: number of items processed per call
+def _bench_runs(func, repeat, ops):
+    clock = time.perf_counter
+    samples = []
+    for _ in range(repeat):
+        t = clock()
+        func()
+        samples.append(clock() - t)
+    return _stats(samples, ops * repeat, sum(samples))
+
+
+############################################################
+# benchmarks
+#
+# Each one takes the benchmark context and returns a stats dict, or
+# raises _BenchSkip.
+
+class _BenchSkip(Exception):
+    pass
+
+def _bench_split_line(ctx):
+    with open(ctx['edict']) as f:
+        lines = f.readlines()[1:]
+    return _bench_calls(edict._dict_split_line, lines, ctx['batch'])
+
+def _bench_dict_matches(ctx):
+    rnd = random.Random(ctx['seed'])
+    entries = edict._dict_parse(ctx['edict'])
+    items = [(e,) + edict._dict_entry_keys(e) for e in entries]
+    queries = []
+    for i in range(ctx['queries']):
+        if i % 2:
+            term, mode = rnd.choice(_GEN_WORDS), ScanMode.ENG
+            opt = rnd.randint(0, 2)
+        else:
+            term, mode = _gen_kana(rnd, 1, 3), ScanMode.JAP
+            opt = rnd.randint(0, 3)
+        queries.append((edict._search_apply_options(term, mode, opt), mode))
+    # full scans, no result limit
+    return _bench_calls(lambda q: edict._dict_matches(items, q[0], q[1], 0), queries, 1)
+
+def _bench_vconj_deinflect(ctx):
+    if not edict._vconj_ready():
+        raise _BenchSkip('vconj.utf8 not found')
+    rnd = random.Random(ctx['seed'])
+    suffixes = [v.conj for v in edict._vconj_deinf if not re.search(r'[^\w]', v.conj)]
+    # unique words, so the de-inflection memo never hits
+    words = list(dict.fromkeys(_gen_kanji(rnd, 1, 2) + _gen_kana(rnd, 0, 2) + rnd.choice(suffixes)
+                               for _ in range(ctx['samples'])))
+    edict._vconj_memo.clear()
+    res = _bench_calls(edict._vconj_deinflect, words, ctx['batch'])
+    edict._vconj_memo.clear()
+    return res
+
+def _bench_alphabet2kana(ctx):
+    rnd = random.Random(ctx['seed'])
+    words = [''.join(rnd.choice(_GEN_ROMAJI) for _ in range(rnd.randint(1, 5))) for _ in range(ctx['samples'])]
+    return _bench_calls(edict.alphabet2kana, words, ctx['batch'])
+
+def _bench_kata2hira(ctx):
+    rnd = random.Random(ctx['seed'])
+    words = [_gen_kana(rnd, 1, 10, _GEN_KATA + _GEN_KANJI) for _ in range(ctx['samples'])]
+    return _bench_calls(edict.kata2hira, words, ctx['batch'])
+
+def _bench_kanjidic1_load(ctx):
+    def run():
+        edict._kanjidic.clear()
+        edict._kanjidic1_load(ctx['kanjidic1'])
+    return _bench_runs(run, ctx['repeat'], ctx['size'])
+
+def _bench_kanjidic2_load(ctx):
+    def run():
+        edict._kanjidic.clear()
+        edict._kanjidic2_load(ctx['kanjidic2'])
+    return _bench_runs(run, ctx['repeat'], ctx['size'])
+
+def _bench_rad_load(ctx):
+    if not edict._rad_load(2):
+        raise _BenchSkip('radkfile/kradfile not found')
+    return _bench_runs(lambda: edict._rad_load(2), ctx['repeat'], len(edict._krad))
+
+_BENCHES = {
+    # format: 'name': (function, data files needed, scales with size)
+    'split_line': (_bench_split_line, ['edict'], True),
+    'dict_matches': (_bench_dict_matches, ['edict'], True),
+    'vconj_deinflect': (_bench_vconj_deinflect, [], False),
+    'alphabet2kana': (_bench_alphabet2kana, [], False),
+    'kata2hira': (_bench_kata2hira, [], False),
+    'kanjidic1_load': (_bench_kanjidic1_load, ['kanjidic1'], True),
+    'kanjidic2_load': (_bench_kanjidic2_load, ['kanjidic2'], True),
+    'rad_load': (_bench_rad_load, [], False),
+}
+
+
+############################################################
+# query log replay
+#
+# Each logged search is repeated, and its median time taken as the
+# query's latency.  Dictionaries are loaded up front (unless configured
+# not to), the query result cache is off, and the narrowing and
+# de-inflection memos are cleared before each run, so that every run
+# times a cold lookup.
+
+def _replay_word(rec):
+    opts = rec['options']
+    edict.cfg['deinflect'] = opts.get('deinflect', edict.cfg['deinflect'])
+    term, mode = edict._search_term(rec['term'], opts.get('romaji', False))
+    job = edict.lookupJob(term, mode, opts['opt'], rec['dicts'], opts['limit'], opts['auto'])
+    result = edict._search_lookup(job) or []
+    return sum(1 for r in result if r.headword != '#')
+
+def _replay_kanji_search(rec):
+    opts = rec['options']
+    return len(edict._kanjidic_search(rec['dicts'][0], opts['strokes'], opts['radicals'], opts['text']))
+
+def _replay_kanji_info(rec):
+    return 1 if edict._kanjidic_lookup(rec['term']) else 0
+
+_REPLAY = {
+    # format: 'kind': function(record) returning the result count
+    'word': _replay_word,
+    'kanji_search': _replay_kanji_search,
+    'kanji_info': _replay_kanji_info,
+}
+
+# load all dictionaries used in the log
+def _replay_prepare(recs):
+    t = time.perf_counter()
+    edict._load_cfg()
+    edict.cfg['query_cache'] = 0
+    edict._dict_set_load(edict.cfg['dict_load'])
+    edict._vconj_ready()
+    kdics = set()
+    for rec in recs:
+        if rec['kind'] == 'word':
+            if edict.cfg['dict_load']:
+                for d in rec['dicts']:
+                    edict._dict_load(d[1])
+        else:
+            kdics.update(rec['dicts'])
+    if kdics:
+        # there is only one kanjidic at a time
+        ok, _, krad_set = edict._kanjidic_load(sorted(kdics)[0])
+        if not ok or not edict._rad_load(krad_set):
+            eprint('_replay_prepare: kanji searches will fail')
+    return time.perf_counter() - t
+
+def _replay(args):
+    recs = []
+    try:
+        with open(args.replay, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    recs.append(json.loads(line))
+    except Exception as e:
+        eprint('_replay:', args.replay, str(e))
+        die(1)
+    load_time = _replay_prepare(recs)
+    clock = time.perf_counter
+    queries = []
+    samples = {}
+    for rec in recs:
+        q = {'kind': rec['kind'], 'term': rec['term'], 'logged_count': rec['count'], 'logged_ms': rec['timing']}
+        func = _REPLAY.get(rec['kind'])
+        try:
+            if func is None:
+                raise _BenchSkip('unknown kind')
+            times = []
+            for _ in range(args.repeat):
+                edict._dict_narrow.clear()
+                edict._vconj_memo.clear()
+                t = clock()
+                q['count'] = func(rec)
+                times.append(clock() - t)
+            q['ms'] = round(sorted(times)[len(times) // 2] * 1000, 3)
+            samples.setdefault(rec['kind'], []).append(q['ms'] / 1000)
+        except _BenchSkip as e:
+            q['skipped'] = str(e)
+        queries.append(q)
+    results = {}
+    for kind, smp in samples.items():
+        res = _stats(smp, len(smp), sum(smp))
+        res['size'] = None
+        results['replay_' + kind] = [res]
+        _print_result('replay_' + kind, res)
+    changed = [q for q in queries if 'count' in q and q['count'] != q['logged_count']]
+    print('%d queries replayed, %d skipped, %d with a different result count; dictionaries loaded in %.2f s'
+          % (len(queries), sum(1 for q in queries if 'skipped' in q), len(changed), load_time))
+    for q in changed[:20]:
+        print('  %-12s %-20s logged %d, now %d' % (q['kind'], q['term'], q['logged_count'], q['count']))
+    return {
+        'version': _BENCH_VERSION,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': _git_rev(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {'replay': args.replay, 'repeat': args.repeat},
+        'results': results,
+        'queries': queries,
+    }
+
+
+############################################################
+# running and comparing
+
+def _git_rev():
+    try:
+        head = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.git', 'HEAD')
+        with open(head) as f:
+            ref = f.read().strip()
+        if ref.startswith('ref: '):
+            with open(os.path.join(os.path.dirname(head), ref[5:])) as f:
+                ref = f.read().strip()
+        return ref
+    except Exception:
+        return None
+
+def _run(args, datadir):
+    names = args.only.split(',') if args.only else list(_BENCHES)
+    for name in names:
+        if name not in _BENCHES:
+            eprint('unknown benchmark:', name)
+            die(2)
+    results = {}
+    for size in args.sizes:
+        ctx = {
+            'size': size,
+            'seed': args.seed,
+            'samples': args.samples,
+            'queries': args.queries,
+            'batch': args.batch,
+            'repeat': args.repeat,
+        }
+        for name in names:
+            func, files, scales = _BENCHES[name]
+            # size independent benchmarks run only once
+            if not scales and name in results:
+                continue
+            for kind in files:
+                if kind not in ctx:
+                    ctx[kind] = _gen_file(datadir, kind, size, args.seed)
+            try:
+                res = func(ctx)
+            except _BenchSkip as e:
+                res = {'skipped': str(e)}
+            res['size'] = size if scales else None
+            results.setdefault(name, []).append(res)
+            _print_result(name, res)
+    return {
+        'version': _BENCH_VERSION,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': _git_rev(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {k: getattr(args, k) for k in ('sizes', 'seed', 'samples', 'queries', 'batch', 'repeat')},
+        'results': results,
+    }
+
+def _print_header():
+    print('%-20s %9s %12s %10s %10s %10s' % ('benchmark', 'size', 'ops/s', 'p50 us', 'p90 us', 'p99 us'))
+
+def _print_result(name, res):
+    size = res['size'] if res['size'] is not None else '-'
+    if 'skipped' in res:
+        print('%-20s %9s   skipped: %s' % (name, size, res['skipped']))
+    else:
+        print('%-20s %9s %12.1f %10.2f %10.2f %10.2f' % (name, size, res['ops_per_sec'] or 0,
+              res['p50_us'], res['p90_us'], res['p99_us']))
+    sys.stdout.flush()
+
+# print throughput of new relative to old, per benchmark and size, and
+# for replays the queries that got slower by more than threshold percent
+def _compare(old_fname, new_fname, threshold):
+    try:
+        with open(old_fname) as f:
+            old = json.load(f)
+        with open(new_fname) as f:
+            new = json.load(f)
+    except Exception as e:
+        eprint('_compare:', str(e))
+        return False
+    print('%-20s %9s %12s %12s %8s %10s' % ('benchmark', 'size', 'old ops/s', 'new ops/s', 'change', 'p50 change'))
+    for name, nres in new['results'].items():
+        ores = {r['size']: r for r in old['results'].get(name, [])}
+        for n in nres:
+            o = ores.get(n['size'])
+            size = n['size'] if n['size'] is not None else '-'
+            if o is None or 'skipped' in o or 'skipped' in n:
+                print('%-20s %9s %12s' % (name, size, 'n/a'))
+                continue
+            print('%-20s %9s %12.1f %12.1f %+7.1f%% %+9.1f%%' % (name, size, o['ops_per_sec'], n['ops_per_sec'],
+                  (n['ops_per_sec'] / o['ops_per_sec'] - 1) * 100, (n['p50_us'] / o['p50_us'] - 1) * 100))
+    oq, nq = old.get('queries', []), new.get('queries', [])
+    if not oq or not nq:
+        return True
+    if [(q['kind'], q['term']) for q in oq] != [(q['kind'], q['term']) for q in nq]:
+        eprint('_compare: results are from different query logs')
+        return True
+    slower = []
+    for i, (o, n) in enumerate(zip(oq, nq)):
+        if 'ms' in o and 'ms' in n and n['ms'] > o['ms'] * (1 + threshold / 100) and n['ms'] - o['ms'] >= 0.1:
+            slower.append((n['ms'] / o['ms'], i, o, n))
+    print('%d of %d queries more than %g%% slower' % (len(slower), len(nq), threshold))
+    for ratio, i, o, n in sorted(slower, key=lambda x: x[0], reverse=True)[:20]:
+        print('  #%-5d %-12s %-20s %10.3f ms %10.3f ms %+7.1f%%' % (i, n['kind'], n['term'], o['ms'], n['ms'], (ratio - 1) * 100))
+    return True
+
+
+############################################################
+# main function
+
+def _parse_cmdline():
+    parser = ArgumentParser(
+        formatter_class=lambda prog: RawTextHelpFormatter(prog, max_help_position=40),
+        description='Jiten-pai micro-benchmarks',
+        epilog='Benchmarks: %s\n'
+               'Data files are generated in a temporary directory unless --data is given.\n' % ', '.join(_BENCHES)
+    )
+    parser.add_argument('-s', '--sizes', metavar='N[,N...]', default='10000,100000',
+                        type=lambda s: [int(n) for n in s.split(',')], help='dictionary sizes (default: %(default)s)')
+    parser.add_argument('--only', metavar='NAME[,NAME...]', help='run only the named benchmarks')
+    parser.add_argument('--seed', metavar='N', type=int, default=1, help='data generator seed (default: %(default)s)')
+    parser.add_argument('--samples', metavar='N', type=int, default=20000, help='calls per function benchmark (default: %(default)s)')
+    parser.add_argument('--queries', metavar='N', type=int, default=100, help='queries per dict_matches run (default: %(default)s)')
+    parser.add_argument('--batch', metavar='N', type=int, default=100, help='calls per latency sample (default: %(default)s)')
+    parser.add_argument('--repeat', metavar='N', type=int, default=3, help='runs per file load benchmark (default: %(default)s)')
+    parser.add_argument('--data', metavar='DIR', help='keep and reuse generated data files in DIR')
+    parser.add_argument('-o', '--output', metavar='FILE', help='save results as JSON to FILE')
+    parser.add_argument('--compare', metavar='FILE', nargs=2, help='compare two saved results and exit')
+    parser.add_argument('--threshold', metavar='PCT', type=float, default=25, help='replayed query slow-down to report (default: %(default)s)')
+    parser.add_argument('--replay', metavar='LOG', help='replay the searches in query log LOG instead')
+    return parser.parse_args()
+
+def _main():
+    args = _parse_cmdline()
+    if args.compare:
+        die(0 if _compare(args.compare[0], args.compare[1], args.threshold) else 1)
+    _print_header()
+    if args.replay:
+        res = _replay(args)
+    elif args.data:
+        os.makedirs(args.data, exist_ok=True)
+        res = _run(args, args.data)
+    else:
+        with tempfile.TemporaryDirectory(prefix='jiten-pai-bench-') as datadir:
+            res = _run(args, datadir)
+    if args.output:
+        try:
+            with open(args.output, 'w') as f:
+                json.dump(res, f, indent=1)
+        except Exception as e:
+            eprint('_main:', args.output, str(e))
+            die(1)
+
+if __name__== "__main__":
+    _main()
+
+# EOF
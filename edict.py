@@ -0,0 +1,2966 @@
+#!/usr/bin/env python3
+
+"""
+edict.py
+
+This file is part of Jiten-pai.
+
+Copyright (c) 2021 Urban Wallasch <irrwahn35@freenet.de>
+
+Contributors:
+    volpol
+
+Jiten-pai is distributed under the Modified ("3-clause") BSD License.
+See `LICENSE` file for more information.
+"""
+
+
+_JITENPAI_DIR = 'jiten-pai'
+_JITENPAI_CFG = 'jiten-pai.conf'
+_JITENPAI_VCONJ = 'vconj.utf8'
+_JITENPAI_CACHE = 'jiten-pai.cache'
+_JITENPAI_RADK = ['radkfile.utf8', 'radkfile2.utf8']
+_JITENPAI_KRAD = ['kradfile.utf8', 'kradfile2.utf8']
+
+import sys
+
+if sys.version_info < (3, 6):
+    raise Exception ('Need Python version 3.6 or later, got version ' + str(sys.version))
+
+import os
+import re
+import json
+import unicodedata
+import enum
+import threading
+import bisect
+import heapq
+import hashlib
+import marshal
+import mmap
+import struct
+import time
+import socket
+import socketserver
+import tempfile
+import contextlib
+from array import array
+from itertools import accumulate
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+############################################################
+# utility functions and classes
+
+def die(rc=0):
+    sys.exit(rc)
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+# Note: we only test for common CJK ideographs
+_u_CJK_Uni = r'\u4e00-\u9FFF'
+_u_CJK_Kana = r'\u3040-\u30ff'
+_u_CJK_FullHalf = r'\uFF00-\uFFEF'
+
+_re_kanji = re.compile('^[' + _u_CJK_Uni + ']$')
+_re_jap = re.compile('[' + _u_CJK_Uni + _u_CJK_Kana + _u_CJK_FullHalf + ']')
+
+# test, if a single character /might/ be a kanji
+def _is_kanji(s):
+    return _re_kanji.match(s)
+
+# test, if a string contains any common Japanese characters
+def _has_jap(s):
+    return _re_jap.search(s)
+
+class ScanMode(enum.Enum):
+    JAP = 1
+    ENG = 2
+
+# regex fragments used to anchor Japanese search terms at the start and
+# end of a (possibly multi-headword) dictionary field
+_TERM_START = r'(^|;)'
+_TERM_END = r'(\(.+?\))?(;|$)'
+
+# regex fragments used to match English search terms as whole expressions
+# or whole words in the gloss
+_EXPR_START = r'\W( to)? '
+_EXPR_END = r'(\s+\(.*\))?;'
+_WORD_BOUND = r'\b'
+
+
+############################################################
+# configuration
+
+cfg = {
+    'kanjidic': '/usr/local/share/jiten-pai/kanjidic',
+    'dicts': [
+        ['edict2', '/usr/local/share/jiten-pai/edict2'],
+    ],
+    'dict_load': True,
+    'dict_idx': 0,
+    'dict_all': False,
+    'limit': 100,
+    'do_limit': True,
+    'auto_adj': True,
+    'jap_opt': [True, False, False, False],
+    'eng_opt': [True, False, False],
+    'romaji': False,
+    'nfont': 'sans',
+    'nfont_sz': 12.0,
+    'lfont': 'IPAPMincho',
+    'lfont_sz': 24.0,
+    'hl_col': 'blue',
+    'deinflect': False,
+    'live_search': False,
+    # saved, but not editable from GUI:
+    'hardlimit': 10000,
+    'deinflect_depth': 4,
+    'deinflect_max': 64,
+    'inflect_index': False,
+    'live_delay': 300,
+    'query_cache': 500,
+    'query_cache_save': False,
+    'dict_cache': True,
+    'query_log': '',
+    'max_hist': 12,
+    'history': [],
+    # not saved, run-time only:
+    'cfgfile': None,
+}
+
+def _get_cfile_path(fname, mode=os.R_OK):
+    # try to find a suitable configuration file / prefix
+    cdirs = []
+    if os.environ.get('APPDATA'):
+        cdirs.append(os.environ.get('APPDATA'))
+    if os.environ.get('XDG_CONFIG_HOME'):
+        cdirs.append(os.environ.get('XDG_CONFIG_HOME'))
+    if os.environ.get('HOME'):
+        cdirs.append(os.path.join(os.environ.get('HOME'), '.config'))
+    cdirs.append(os.path.dirname(os.path.realpath(__file__)))
+    for d in cdirs:
+        path = os.path.join(d, fname)
+        if os.access(path, mode):
+            return path
+    return fname
+
+def _save_cfg():
+    s_cfg = cfg.copy()
+    s_cfg.pop('cfgfile', None)
+    if cfg['cfgfile']:
+        try:
+            with open(cfg['cfgfile'], 'w') as cfgfile:
+                json.dump(s_cfg, cfgfile, indent=2)
+                return
+        except Exception as e:
+            eprint('_save_cfg:', cfg['cfgfile'], str(e))
+    cfgdir = _get_cfile_path('', mode=os.R_OK | os.W_OK | os.X_OK)
+    cfname = os.path.join(cfgdir, _JITENPAI_CFG)
+    try:
+        with open(cfname, 'w') as cfgfile:
+            json.dump(s_cfg, cfgfile, indent=2)
+            cfg['cfgfile'] = cfname
+            return
+    except Exception as e:
+        eprint('_save_cfg:', cfname, str(e))
+
+def _load_cfg():
+    cfname = _get_cfile_path('', mode=os.R_OK)
+    cfname = os.path.join(cfname, _JITENPAI_CFG)
+    try:
+        with open(cfname, 'r') as cfgfile:
+            cfg.update(json.load(cfgfile))
+            cfg['cfgfile'] = cfname
+    except Exception as e:
+        eprint('_load_cfg:', cfname, str(e))
+    global _dict_lookup
+    _dict_lookup = _dict_lookup_load if cfg['dict_load'] else _dict_lookup_noload
+
+
+############################################################
+# verb de-inflection
+
+Vtype = namedtuple('Vtype', 'wclass label')
+Vconj = namedtuple('Vconj', 'regex conj infi rule')
+
+_vconj_type = dict()  # format: { rule_no: (wclass, label), ... }
+_vconj_deinf = []     # format: [ (regex, conj, infinitve, rule_no), ... ]
+_vconj_suffix = dict()  # format: { conj: [ index_into_vconj_deinf, ... ], ... }
+_vconj_other = []     # format: [ index_into_vconj_deinf, ... ]
+_vconj_maxlen = 0
+_vconj_loaded = False
+_vconj_tried = False
+_vconj_lock = threading.Lock()
+
+def _get_dfile_path(fname, mode=os.R_OK):
+    # try to locate a data file in some common prefixes:
+    cdirs = []
+    if os.environ.get('APPDATA'):
+        cdirs.append(os.environ.get('APPDATA'))
+    if os.environ.get('HOME'):
+        cdirs.append(os.path.join(os.environ.get('HOME'), '.local/share'))
+    cdirs.append('/usr/local/share')
+    cdirs.append('/usr/share')
+    cdirs.append(os.path.dirname(os.path.realpath(__file__)))
+    for d in cdirs:
+        path = os.path.join(d, fname)
+        if os.access(path, mode):
+            return path
+    return fname
+
+# load and parse VCONJ rule file
+def _vconj_load():
+    global _vconj_loaded
+    t = time.perf_counter()
+    vcname = _JITENPAI_VCONJ
+    if not os.access(vcname, os.R_OK):
+        vcname = _get_dfile_path(os.path.join(_JITENPAI_DIR, _JITENPAI_VCONJ), mode=os.R_OK)
+    try:
+        with open(vcname) as vcfile:
+            re_type = re.compile(r'^(\d+)\s+"(\S+)"\s+(.+)$')
+            re_deinf = re.compile(r'^\s*([^#\s]+)\s+(\S+)\s+(\d+)\s*$')
+            for line in vcfile:
+                match = re_type.match(line)
+                if match:
+                    wclass = re.compile(r'(\((.+?,)*?)' + match.group(2))
+                    _vconj_type[int(match.group(1))] = Vtype(wclass, match.group(3))
+                    continue
+                match = re_deinf.match(line)
+                if match:
+                    regex = re.compile('%s$' % match.group(1))
+                    _vconj_deinf.append(Vconj(regex, match.group(1), match.group(2), int(match.group(3))))
+                    continue
+        _vconj_index()
+        _vconj_memo.clear()
+        _vconj_loaded = len(_vconj_deinf) > 0
+    except Exception as e:
+        eprint('_vconj_load:', vcname, str(e))
+    _mem_load_time['_vconj_deinf'] = time.perf_counter() - t
+
+# load the rule file on first use, from whichever thread gets there first;
+# returns whether de-inflection is available
+def _vconj_ready():
+    global _vconj_tried
+    with _vconj_lock:
+        if not (_vconj_tried or _vconj_loaded):
+            _vconj_tried = True
+            _vconj_load()
+    return _vconj_loaded
+
+# characters that keep a conjugated suffix from being a literal string
+_re_vconj_meta = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+# index rules by their (literal) conjugated suffix, so a verb only needs
+# one dictionary probe per suffix length; rules using regex syntax are
+# kept aside and still tried one by one
+def _vconj_index():
+    global _vconj_maxlen
+    _vconj_suffix.clear()
+    _vconj_other.clear()
+    _vconj_maxlen = 0
+    for idx, deinf in enumerate(_vconj_deinf):
+        if not _re_vconj_meta.search(deinf.conj) and '\\' not in deinf.infi:
+            _vconj_suffix.setdefault(deinf.conj, []).append(idx)
+            _vconj_maxlen = max(_vconj_maxlen, len(deinf.conj))
+        else:
+            _vconj_other.append(idx)
+
+# collect inflection rules potentially applicable to a verb(-candidate)
+Vinf = namedtuple('Vinf', 'infi blurb wclass')
+
+_vconj_memo = dict()  # format: { verb: [ Vinf, ... ], ... }
+_VCONJ_MEMO_MAX = 4096
+
+# apply single rules, format: [ (index_into_vconj_deinf, verb_inf), ... ]
+def _vconj_step(verb):
+    hits = []
+    for n in range(1, min(len(verb), _vconj_maxlen) + 1):
+        for idx in _vconj_suffix.get(verb[-n:], ()):
+            deinf = _vconj_deinf[idx]
+            hits.append((idx, verb[:-n] + deinf.infi))
+    for idx in _vconj_other:
+        deinf = _vconj_deinf[idx]
+        hits.append((idx, deinf.regex.sub(deinf.infi, verb)))
+    # report in rule file order
+    hits.sort()
+    return [(idx, verb_inf) for idx, verb_inf in hits if verb_inf != verb]
+
+# an intermediate form produced by rule 'outer' may only be deinflected
+# further by rule 'inner' if 'inner' applies to the word class of that
+# form, as told by the dictionary form ending 'outer' produces: -い makes
+# an adjective (食べない, 行きたい), anything else a verb
+def _vconj_chains(outer, inner):
+    tag = '(adj-i)' if _vconj_deinf[outer].infi.endswith('い') else '(v5)'
+    return _vconj_type[_vconj_deinf[inner].rule].wclass.search(tag) is not None
+
+# chain rules breadth-first, so single-step candidates come first and in
+# rule file order, followed by those needing two steps, and so on; the
+# search is bounded by cfg['deinflect_depth'] steps and cfg['deinflect_max']
+# candidates; the word class of a chained candidate is the one of its
+# innermost rule, as that produced the dictionary form
+def _vconj_deinflect(verb):
+    inf = _vconj_memo.get(verb)
+    if inf is not None:
+        return inf
+    depth = max(1, cfg['deinflect_depth'])
+    budget = max(1, cfg['deinflect_max'])
+    inf = []
+    seen = set()
+    level = [(verb, ())]
+    for _ in range(depth):
+        chained = []
+        for form, chain in level:
+            for idx, verb_inf in _vconj_step(form):
+                if chain and not _vconj_chains(chain[-1], idx):
+                    continue
+                key = (verb_inf, _vconj_deinf[idx].rule)
+                if chain and key in seen:
+                    continue
+                seen.add(key)
+                chain_inf = chain + (idx,)
+                blurb = '; '.join(['%s %s → %s' % (_vconj_type[_vconj_deinf[i].rule].label,
+                                                  _vconj_deinf[i].conj, _vconj_deinf[i].infi)
+                                   for i in chain_inf])
+                wclass = _vconj_type[_vconj_deinf[idx].rule].wclass
+                inf.append(Vinf(verb_inf, blurb, wclass))
+                chained.append((verb_inf, chain_inf))
+                if len(inf) >= budget:
+                    break
+            if len(inf) >= budget:
+                break
+        level = chained
+        if not level or len(inf) >= budget:
+            break
+    if len(_vconj_memo) >= _VCONJ_MEMO_MAX:
+        _vconj_memo.clear()
+    _vconj_memo[verb] = inf
+    return inf
+
+############################################################
+# Katakana -> Hiragana <- Romaji conversion code adapted from:
+#   https://github.com/ikegami-yukino/jaconv
+#   Copyright (c) 2014 Yukino Ikegami
+#   MIT License
+
+HIRAGANA = list('ぁあぃいぅうぇえぉおかがきぎくぐけげこごさざしじすず'
+                'せぜそぞただちぢっつづてでとどなにぬねのはばぱひびぴ'
+                'ふぶぷへべぺほぼぽまみむめもゃやゅゆょよらりるれろわ'
+                'をんーゎゐゑゕゖゔゝゞ・「」。、')
+
+FULL_KANA = list('ァアィイゥウェエォオカガキギクグケゲコゴサザシジスズセゼソ'
+                 'ゾタダチヂッツヅテデトドナニヌネノハバパヒビピフブプヘベペ'
+                 'ホボポマミムメモャヤュユョヨラリルレロワヲンーヮヰヱヵヶヴ'
+                 'ヽヾ・「」。、')
+
+HEPBURN = list('aiueoaiueon')
+HEPBURN_KANA = list('ぁぃぅぇぉあいうえおん')
+
+def _to_ord_list(chars):
+    return list(map(ord, chars))
+
+def _to_dict(_from, _to):
+    return dict(zip(_from, _to))
+
+K2H_TABLE = _to_dict(_to_ord_list(FULL_KANA), HIRAGANA)
+HEP2KANA = _to_dict(_to_ord_list(HEPBURN), HEPBURN_KANA)
+
+del _to_ord_list
+del _to_dict
+del HIRAGANA
+del FULL_KANA
+del HEPBURN
+del HEPBURN_KANA
+
+def kata2hira(text):
+    return text.translate(K2H_TABLE)
+
+def alphabet2kana(text):
+    # replace final h with う, e.g., Itoh -> いとう
+    ending_h_pattern = re.compile(r'h$')
+    text = re.sub(ending_h_pattern, 'う', text)
+
+    text = text.replace('kya', 'きゃ').replace('kyi', 'きぃ').replace('kyu', 'きゅ')
+    text = text.replace('kye', 'きぇ').replace('kyo', 'きょ')
+    text = text.replace('gya', 'ぎゃ').replace('gyi', 'ぎぃ').replace('gyu', 'ぎゅ')
+    text = text.replace('gye', 'ぎぇ').replace('gyo', 'ぎょ')
+    text = text.replace('sha', 'しゃ').replace('shu', 'しゅ').replace('she', 'しぇ')
+    text = text.replace('sho', 'しょ')
+    text = text.replace('sya', 'しゃ').replace('syi', 'しぃ').replace('syu', 'しゅ')
+    text = text.replace('sye', 'しぇ').replace('syo', 'しょ')
+    text = text.replace('zya', 'じゃ').replace('zyu', 'じゅ').replace('zyo', 'じょ')
+    text = text.replace('zyi', 'じぃ').replace('zye', 'じぇ')
+    text = text.replace('ja', 'じゃ').replace('ju', 'じゅ').replace('jo', 'じょ')
+    text = text.replace('jya', 'じゃ').replace('jyi', 'じぃ').replace('jyu', 'じゅ')
+    text = text.replace('jye', 'じぇ').replace('jyo', 'じょ')
+    text = text.replace('dya', 'ぢゃ').replace('dyi', 'ぢぃ').replace('dyu', 'ぢゅ')
+    text = text.replace('dye', 'ぢぇ').replace('dyo', 'ぢょ')
+    text = text.replace('cha', 'ちゃ').replace('chu', 'ちゅ').replace('che', 'ちぇ')
+    text = text.replace('cho', 'ちょ')
+    text = text.replace('cya', 'ちゃ').replace('cyi', 'ちぃ').replace('cyu', 'ちゅ')
+    text = text.replace('cye', 'ちぇ').replace('cyo', 'ちょ')
+    text = text.replace('tya', 'ちゃ').replace('tyi', 'ちぃ').replace('tyu', 'ちゅ')
+    text = text.replace('tye', 'ちぇ').replace('tyo', 'ちょ')
+    text = text.replace('tsa', 'つぁ').replace('tsi', 'つぃ').replace('tse', 'つぇ')
+    text = text.replace('tso', 'つぉ')
+    text = text.replace('thi', 'てぃ').replace('t\'i', 'てぃ')
+    text = text.replace('tha', 'てゃ').replace('thu', 'てゅ').replace('t\'yu', 'てゅ')
+    text = text.replace('the', 'てぇ').replace('tho', 'てょ')
+    text = text.replace('dha', 'でゃ').replace('dhi', 'でぃ').replace('d\'i', 'でぃ')
+    text = text.replace('dhu', 'でゅ').replace('dhe', 'でぇ').replace('dho', 'でょ')
+    text = text.replace('d\'yu', 'でゅ')
+    text = text.replace('twa', 'とぁ').replace('twi', 'とぃ').replace('twu', 'とぅ')
+    text = text.replace('twe', 'とぇ').replace('two', 'とぉ').replace('t\'u', 'とぅ')
+    text = text.replace('dwa', 'どぁ').replace('dwi', 'どぃ').replace('dwu', 'どぅ')
+    text = text.replace('dwe', 'どぇ').replace('dwo', 'どぉ').replace('d\'u', 'どぅ')
+    text = text.replace('nya', 'にゃ').replace('nyi', 'にぃ').replace('nyu', 'にゅ')
+    text = text.replace('nye', 'にぇ').replace('nyo', 'にょ')
+    text = text.replace('hya', 'ひゃ').replace('hyi', 'ひぃ').replace('hyu', 'ひゅ')
+    text = text.replace('hye', 'ひぇ').replace('hyo', 'ひょ')
+    text = text.replace('mya', 'みゃ').replace('myi', 'みぃ').replace('myu', 'みゅ')
+    text = text.replace('mye', 'みぇ').replace('myo', 'みょ')
+    text = text.replace('rya', 'りゃ').replace('ryi', 'りぃ').replace('ryu', 'りゅ')
+    text = text.replace('rye', 'りぇ').replace('ryo', 'りょ')
+    text = text.replace('bya', 'びゃ').replace('byi', 'びぃ').replace('byu', 'びゅ')
+    text = text.replace('bye', 'びぇ').replace('byo', 'びょ')
+    text = text.replace('pya', 'ぴゃ').replace('pyi', 'ぴぃ').replace('pyu', 'ぴゅ')
+    text = text.replace('pye', 'ぴぇ').replace('pyo', 'ぴょ')
+    text = text.replace('vyi', 'ゔぃ').replace('vyu', 'ゔゅ').replace('vye', 'ゔぇ')
+    text = text.replace('vyo', 'ゔょ')
+    text = text.replace('fya', 'ふゃ').replace('fyu', 'ふゅ').replace('fyo', 'ふょ')
+    text = text.replace('hwa', 'ふぁ').replace('hwi', 'ふぃ').replace('hwe', 'ふぇ')
+    text = text.replace('hwo', 'ふぉ').replace('hwyu', 'ふゅ')
+    text = text.replace('pha', 'ふぁ').replace('phi', 'ふぃ').replace('phu', 'ふぅ')
+    text = text.replace('phe', 'ふぇ').replace('pho', 'ふぉ')
+    text = text.replace('xn', 'ん').replace('xa', 'ぁ').replace('xi', 'ぃ')
+    text = text.replace('xu', 'ぅ').replace('xe', 'ぇ').replace('xo', 'ぉ')
+    text = text.replace('lyi', 'ぃ').replace('xyi', 'ぃ').replace('lye', 'ぇ')
+    text = text.replace('xye', 'ぇ').replace('xka', 'ヵ').replace('xke', 'ヶ')
+    text = text.replace('lka', 'ヵ').replace('lke', 'ヶ')
+    text = text.replace('ca', 'か').replace('ci', 'し').replace('cu', 'く')
+    text = text.replace('co', 'こ')
+    text = text.replace('qa', 'くぁ').replace('qi', 'くぃ').replace('qu', 'く')
+    text = text.replace('qe', 'くぇ').replace('qo', 'くぉ')
+    text = text.replace('kwa', 'くぁ').replace('kwi', 'くぃ').replace('kwu', 'くぅ')
+    text = text.replace('kwe', 'くぇ').replace('kwo', 'くぉ')
+    text = text.replace('gwa', 'ぐぁ').replace('gwi', 'ぐぃ').replace('gwu', 'ぐぅ')
+    text = text.replace('gwe', 'ぐぇ').replace('gwo', 'ぐぉ')
+    text = text.replace('swa', 'すぁ').replace('swi', 'すぃ').replace('swu', 'すぅ')
+    text = text.replace('swe', 'すぇ').replace('swo', 'すぉ')
+    text = text.replace('zwa', 'ずぁ').replace('zwi', 'ずぃ').replace('zwu', 'ずぅ')
+    text = text.replace('zwe', 'ずぇ').replace('zwo', 'ずぉ')
+    text = text.replace('je', 'じぇ')
+    text = text.replace('ti', 'ち')
+    text = text.replace('xtu', 'っ').replace('xtsu', 'っ')
+    text = text.replace('ltu', 'っ').replace('ltsu', 'っ')
+    text = text.replace('xya', 'ゃ').replace('lya', 'ゃ')
+    text = text.replace('xyu', 'ゅ').replace('lyu', 'ゅ')
+    text = text.replace('xyo', 'ょ').replace('lyo', 'ょ')
+    text = text.replace('wha', 'うぁ').replace('whi', 'うぃ').replace('whu', 'う')
+    text = text.replace('whe', 'うぇ').replace('who', 'うぉ')
+    text = text.replace('xwa', 'ゎ').replace('lwa', 'ゎ')
+    text = text.replace('tsu', 'つ')
+    text = text.replace('ga', 'が').replace('gi', 'ぎ').replace('gu', 'ぐ')
+    text = text.replace('ge', 'げ').replace('go', 'ご')
+    text = text.replace('za', 'ざ').replace('ji', 'じ').replace('zi', 'じ')
+    text = text.replace('zu', 'ず').replace('ze', 'ぜ').replace('zo', 'ぞ')
+    text = text.replace('da', 'だ').replace('di', 'ぢ')
+    text = text.replace('zu', 'づ').replace('du', 'づ')
+    text = text.replace('de', 'で').replace('do', 'ど')
+    text = text.replace('va', 'ゔぁ').replace('vi', 'ゔぃ').replace('vu', 'ゔ')
+    text = text.replace('ve', 'ゔぇ').replace('vo', 'ゔぉ').replace('vya', 'ゔゃ')
+    text = text.replace('ba', 'ば').replace('bi', 'び').replace('bu', 'ぶ')
+    text = text.replace('be', 'べ').replace('bo', 'ぼ').replace('pa', 'ぱ')
+    text = text.replace('pi', 'ぴ').replace('pu', 'ぷ').replace('pe', 'ぺ')
+    text = text.replace('po', 'ぽ')
+    text = text.replace('ka', 'か').replace('ki', 'き').replace('ku', 'く')
+    text = text.replace('ke', 'け').replace('ko', 'こ').replace('sa', 'さ')
+    text = text.replace('shi', 'し').replace('su', 'す').replace('se', 'せ').replace('si', 'し')
+    text = text.replace('so', 'そ').replace('ta', 'た').replace('chi', 'ち')
+    text = text.replace('te', 'て').replace('to', 'と')
+    text = text.replace('na', 'な').replace('ni', 'に').replace('nu', 'ぬ')
+    text = text.replace('ne', 'ね').replace('no', 'の').replace('ha', 'は')
+    text = text.replace('hi', 'ひ').replace('fu', 'ふ').replace('he', 'へ')
+    text = text.replace('ho', 'ほ').replace('ma', 'ま').replace('mi', 'み')
+    text = text.replace('mu', 'む').replace('me', 'め').replace('mo', 'も')
+    text = text.replace('ra', 'ら').replace('ri', 'り').replace('ru', 'る')
+    text = text.replace('re', 'れ').replace('ro', 'ろ')
+    text = text.replace('la', 'ら').replace('li', 'り').replace('lu', 'る')
+    text = text.replace('le', 'れ').replace('lo', 'ろ')
+    text = text.replace('ya', 'や').replace('yu', 'ゆ').replace('yo', 'よ')
+    text = text.replace('wa', 'わ').replace('wyi', 'ゐ').replace('wu', 'う')
+    text = text.replace('wye', 'ゑ')
+    text = text.replace('wo', 'を')
+    text = text.replace('nn', 'ん').replace('m', 'ん')
+    text = text.replace('tu', 'つ').replace('hu', 'ふ')
+    text = text.replace('fa', 'ふぁ').replace('fi', 'ふぃ').replace('fe', 'ふぇ')
+    text = text.replace('fo', 'ふぉ').replace('oh', 'おお')
+    text = text.replace('l', 'る').replace('-', 'ー')
+    text = text.translate(HEP2KANA)
+    ret = []
+    consonants = frozenset('sdfghjklqwrtypzxcvbnm')
+    for (i, char) in enumerate(text):
+        if char in consonants:
+            char = 'っ'
+        ret.append(char)
+    return ''.join(ret)
+
+# End of code adapted from jaconv.
+############################################################
+
+
+############################################################
+# dictionary load and lookup
+#
+# edict example lines:
+# 〆日 [しめび] /(n) time limit/closing day/settlement day (payment)/deadline/
+# ハート /(n) heart/(P)/
+
+Entry = namedtuple('Entry', 'headword reading gloss')
+EntryEx = namedtuple('EntryEx', 'headword reading gloss inf')
+
+_dict_lookup = None
+_dict_lock = threading.Lock()   # guards switching _dict_lookup against storing loaded dictionaries
+_dict_load_locks = {}   # format: { 'filename_1': Lock, ... }
+
+_dict = {}      # format: { 'filename_1': EntryTable, ... }
+_dict_jidx = {} # format: { 'filename_1': [exact_map, sorted_keys, key_ids], ... }
+_dict_jsa = {}  # format: { 'filename_1': [text, sa, sa_seg, seg_off, seg_ids], ... }
+_dict_eidx = {} # format: { 'filename_1': { 'token': postings, ... }, ... }
+_dict_blob = {} # format: { 'filename_1': [jap_blob, jap_offsets, eng_blob, eng_offsets], ... }
+_dict_iidx = {} # format: { 'filename_1': { 'form': eid << 8 | rule_no or [...], ... }, ... }
+_dict_iidx_info = {} # format: { 'filename_1': [forms, build_seconds], ... }
+
+# Normalise text for matching: fold full-width/half-width forms (NFKC),
+# Katakana to Hiragana, and letter case.  Applied to dictionary fields
+# once on load, and to search terms and patterns on lookup.
+def _norm_key(text):
+    return kata2hira(unicodedata.normalize('NFKC', text)).casefold()
+
+# tokens: escape sequences, runs of non-ASCII characters, other ASCII runs
+_re_pattern_tok = re.compile(r'\\.|[^\x00-\x7f]+|[^\\\x80-\U0010ffff]+', re.DOTALL)
+
+# apply _norm_key to a regex pattern, leaving escape sequences intact and
+# keeping non-ASCII characters literal
+def _norm_pattern(pattern):
+    def norm(m):
+        t = m.group(0)
+        if t[0] == '\\':
+            return t
+        if t[0] > '\x7f':
+            return re.escape(_norm_key(t))
+        return t.lower()
+    return _re_pattern_tok.sub(norm, pattern)
+
+def _dict_entry_keys(entry):
+    return _norm_key(entry.headword), _norm_key(entry.reading), _norm_key(entry.gloss)
+
+def _dict_split_line(line):
+    # manually splitting the line is actually faster than regex
+    try:
+        p1 = line.split('[', 1)
+        if len(p1) < 2:
+            p1 = line.split('/', 1)
+            p2 = ['', p1[1]]
+        else:
+            p2 = p1[1].split(']', 1)
+        headword = p1[0].strip()
+        reading = p2[0].strip()
+        gloss = ' ' + p2[1].lstrip('/ ').rstrip(' \t\r\n').replace('/', '; ')
+    except Exception as e:
+        eprint('malformed line:', line, ':', str(e))
+        headword = reading = gloss = ''
+    return Entry(headword, reading, gloss)
+
+def _dict_parse(dict_fname):
+    dic = []
+    with open(dict_fname) as dict_file:
+        for line in dict_file:
+            entry = _dict_split_line(line)
+            if entry.headword:
+                dic.append(entry)
+    return dic
+
+# Compact entry storage
+#
+# Loaded dictionaries keep their entries column-wise: each field is one
+# UTF-8 encoded bytes buffer, plus an array holding the start offset of
+# each entry's field and a final end offset.  Parenthesized gloss tags
+# like '(v5k,vt)' that occur repeatedly are replaced by _TAG_REF and a
+# two character index into a table of interned tag strings.  Entry tuples
+# are only created for the entries actually accessed.
+
+_TAG_REF = '\x01'
+_TAG_MAX = 64 * 64
+_re_gloss_tag = re.compile(r'\([^()\s]{3,}\)')
+_re_tag_ref = re.compile(_TAG_REF + '(..)', re.DOTALL)
+
+class EntryTable:
+    def __init__(self, cols):
+        self.bufs = cols[0:6:2]
+        self.offs = []
+        for b in cols[1:6:2]:
+            offs = array('I')
+            offs.frombytes(b)
+            self.offs.append(offs)
+        self.tags = [sys.intern(t) for t in cols[6]]
+
+    def __len__(self):
+        return len(self.offs[0]) - 1
+
+    def __getitem__(self, i):
+        if i < 0 or i >= len(self):
+            raise IndexError('entry index out of range')
+        hw, rd, gl = [buf[offs[i]:offs[i + 1]].decode() for buf, offs in zip(self.bufs, self.offs)]
+        if _TAG_REF in gl:
+            gl = _re_tag_ref.sub(lambda m: self.tags[(ord(m.group(1)[0]) - 64) * 64 + ord(m.group(1)[1]) - 64], gl)
+        return Entry(hw, rd, gl)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+# pack a list of entries into the columns an EntryTable is made from
+def _dict_entries_pack(dic):
+    counts = {}
+    if not any(_TAG_REF in e.gloss for e in dic):
+        for e in dic:
+            for tag in _re_gloss_tag.findall(e.gloss):
+                counts[tag] = counts.get(tag, 0) + 1
+    tags = sorted((t for t, n in counts.items() if n > 1), key=lambda t: -counts[t])[:_TAG_MAX]
+    ref = {t: _TAG_REF + chr(64 + i // 64) + chr(64 + i % 64) for i, t in enumerate(tags)}
+    def pack_tags(m):
+        return ref.get(m.group(0), m.group(0))
+    cols = []
+    for n, field in enumerate(zip(*dic) if dic else [[], [], []]):
+        if n == 2 and ref:
+            field = [_re_gloss_tag.sub(pack_tags, gl) for gl in field]
+        field = [f.encode() for f in field]
+        offs = array('I', [0])
+        offs.extend(accumulate(map(len, field)))
+        cols += [b''.join(field), offs.tobytes()]
+    return cols + [tags]
+
+# Japanese key index
+#
+# Headword and reading fields are split on ';' and normalised (Katakana
+# folded to Hiragana, lower case).  Each part is recorded in a sorted key
+# array for prefix ('Start With') lookups, and additionally, with any
+# trailing edict2 marker like '(P)' stripped, in a hash map for exact
+# lookups.  All id lists are in ascending entry order.
+
+def _dict_jparts(hw_key, rd_key):
+    for field in (hw_key, rd_key):
+        for part in field.split(';'):
+            if part:
+                yield part
+
+def _dict_jidx_build(keys):
+    exact = {}
+    start = {}
+    for eid, jkeys in enumerate(zip(keys[0], keys[1])):
+        for part in _dict_jparts(*jkeys):
+            ids = start.setdefault(part, [])
+            if not ids or ids[-1] != eid:
+                ids.append(eid)
+            p = part.find('(')
+            if p < 0:
+                key = part
+            elif p < len(part) - 2 and part[-1] == ')':
+                key = part[:p]
+            else:
+                continue
+            if key:
+                ids = exact.setdefault(key, [])
+                if not ids or ids[-1] != eid:
+                    ids.append(eid)
+    keys = sorted(start)
+    return [exact, keys, [start[k] for k in keys]]
+
+def _dict_jidx_matches(jidx, shape, term, limit):
+    if _stats_enabled:
+        _stats_add('index_lookups')
+    exact, keys, ids = jidx
+    if shape == 'exact':
+        hits = [exact.get(term, [])]
+    else:
+        lo = bisect.bisect_left(keys, term)
+        hi = bisect.bisect_left(keys, term + '\U0010ffff', lo)
+        hits = ids[lo:hi]
+    result = []
+    last = -1
+    for eid in heapq.merge(*hits):
+        if eid != last:
+            result.append(eid)
+            last = eid
+            if limit and len(result) >= limit:
+                break
+    return result
+
+# Japanese key suffix array
+#
+# All distinct normalised key parts, plus every variant of a part with a
+# trailing parenthesized edict2 marker removed, are concatenated into one
+# text, each segment terminated by _JSA_SEP.  The suffix array holds the
+# text positions sorted by suffix (up to and including the segment
+# terminator), sa_seg the segment number for each of these.  seg_off and
+# seg_ids map segment numbers to ascending entry ids, CSR style.
+#
+# A literal term occurs anywhere in a key ('Any Matches') if it prefixes
+# some suffix, and it ends a key ('End With Expression') if term+_JSA_SEP
+# prefixes some suffix.  Integer arrays are stored as bytes in the cache.
+
+_JSA_SEP = '\x01'
+
+def _dict_jsa_build(keys):
+    segs = {}
+    for eid, jkeys in enumerate(zip(keys[0], keys[1])):
+        for part in _dict_jparts(*jkeys):
+            variants = [part]
+            if part[-1] == ')':
+                p = part.find('(')
+                while 0 <= p < len(part) - 2:
+                    variants.append(part[:p])
+                    p = part.find('(', p + 1)
+            for key in variants:
+                ids = segs.setdefault(key, [])
+                if not ids or ids[-1] != eid:
+                    ids.append(eid)
+    seg_keys = sorted(segs)
+    text = _JSA_SEP.join(seg_keys) + _JSA_SEP
+    seg_off = array('I', [0])
+    seg_ids = array('I')
+    seg_start = array('I')
+    pos = 0
+    for key in seg_keys:
+        seg_ids.extend(segs[key])
+        seg_off.append(len(seg_ids))
+        seg_start.append(pos)
+        pos += len(key) + 1
+    # bucket suffixes by first character to keep sort keys small
+    buckets = {}
+    for i, c in enumerate(text):
+        if c != _JSA_SEP:
+            b = buckets.get(c)
+            if b is None:
+                b = buckets[c] = array('I')
+            b.append(i)
+    sa = array('I')
+    for c in sorted(buckets):
+        sa.extend(sorted(buckets[c], key=lambda i: text[i:text.find(_JSA_SEP, i) + 1]))
+    sa_seg = array('I', [bisect.bisect_right(seg_start, i) - 1 for i in sa])
+    return [text, sa.tobytes(), sa_seg.tobytes(), seg_off.tobytes(), seg_ids.tobytes()]
+
+def _dict_jsa_unpack(jsa):
+    arrays = []
+    for b in jsa[1:]:
+        a = array('I')
+        a.frombytes(b)
+        arrays.append(a)
+    return [jsa[0]] + arrays
+
+def _dict_jsa_matches(jsa, shape, term, limit):
+    if _stats_enabled:
+        _stats_add('index_lookups')
+    text, sa, sa_seg, seg_off, seg_ids = jsa
+    if shape == 'end':
+        term += _JSA_SEP
+    m = len(term)
+    lo, hi = 0, len(sa)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if text[sa[mid]:sa[mid] + m] < term:
+            lo = mid + 1
+        else:
+            hi = mid
+    hi = len(sa)
+    first = lo
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if text[sa[mid]:sa[mid] + m] <= term:
+            lo = mid + 1
+        else:
+            hi = mid
+    ids = set()
+    for seg in set(sa_seg[first:lo]):
+        ids.update(seg_ids[seg_off[seg]:seg_off[seg + 1]])
+    result = sorted(ids)
+    return result[:limit] if limit else result
+
+# English gloss index
+#
+# Gloss keys are split into word tokens; for each token the
+# postings hold (entry_id << 32 | token_position) in ascending order,
+# stored as bytes of an array('Q').  A whole word or whole expression
+# match implies that all word tokens of the search term occur at
+# consecutive positions in the gloss, so the positional intersection of
+# the term's postings yields a superset of the matching entries, which is
+# then verified against the actual search pattern.
+
+_re_word = re.compile(r'\w+')
+
+def _dict_eidx_build(keys):
+    postings = {}
+    for eid, gloss in enumerate(keys[2]):
+        base = eid << 32
+        for pos, tok in enumerate(_re_word.findall(gloss)):
+            p = postings.get(tok)
+            if p is None:
+                p = postings[tok] = array('Q')
+            p.append(base | pos)
+    return {tok: p.tobytes() for tok, p in postings.items()}
+
+def _dict_eidx_candidates(eidx, term):
+    plist = []
+    for i, tok in enumerate(_re_word.findall(term)):
+        b = eidx.get(tok)
+        if b is None:
+            return []
+        p = array('Q')
+        p.frombytes(b)
+        plist.append((len(p), i, p))
+    if not plist:
+        return []
+    # start with the rarest token, then probe the others by bisection
+    plist.sort()
+    _, i, p = plist[0]
+    cand = {x - i for x in p}
+    for _, i, p in plist[1:]:
+        n = len(p)
+        keep = set()
+        for c in cand:
+            k = bisect.bisect_left(p, c + i)
+            if k < n and p[k] == c + i:
+                keep.add(c)
+        cand = keep
+        if not cand:
+            return []
+    return sorted({c >> 32 for c in cand})
+
+# Search key blobs
+#
+# The normalised keys of a dictionary are kept in two newline separated
+# strings: the Japanese blob holds headword and reading keys on alternate
+# lines, the English blob one gloss key per line.  The offset arrays hold
+# the start of each line plus a final end offset, so line k of a blob is
+# blob[offs[k]:offs[k+1]-1] and belongs to entry k // lines_per_entry.
+# Regex searches run over a whole blob in MULTILINE mode, where '^' and
+# '$' match at line boundaries just as they would on the single keys.
+
+def _dict_blob_join(lines):
+    offs = array('I', [0])
+    offs.extend(accumulate(len(line) + 1 for line in lines))
+    return ['\n'.join(lines) + '\n' if lines else '', offs]
+
+def _dict_blob_build(keys):
+    jap = [k for jkeys in zip(keys[0], keys[1]) for k in jkeys]
+    blobs = _dict_blob_join(jap) + _dict_blob_join(keys[2])
+    blobs[1] = blobs[1].tobytes()
+    blobs[3] = blobs[3].tobytes()
+    return blobs
+
+def _dict_blob_unpack(blobs):
+    jap_offs = array('I')
+    jap_offs.frombytes(blobs[1])
+    eng_offs = array('I')
+    eng_offs.frombytes(blobs[3])
+    return [blobs[0], jap_offs, blobs[2], eng_offs]
+
+# patterns which may behave differently on a blob than on single keys
+_re_blob_unsafe = re.compile(r'\\[AZ]|\(\?[^:P]')
+
+def _dict_blob_scan(blob, offs, per, rx, limit):
+    result = []
+    end = len(blob)
+    nlines = len(offs) - 1
+    pos = 0
+    while pos < end:
+        m = rx.search(blob, pos)
+        if m is None:
+            break
+        k = bisect.bisect_right(offs, m.start()) - 1
+        if k >= nlines:
+            break
+        # a match reaching beyond the end of its line might have used
+        # characters of the following one: re-check on the line alone
+        if m.end() < offs[k + 1] or rx.search(blob, offs[k], offs[k + 1] - 1):
+            eid = k // per
+            result.append(eid)
+            if limit and len(result) >= limit:
+                break
+            pos = offs[(eid + 1) * per]
+        else:
+            pos = offs[k + 1]
+    if _stats_enabled:
+        _stats_add('scanned', (result[-1] + 1 if limit and len(result) >= limit else nlines // per))
+    return result
+
+# check the blob lines of the entries ids in order
+def _dict_blob_verify(blob, offs, per, rx, ids, limit):
+    if _stats_enabled:
+        ids = _stats_counted(ids, 'scanned')
+    result = []
+    for i in ids:
+        for k in range(i * per, (i + 1) * per):
+            if rx.search(blob, offs[k], offs[k + 1] - 1):
+                result.append(i)
+                break
+        if limit and len(result) >= limit:
+            break
+    return result
+
+# Inflected form index
+#
+# Optional alternative to de-inflection at query time (cfg['inflect_index']):
+# the headword and reading keys of all entries tagged v1, v5* or adj-i are
+# conjugated forward when a dictionary is compiled, and each resulting form
+# maps to (entry_id << 8 | VCONJ rule number), or a list of such values in
+# ascending order, if several entries or rules produce the same form.  An
+# inflected lookup then takes a single hash probe.  Irregular verbs and
+# forms combining several inflections are not covered; for terms missing
+# from the index, searches fall back to de-inflection rules.
+
+# word class tags in glosses, and dictionary form endings of godan classes
+_re_infl_class = re.compile(r'(?<=[(,])(v1|v5k-s|v5[kgsutnbmr]|adj-i)(?=[,)])')
+_INFL_GODAN_END = { 'k': 'く', 'g': 'ぐ', 's': 'す', 't': 'つ', 'n': 'ぬ', 'b': 'ぶ', 'm': 'む', 'r': 'る', 'u': 'う' }
+# format: { 'ending': ('a', 'i', 'e', 'o', 'te', 'ta'), ... }
+_INFL_GODAN_ROWS = {
+    'く': ('か', 'き', 'け', 'こ', 'いて', 'いた'),
+    'ぐ': ('が', 'ぎ', 'げ', 'ご', 'いで', 'いだ'),
+    'す': ('さ', 'し', 'せ', 'そ', 'して', 'した'),
+    'つ': ('た', 'ち', 'て', 'と', 'って', 'った'),
+    'ぬ': ('な', 'に', 'ね', 'の', 'んで', 'んだ'),
+    'ぶ': ('ば', 'び', 'べ', 'ぼ', 'んで', 'んだ'),
+    'む': ('ま', 'み', 'め', 'も', 'んで', 'んだ'),
+    'る': ('ら', 'り', 'れ', 'ろ', 'って', 'った'),
+    'う': ('わ', 'い', 'え', 'お', 'って', 'った'),
+}
+# format: [ (row, ending, rule_no), ... ]
+_INFL_GODAN = [
+    (0, 'ない', 0), (0, 'なかった', 6), (1, 'ます', 1), (1, 'ました', 11),
+    (1, 'まして', 25), (1, 'ません', 12), (1, 'ませんでした', 13), (1, 'ましょう', 18),
+    (1, 'たい', 26), (2, 'ば', 2), (3, 'う', 3), (4, '', 4), (5, '', 5),
+    (0, 'れる', 7), (0, 'せる', 8), (2, 'る', 9), (2, '', 10),
+]
+# format: [ (ending, rule_no), ... ]
+_INFL_V1 = [
+    ('ない', 0), ('なかった', 6), ('ます', 1), ('ました', 11), ('まして', 25),
+    ('ません', 12), ('ませんでした', 13), ('ましょう', 18), ('たい', 26),
+    ('れば', 2), ('よう', 3), ('て', 4), ('た', 5), ('られる', 20), ('させる', 8),
+    ('ろ', 10),
+]
+_INFL_ADJ = [
+    ('く', 15), ('かった', 23), ('くない', 21), ('くなかった', 22), ('ければ', 2),
+    ('くて', 4),
+]
+
+# generate (form, rule_no) for a normalised key of the given word class
+def _dict_infl_forms(key, wcls):
+    if wcls == 'adj-i':
+        if key.endswith('い'):
+            for ending, rule in _INFL_ADJ:
+                yield key[:-1] + ending, rule
+    elif wcls == 'v1':
+        if key.endswith('る'):
+            for ending, rule in _INFL_V1:
+                yield key[:-1] + ending, rule
+    elif key.endswith(_INFL_GODAN_END[wcls[2]]):
+        row = _INFL_GODAN_ROWS[key[-1]]
+        if wcls == 'v5k-s':
+            row = row[:4] + ('って', 'った')
+        for r, ending, rule in _INFL_GODAN:
+            yield key[:-1] + row[r] + ending, rule
+
+# normalised key parts of an entry, edict2 markers stripped
+def _dict_infl_keys(entry):
+    hw_key, rd_key, _ = _dict_entry_keys(entry)
+    for part in _dict_jparts(hw_key, rd_key):
+        p = part.find('(')
+        if p >= 0:
+            part = part[:p] if p < len(part) - 2 and part[-1] == ')' else ''
+        if part:
+            yield part
+
+def _dict_iidx_build(dic):
+    iidx = {}
+    for eid, entry in enumerate(dic):
+        classes = _re_infl_class.findall(entry.gloss)
+        if not classes:
+            continue
+        for key in _dict_infl_keys(entry):
+            for wcls in classes:
+                for form, rule in _dict_infl_forms(key, wcls):
+                    val = eid << 8 | rule
+                    old = iidx.get(form)
+                    if old is None:
+                        iidx[form] = val
+                    elif isinstance(old, int):
+                        if old != val:
+                            iidx[form] = sorted([old, val])
+                    elif val not in old:
+                        bisect.insort(old, val)
+    return iidx
+
+# approximate memory held by an inflected form index, in bytes
+def _dict_iidx_size(iidx):
+    size = sys.getsizeof(iidx)
+    for form, val in iidx.items():
+        size += sys.getsizeof(form) + sys.getsizeof(val)
+        if not isinstance(val, int):
+            size += sum(map(sys.getsizeof, val))
+    return size
+
+# look up an inflected term in the index of a loaded dictionary; returns
+# a list of EntryEx, the inflection info naming the rule and dictionary
+# form key that produced the term
+def _dict_lookup_inflected(dict_fname, term, limit=0):
+    result = []
+    dic = _dict.get(dict_fname)
+    term = _norm_key(term)
+    vals = _dict_iidx.get(dict_fname, {}).get(term, [])
+    for val in [vals] if isinstance(vals, int) else vals:
+        eid, rule = val >> 8, val & 0xff
+        entry = dic[eid]
+        infi = next((key for key in _dict_infl_keys(entry)
+                     for wcls in _re_infl_class.findall(entry.gloss)
+                     for form, r in _dict_infl_forms(key, wcls) if form == term and r == rule), term)
+        vtype = _vconj_type.get(rule)
+        blurb = '%s %s → %s' % (vtype.label if vtype else '', term, infi)
+        result.append(EntryEx(entry.headword, entry.reading, entry.gloss,
+                              Vinf(infi, blurb, vtype.wclass if vtype else None)))
+        if limit and len(result) >= limit:
+            break
+    return result
+
+# characters that keep a search term from being treated as literal string
+_re_query_meta = re.compile(r'[.^$*+?{}\[\]\\|();]')
+
+# classify the shape of a search pattern generated by
+# _search_apply_options(); returns (shape, term), where
+# shape is None for patterns that require a regex scan
+def _dict_query_shape(pattern, mode):
+    if mode == ScanMode.ENG:
+        return _dict_query_shape_eng(pattern)
+    term = pattern
+    anchored = term.startswith(_TERM_START)
+    if anchored:
+        term = term[len(_TERM_START):]
+    if term.endswith(_TERM_END):
+        term = term[:-len(_TERM_END)]
+        shape = 'exact' if anchored else 'end'
+    else:
+        shape = 'start' if anchored else 'any'
+    if term and not _re_query_meta.search(term):
+        term = _norm_key(term)
+        if not _re_query_meta.search(term):
+            return shape, term
+    return None, pattern
+
+def _dict_query_shape_eng(pattern):
+    if pattern.startswith(_EXPR_START) and pattern.endswith(_EXPR_END):
+        term = pattern[len(_EXPR_START):-len(_EXPR_END)]
+        shape = 'expr'
+    elif pattern.startswith(_WORD_BOUND) and pattern.endswith(_WORD_BOUND):
+        term = pattern[len(_WORD_BOUND):-len(_WORD_BOUND)]
+        shape = 'word'
+    else:
+        return None, pattern
+    if _re_word.search(term) and not _re_query_meta.search(term):
+        term = _norm_key(term)
+        if not _re_query_meta.search(term):
+            return shape, term
+    return None, pattern
+
+# assemble the data stored per loaded dictionary
+def _dict_compile(dic):
+    keys = [list(c) for c in zip(*map(_dict_entry_keys, dic))] if dic else [[], [], []]
+    return {
+        'entries': _dict_entries_pack(dic),
+        'blob': _dict_blob_build(keys),
+        'jidx': _dict_jidx_build(keys),
+        'jsa': _dict_jsa_build(keys),
+        'eidx': _dict_eidx_build(keys),
+    }
+
+# build the inflected form index into data, if enabled
+def _dict_compile_iidx(data, dic):
+    if cfg['inflect_index'] and 'iidx' not in data:
+        t = time.monotonic()
+        data['iidx'] = _dict_iidx_build(dic)
+        data['iidx_info'] = [len(data['iidx']), time.monotonic() - t]
+        return True
+    return False
+
+# compiled dictionary cache
+#
+# Parsed dictionaries are kept in versioned binary files in a cache
+# directory next to the configuration file.  Cache file layout:
+#   magic (4 bytes) | header length (uint32 LE) | JSON header | payload
+# The header identifies the source file by path, size, mtime and content
+# hash; the payload is the marshalled output of _dict_compile().  A cache file
+# is considered stale when anything but the mtime differs, or when the
+# mtime differs and so does the content hash.
+
+_DICT_CACHE_MAGIC = b'JPDC'
+_DICT_CACHE_VERSION = 7
+
+def _dict_cache_dir():
+    if cfg['cfgfile']:
+        cdir = os.path.dirname(cfg['cfgfile'])
+    else:
+        cdir = _get_cfile_path('', mode=os.R_OK | os.W_OK | os.X_OK)
+    return os.path.join(cdir, _JITENPAI_CACHE)
+
+def _dict_cache_fname(dict_fname):
+    rpath = os.path.realpath(dict_fname)
+    tag = hashlib.sha1(rpath.encode()).hexdigest()[:16]
+    return os.path.join(_dict_cache_dir(), '%s-%s' % (os.path.basename(rpath), tag))
+
+def _dict_cache_key(dict_fname):
+    st = os.stat(dict_fname)
+    return {
+        'version': _DICT_CACHE_VERSION,
+        'python': '%d.%d' % sys.version_info[:2],
+        'path': os.path.realpath(dict_fname),
+        'size': st.st_size,
+        'mtime': st.st_mtime_ns,
+    }
+
+def _dict_file_hash(dict_fname):
+    h = hashlib.blake2b(digest_size=16)
+    with open(dict_fname, 'rb') as dict_file:
+        for chunk in iter(lambda: dict_file.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _dict_cache_save(dict_fname, data, key=None):
+    cname = _dict_cache_fname(dict_fname)
+    try:
+        if key is None:
+            key = _dict_cache_key(dict_fname)
+        if 'hash' not in key:
+            key['hash'] = _dict_file_hash(dict_fname)
+        hdr = json.dumps(key).encode()
+        os.makedirs(os.path.dirname(cname), exist_ok=True)
+        tmpname = '%s.%d.tmp' % (cname, os.getpid())
+        with open(tmpname, 'wb') as cfile:
+            cfile.write(_DICT_CACHE_MAGIC)
+            cfile.write(struct.pack('<I', len(hdr)))
+            cfile.write(hdr)
+            marshal.dump(data, cfile)
+        os.replace(tmpname, cname)
+        return True
+    except Exception as e:
+        eprint('_dict_cache_save:', cname, str(e))
+    return False
+
+def _dict_cache_load(dict_fname):
+    cname = _dict_cache_fname(dict_fname)
+    if not os.path.exists(cname):
+        return None
+    try:
+        key = _dict_cache_key(dict_fname)
+        with open(cname, 'rb') as cfile:
+            head = cfile.read(8)
+            if len(head) < 8 or head[:4] != _DICT_CACHE_MAGIC:
+                return None
+            hlen = struct.unpack_from('<I', head, 4)[0]
+            hdr = json.loads(cfile.read(hlen))
+            fhash = hdr.pop('hash', None)
+            refresh = False
+            if hdr != key:
+                # only the mtime changed: accept, if the content did not
+                hdr['mtime'] = key['mtime']
+                if hdr != key or fhash != _dict_file_hash(dict_fname):
+                    return None
+                refresh = True
+            data = marshal.load(cfile)
+        if refresh:
+            key['hash'] = fhash
+            _dict_cache_save(dict_fname, data, key)
+        return data
+    except Exception as e:
+        eprint('_dict_cache_load:', cname, str(e))
+    return None
+
+def _dict_cache_rebuild():
+    ok = True
+    for d in cfg['dicts']:
+        try:
+            key = _dict_cache_key(d[1])
+            dic = _dict_parse(d[1])
+            data = _dict_compile(dic)
+            _dict_compile_iidx(data, dic)
+        except Exception as e:
+            eprint('_dict_cache_rebuild:', d[1], str(e))
+            ok = False
+            continue
+        if _dict_cache_save(d[1], data, key):
+            print('%s: %d entries cached in %s' % (d[0], len(dic), _dict_cache_fname(d[1])))
+            if 'iidx' in data:
+                print('%s: %d inflected forms indexed in %.2fs, approx. %.1f MiB' % (d[0],
+                      data['iidx_info'][0], data['iidx_info'][1], _dict_iidx_size(data['iidx']) / (1 << 20)))
+        else:
+            ok = False
+    return ok
+
+# switch between lookups in loaded dictionaries and in the dictionary
+# files; the latter drops all loaded dictionaries, and makes loads still
+# in progress discard their result
+def _dict_set_load(load):
+    global _dict_lookup
+    with _dict_lock:
+        if load:
+            _dict_lookup = _dict_lookup_load
+        else:
+            _dict.clear()
+            _dict_jidx.clear()
+            _dict_jsa.clear()
+            _dict_eidx.clear()
+            _dict_blob.clear()
+            _dict_iidx.clear()
+            _dict_narrow.clear()
+            _dict_lookup = _dict_lookup_noload
+
+# parse a dictionary file, or get it from the cache, and store it;
+# returns its EntryTable, or [] on failure or if loading got switched
+# off meanwhile
+def _dict_load_file(dict_fname):
+    data = _dict_cache_load(dict_fname) if cfg['dict_cache'] else None
+    try:
+        if data is None:
+            key = _dict_cache_key(dict_fname) if cfg['dict_cache'] else None
+            dic = _dict_parse(dict_fname)
+            data = _dict_compile(dic)
+            _dict_compile_iidx(data, dic)
+            if key:
+                _dict_cache_save(dict_fname, data, key)
+            dic = EntryTable(data['entries'])
+        else:
+            dic = EntryTable(data['entries'])
+            if _dict_compile_iidx(data, dic):
+                _dict_cache_save(dict_fname, data)
+        blob = _dict_blob_unpack(data['blob'])
+        jsa = _dict_jsa_unpack(data['jsa'])
+        with _dict_lock:
+            if _dict_lookup is not _dict_lookup_load:
+                return []
+            _dict_blob[dict_fname] = blob
+            _dict_jidx[dict_fname] = data['jidx']
+            _dict_jsa[dict_fname] = jsa
+            _dict_eidx[dict_fname] = data['eidx']
+            if cfg['inflect_index'] and 'iidx' in data:
+                _dict_iidx[dict_fname] = data['iidx']
+                _dict_iidx_info[dict_fname] = data['iidx_info']
+            _dict[dict_fname] = dic
+        return dic
+    except Exception as e:
+        eprint('_dict_load:', dict_fname, str(e))
+    return []
+
+# the first thread to ask for a dictionary loads it, others asking for
+# the same one meanwhile wait for the result
+def _dict_load(dict_fname):
+    dic = _dict.get(dict_fname, [])
+    if dic:
+        return dic
+    with _dict_lock:
+        lock = _dict_load_locks.setdefault(dict_fname, threading.Lock())
+    with lock:
+        dic = _dict.get(dict_fname, [])
+        if not dic:
+            t = time.perf_counter()
+            dic = _dict_load_file(dict_fname)
+            t = time.perf_counter() - t
+            _mem_load_time[dict_fname] = t
+            if _stats_enabled:
+                _stats_add_time('dict_load', t)
+    return dic
+
+# items: iterable of (entry, headword_key, reading_key, gloss_key)
+def _dict_matches(items, pattern, mode, limit):
+    if _stats_enabled:
+        items = _stats_counted(items, 'scanned')
+    result = []
+    cnt = 0
+    re_pattern = re.compile(_norm_pattern(pattern))
+    for entry, hw_key, rd_key, gl_key in items:
+        if (mode == ScanMode.JAP and (re_pattern.search(hw_key) or re_pattern.search(rd_key))) \
+        or (mode == ScanMode.ENG and re_pattern.search(gl_key)):
+            result.append(entry)
+            cnt += 1
+            if limit and cnt >= limit:
+                break
+    return result
+
+# Narrowing
+#
+# The complete result of the last 'Start With' or 'Any Matches' lookup of
+# a literal term is kept per dictionary.  All matches of a later literal
+# lookup that contains this term (or, after 'Start With', starts with
+# it) are necessarily among these entries, so only they get checked:
+# typing たべ, たべも, たべもの costs one scan plus ever smaller filters.
+# Loaded dictionaries keep entry ids, others the entries themselves.
+
+_dict_narrow = {}   # format: { 'filename_1': [dic, stamp, mode, shape, term, candidates], ... }
+
+# like _dict_query_shape(), but also classifies literal English terms
+# as 'any'
+def _dict_narrow_shape(pattern, mode):
+    shape, term = _dict_query_shape(pattern, mode)
+    if shape is None and mode == ScanMode.ENG and pattern and not _re_query_meta.search(pattern):
+        term = _norm_key(pattern)
+        if not _re_query_meta.search(term):
+            shape = 'any'
+    return shape, term
+
+def _dict_narrow_get(dict_fname, dic, stamp, mode, shape, term):
+    nw = _dict_narrow.get(dict_fname)
+    if shape is None or nw is None or nw[0] is not dic or nw[1] != stamp or nw[2] != mode:
+        return None
+    if (nw[3] == 'start' and shape in ('exact', 'start') and term.startswith(nw[4])) \
+    or (nw[3] == 'any' and nw[4] in term):
+        if _stats_enabled:
+            _stats_add('narrow_hits')
+        return nw[5]
+    return None
+
+def _dict_narrow_put(dict_fname, dic, stamp, mode, shape, term, result, limit):
+    if shape in ('start', 'any') and (not limit or len(result) < limit):
+        _dict_narrow[dict_fname] = [dic, stamp, mode, shape, term, result]
+
+def _dict_lookup_ids(dict_fname, dic, pattern, mode, limit):
+    shape, term = _dict_query_shape(pattern, mode)
+    if shape in ('exact', 'start'):
+        return _dict_jidx_matches(_dict_jidx[dict_fname], shape, term, limit)
+    if shape in ('end', 'any'):
+        return _dict_jsa_matches(_dict_jsa[dict_fname], shape, term, limit)
+    jap_blob, jap_offs, eng_blob, eng_offs = _dict_blob[dict_fname]
+    if _re_blob_unsafe.search(pattern):
+        jap = jap_blob.split('\n')
+        items = zip(range(len(dic)), jap[0::2], jap[1::2], eng_blob.split('\n'))
+        return _dict_matches(items, pattern, mode, limit)
+    rx = re.compile(_norm_pattern(pattern), re.MULTILINE)
+    if shape in ('expr', 'word'):
+        return _dict_blob_verify(eng_blob, eng_offs, 1, rx,
+                                 _dict_eidx_candidates(_dict_eidx[dict_fname], term), limit)
+    if mode == ScanMode.JAP:
+        return _dict_blob_scan(jap_blob, jap_offs, 2, rx, limit)
+    return _dict_blob_scan(eng_blob, eng_offs, 1, rx, limit)
+
+def _dict_lookup_load(dict_fname, pattern, mode, limit=0):
+    dic = _dict_load(dict_fname)
+    if dic:
+        shape, term = _dict_narrow_shape(pattern, mode)
+        cand = _dict_narrow_get(dict_fname, dic, None, mode, shape, term)
+        if cand is not None:
+            jap_blob, jap_offs, eng_blob, eng_offs = _dict_blob[dict_fname]
+            rx = re.compile(_norm_pattern(pattern), re.MULTILINE)
+            if mode == ScanMode.JAP:
+                ids = _dict_blob_verify(jap_blob, jap_offs, 2, rx, cand, limit)
+            else:
+                ids = _dict_blob_verify(eng_blob, eng_offs, 1, rx, cand, limit)
+        else:
+            ids = _dict_lookup_ids(dict_fname, dic, pattern, mode, limit)
+        _dict_narrow_put(dict_fname, dic, None, mode, shape, term, ids, limit)
+        return [dic[i] for i in ids], True
+    return [], False
+
+# Raw line prefilter
+#
+# Without a loaded dictionary, lookups memory-map the dictionary file and
+# search the raw bytes for a literal string any match must contain, so
+# only lines with a hit need to be decoded, parsed and matched.  As the
+# literal is taken from the normalised pattern, each of its characters is
+# searched for in all spellings that normalise to it (e.g. ア, あ and ｱ).
+# Lines containing characters that normalise to more or less than one
+# character, combine with a neighbour, or lie outside the BMP are always
+# passed on; these are collected once per file.
+
+_dict_xlines = {}   # format: { 'filename_1': [size, mtime, line_starts], ... }
+_norm_variants = {} # format: { 'normalised_char': ['raw_char', ...], ... }
+_re_norm_special = None
+
+def _norm_tables():
+    global _re_norm_special
+    if _re_norm_special is not None:
+        return
+    special = []
+    for cp in range(0x20, 0x10000):
+        if 0xd800 <= cp < 0xe000:
+            continue
+        c = chr(cp)
+        n = _norm_key(c)
+        if len(n) != 1 or unicodedata.combining(n) \
+           or 0x1100 <= ord(n) < 0x1200 or 0xa960 <= ord(n) < 0xa980 or 0xd7b0 <= ord(n) < 0xd800:
+            special.append(c.encode())
+        else:
+            _norm_variants.setdefault(n, []).append(c)
+    # arrange the UTF-8 sequences as a trie, so the regex engine can
+    # reject most positions by their first byte
+    trie = {}
+    for seq in special:
+        node = trie
+        for b in seq:
+            node = node.setdefault(b, {})
+    def render(node):
+        alts = []
+        leaves = []
+        for b, child in sorted(node.items()):
+            if child:
+                alts.append(re.escape(bytes([b])) + render(child))
+            else:
+                leaves.append(re.escape(bytes([b])))
+        if leaves:
+            alts.append(b'[' + b''.join(leaves) + b']')
+        return alts[0] if len(alts) == 1 else b'(?:' + b'|'.join(alts) + b')'
+    _re_norm_special = re.compile(render(trie) + b'|[\xf0-\xf4]')
+
+def _dict_special_lines(dict_fname, mm):
+    st = os.stat(dict_fname)
+    xl = _dict_xlines.get(dict_fname)
+    if xl is None or xl[0] != st.st_size or xl[1] != st.st_mtime_ns:
+        starts = array('I')
+        pos = 0
+        while True:
+            m = _re_norm_special.search(mm, pos)
+            if m is None:
+                break
+            starts.append(mm.rfind(b'\n', 0, m.start()) + 1)
+            pos = mm.find(b'\n', m.start()) + 1
+            if pos <= 0:
+                break
+        xl = _dict_xlines[dict_fname] = [st.st_size, st.st_mtime_ns, starts]
+    return xl[2]
+
+# tokens: escape sequence, character class, group/alternative, quantifier
+_re_pattern_lit_tok = re.compile(r'\\.|\[\^?\]?(?:\\.|[^\]])*\]|[()|*+?{]|.', re.DOTALL)
+
+# find the longest literal string every match of a normalised regex
+# pattern has to contain; ' ', ';', '/', '[' and ']' are excluded, as
+# _dict_split_line() inserts or removes these
+def _pattern_literal(pattern):
+    best = ''
+    run = ''
+    depth = 0
+    for tok in _re_pattern_lit_tok.findall(pattern):
+        if tok == '|' and depth == 0:
+            return ''
+        if tok in ('*', '?', '{'):
+            run = run[:-1]
+        elif depth == 0 and len(tok) == 1 and tok not in '()+.^$ ;/[]':
+            run += tok
+            continue
+        if len(run) > len(best):
+            best = run
+        run = ''
+        if tok == '(':
+            depth += 1
+        elif tok == ')':
+            depth -= 1
+    return run if len(run) > len(best) else best
+
+def _prefilter_regex(literals):
+    lrx = []
+    for literal in literals:
+        rx = []
+        for c in literal:
+            variants = _norm_variants.get(c, [c])
+            alts = [re.escape(v.encode()) for v in variants]
+            rx.append(alts[0] if len(alts) == 1 else b'(?:' + b'|'.join(alts) + b')')
+        lrx.append(b''.join(rx))
+    return re.compile(b'|'.join(lrx))
+
+# yield the lines containing any of literals
+def _dict_prefilter_lines(dict_fname, mm, literals):
+    _norm_tables()
+    rx = _prefilter_regex(literals)
+    xlines = _dict_special_lines(dict_fname, mm)
+    xi = 0
+    pos = 0
+    end = len(mm)
+    while pos < end:
+        m = rx.search(mm, pos)
+        start = mm.rfind(b'\n', 0, m.start()) + 1 if m else end
+        while xi < len(xlines) and xlines[xi] <= start:
+            if xlines[xi] < start:
+                e = mm.find(b'\n', xlines[xi])
+                yield mm[xlines[xi]:e + 1 if e >= 0 else end].decode()
+            xi += 1
+        if m is None:
+            break
+        e = mm.find(b'\n', m.start())
+        pos = e + 1 if e >= 0 else end
+        yield mm[start:pos].decode()
+
+# pass the (entry, keys...) items of all lines of a dictionary file that
+# might match any of patterns to consume, and return its result
+def _dict_scan_file(dict_fname, patterns, consume):
+    literals = [_pattern_literal(_norm_pattern(p)) for p in patterns]
+    with open(dict_fname, 'rb') as dict_file:
+        if all(literals) and os.fstat(dict_file.fileno()).st_size > 0:
+            with mmap.mmap(dict_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = _dict_prefilter_lines(dict_fname, mm, literals)
+                return consume((e,) + _dict_entry_keys(e) for e in map(_dict_split_line, lines))
+    with open(dict_fname) as dict_file:
+        return consume((e,) + _dict_entry_keys(e) for e in map(_dict_split_line, dict_file))
+
+def _dict_lookup_noload(dict_fname, pattern, mode, limit=0):
+    try:
+        st = os.stat(dict_fname)
+        stamp = (st.st_size, st.st_mtime_ns)
+        shape, term = _dict_narrow_shape(pattern, mode)
+        cand = _dict_narrow_get(dict_fname, None, stamp, mode, shape, term)
+        if cand is not None:
+            items = ((e,) + _dict_entry_keys(e) for e in cand)
+            result = _dict_matches(items, pattern, mode, limit)
+        else:
+            result = _dict_scan_file(dict_fname, [pattern], lambda items: _dict_matches(items, pattern, mode, limit))
+        _dict_narrow_put(dict_fname, None, stamp, mode, shape, term, result, limit)
+        return result, True
+    except Exception as e:
+        eprint('_dict_lookup_noload:', dict_fname, str(e))
+    return [], False
+
+
+# Look up several terms as exact matches at once, returning the list of
+# results for each term.  Terms missing from the exact key index of a
+# loaded dictionary are dropped by a hash probe; otherwise all terms are
+# matched in a single scan.
+def _dict_lookup_exact(dict_fname, terms, mode, limit=0):
+    if not terms:
+        return [], True
+    patterns = [_TERM_START + t + _TERM_END for t in terms]
+    if _dict_lookup is _dict_lookup_load:
+        dic = _dict_load(dict_fname)
+        if not dic:
+            return [], False
+        result = []
+        for pattern in patterns:
+            shape, term = _dict_query_shape(pattern, mode)
+            if shape == 'exact':
+                ids = _dict_jidx_matches(_dict_jidx[dict_fname], shape, term, limit)
+                result.append([dic[i] for i in ids])
+            else:
+                result.append(_dict_lookup_load(dict_fname, pattern, mode, limit)[0])
+        return result, True
+    try:
+        pattern = _TERM_START + '(?:' + '|'.join('(?:%s)' % t for t in terms) + ')' + _TERM_END
+        rx_all = re.compile(_norm_pattern(pattern))
+        rxs = [re.compile(_norm_pattern(p)) for p in patterns]
+        def consume(items):
+            if _stats_enabled:
+                items = _stats_counted(items, 'scanned')
+            result = [[] for p in patterns]
+            for entry, hw_key, rd_key, gl_key in items:
+                keys = (hw_key, rd_key) if mode == ScanMode.JAP else (gl_key,)
+                if not any(rx_all.search(k) for k in keys):
+                    continue
+                for rx, res in zip(rxs, result):
+                    if (not limit or len(res) < limit) and any(rx.search(k) for k in keys):
+                        res.append(entry)
+            return result
+        return _dict_scan_file(dict_fname, patterns, consume), True
+    except Exception as e:
+        eprint('_dict_lookup_exact:', dict_fname, str(e))
+    return [], False
+
+# Tiered lookup
+#
+# Look up patterns ordered from strictest to loosest, as built from the
+# search options by _search_apply_options(), and return the
+# index and result of the first one giving any match.  All matches of a
+# pattern are matches of the last one too, so a single pass can look for
+# the loosest pattern and classify each hit against the stricter ones,
+# instead of scanning the dictionary once per pattern.  Patterns only
+# served by indexes are still looked up one by one.
+
+# group references in a search term would refer to other groups, once
+# the term is embedded in the stricter patterns
+_re_pattern_groupref = re.compile(r'\\[1-9]|\(\?P=')
+
+# items: iterable of (entry, headword_key, reading_key, gloss_key)
+def _dict_matches_tiered(items, patterns, mode, limit):
+    if _stats_enabled:
+        items = _stats_counted(items, 'scanned')
+    rxs = [re.compile(_norm_pattern(p)) for p in patterns]
+    last = len(rxs) - 1
+    best = last
+    result = []
+    for entry, hw_key, rd_key, gl_key in items:
+        keys = (hw_key, rd_key) if mode == ScanMode.JAP else (gl_key,)
+        if not any(rxs[last].search(k) for k in keys):
+            continue
+        # find the strictest pattern matching, ignore looser ones than
+        # the best so far
+        for t in range(best + 1):
+            if t == last or any(rxs[t].search(k) for k in keys):
+                break
+        else:
+            continue
+        if t < best:
+            best = t
+            result = []
+        if not limit or len(result) < limit:
+            result.append(entry)
+        elif best == 0:
+            break
+    return best, result
+
+def _dict_lookup_tiered_load(dict_fname, patterns, mode, limit):
+    dic = _dict_load(dict_fname)
+    if not dic:
+        return 0, [], False
+    jap_blob, jap_offs, eng_blob, eng_offs = _dict_blob[dict_fname]
+    if any(_re_blob_unsafe.search(p) for p in patterns):
+        jap = jap_blob.split('\n')
+        items = zip(range(len(dic)), jap[0::2], jap[1::2], eng_blob.split('\n'))
+    else:
+        rx = re.compile(_norm_pattern(patterns[-1]), re.MULTILINE)
+        if mode == ScanMode.JAP:
+            ids = _dict_blob_scan(jap_blob, jap_offs, 2, rx, 0)
+            items = ((i, jap_blob[jap_offs[2 * i]:jap_offs[2 * i + 1] - 1],
+                      jap_blob[jap_offs[2 * i + 1]:jap_offs[2 * i + 2] - 1], '') for i in ids)
+        else:
+            ids = _dict_blob_scan(eng_blob, eng_offs, 1, rx, 0)
+            items = ((i, '', '', eng_blob[eng_offs[i]:eng_offs[i + 1] - 1]) for i in ids)
+    t, ids = _dict_matches_tiered(items, patterns, mode, limit)
+    return t, [dic[i] for i in ids], True
+
+def _dict_lookup_tiered_noload(dict_fname, patterns, mode, limit):
+    try:
+        st = os.stat(dict_fname)
+        stamp = (st.st_size, st.st_mtime_ns)
+        shape, term = _dict_narrow_shape(patterns[-1], mode)
+        cand = _dict_narrow_get(dict_fname, None, stamp, mode, shape, term)
+        consume = lambda items: _dict_matches_tiered(items, patterns, mode, limit)
+        if cand is not None:
+            t, result = consume((e,) + _dict_entry_keys(e) for e in cand)
+        else:
+            t, result = _dict_scan_file(dict_fname, patterns[-1:], consume)
+        shape, term = _dict_narrow_shape(patterns[t], mode)
+        _dict_narrow_put(dict_fname, None, stamp, mode, shape, term, result, limit)
+        return t, result, True
+    except Exception as e:
+        eprint('_dict_lookup_tiered_noload:', dict_fname, str(e))
+    return 0, [], False
+
+def _dict_lookup_tiered(dict_fname, patterns, mode, limit=0):
+    if len(patterns) > 1 and not any(_re_pattern_groupref.search(p) for p in patterns):
+        if _dict_lookup is _dict_lookup_noload:
+            return _dict_lookup_tiered_noload(dict_fname, patterns, mode, limit)
+        if not all(_dict_query_shape(p, mode)[0] for p in patterns[:-1]):
+            return _dict_lookup_tiered_load(dict_fname, patterns, mode, limit)
+    for t, pattern in enumerate(patterns):
+        res, ok = _dict_lookup(dict_fname, pattern, mode, limit)
+        if res or not ok:
+            break
+    return t, res, ok
+
+
+############################################################
+# query result cache
+#
+# Recent lookup results, keyed by dictionary path, size and mtime, search
+# pattern (which encodes the search options), mode and limit.  At most
+# cfg['query_cache'] results are kept, least recently used ones are
+# dropped first.  With cfg['query_cache_save'] set, the cache is saved
+# on exit and restored on the next start.
+
+_query_cache = OrderedDict()   # format: { (path, size, mtime, pattern, mode, limit): [Entry_0, ...], ... }
+_query_cache_lock = threading.Lock()
+_QUERY_CACHE_FILE = 'queries.json'
+
+def _query_cache_fname():
+    return os.path.join(_dict_cache_dir(), _QUERY_CACHE_FILE)
+
+def _query_cache_clear():
+    with _query_cache_lock:
+        _query_cache.clear()
+
+def _query_cache_key(dict_fname, pattern, mode, limit):
+    if cfg['query_cache']:
+        try:
+            st = os.stat(dict_fname)
+            return (os.path.realpath(dict_fname), st.st_size, st.st_mtime_ns, pattern, mode.value, limit)
+        except OSError:
+            pass
+    return None
+
+def _query_cache_get(key):
+    with _query_cache_lock:
+        res = _query_cache.get(key)
+        if res is not None:
+            _query_cache.move_to_end(key)
+    if _stats_enabled:
+        _stats_add('cache_misses' if res is None else 'cache_hits')
+    return res
+
+def _query_cache_put(key, res):
+    with _query_cache_lock:
+        _query_cache[key] = res
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > cfg['query_cache']:
+            _query_cache.popitem(last=False)
+
+def _query_lookup(dict_fname, pattern, mode, limit=0):
+    key = _query_cache_key(dict_fname, pattern, mode, limit)
+    res = _query_cache_get(key) if key else None
+    if res is not None:
+        return res, True
+    res, ok = _dict_lookup(dict_fname, pattern, mode, limit)
+    if ok and key:
+        _query_cache_put(key, res)
+    return res, ok
+
+# cached _dict_lookup_exact(), shares cache entries with _query_lookup()
+# for the single exact patterns
+def _query_lookup_exact(dict_fname, terms, mode, limit=0):
+    keys = [_query_cache_key(dict_fname, _TERM_START + t + _TERM_END, mode, limit) for t in terms]
+    result = [_query_cache_get(key) if key else None for key in keys]
+    missing = [i for i, res in enumerate(result) if res is None]
+    if missing:
+        res, ok = _dict_lookup_exact(dict_fname, [terms[i] for i in missing], mode, limit)
+        if not ok:
+            return [], False
+        for i, r in zip(missing, res):
+            result[i] = r
+            if keys[i]:
+                _query_cache_put(keys[i], r)
+    return result, True
+
+# cached _dict_lookup_tiered(): the tiered result for a list of patterns
+# is cached as empty results for the stricter ones and the result for
+# the pattern found
+def _query_lookup_tiered(dict_fname, patterns, mode, limit=0):
+    keys = [_query_cache_key(dict_fname, p, mode, limit) for p in patterns]
+    start = 0
+    for key in keys:
+        res = _query_cache_get(key) if key else None
+        if res is None:
+            break
+        if res or start == len(keys) - 1:
+            return start, res, True
+        start += 1
+    t, res, ok = _dict_lookup_tiered(dict_fname, patterns[start:], mode, limit)
+    if ok:
+        for key, r in zip(keys[start:start + t + 1], [[]] * t + [res]):
+            if key:
+                _query_cache_put(key, r)
+    return start + t, res, ok
+
+def _query_cache_save():
+    fname = _query_cache_fname()
+    with _query_cache_lock:
+        data = [[list(k), [list(e) for e in res]] for k, res in _query_cache.items()]
+    try:
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        tmp = '%s.%d.tmp' % (fname, os.getpid())
+        with open(tmp, 'w') as qfile:
+            json.dump(data, qfile)
+        os.replace(tmp, fname)
+    except Exception as e:
+        eprint('_query_cache_save:', fname, str(e))
+
+def _query_cache_load():
+    fname = _query_cache_fname()
+    try:
+        with open(fname, 'r') as qfile:
+            data = json.load(qfile)
+        with _query_cache_lock:
+            for k, res in data[-cfg['query_cache']:]:
+                _query_cache[tuple(k)] = [Entry(*e) for e in res]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        eprint('_query_cache_load:', fname, str(e))
+
+
+
+############################################################
+# word search
+#
+# The search as performed for the main window search box: term
+# conversion, search option patterns, verb de-inflection, and relaxing
+# the search options until something is found.  A lookupJob holds the
+# parameters of a single search; its report() and wait() methods are
+# hooks for the caller to show progress, and to have the search wait for
+# dictionaries loaded in the background.
+
+class lookupJob:
+    def __init__(self, term, mode, opt, dics, limit, auto):
+        self.term = term
+        self.mode = mode
+        self.opt = opt
+        self.dics = dics
+        self.limit = limit
+        self.auto = auto
+        self.cancelled = threading.Event()
+        self.timing = {}        # format: { 'phase': seconds, ... }
+        self.final_opt = opt    # after auto adjust
+        self.stats = _stats_new()
+
+    # what: 'progress', 'relaxed' (args: mode, opt), 'dict_error' (args: name)
+    def report(self, what, *args):
+        pass
+
+    # block until the dictionaries in paths are available; returns False,
+    # if the job got cancelled meanwhile
+    def wait(self, paths):
+        return True
+
+# convert Romaji (optional) and Katakana; returns (term, mode)
+def _search_term(term, romaji=False):
+    if romaji:
+        term = alphabet2kana(term)
+    term = kata2hira(term)
+    return term, ScanMode.JAP if _has_jap(term) else ScanMode.ENG
+
+# opt: index of the selected Japanese (exact, start, end, any) or
+# English (expression, word, any) search option
+def _search_apply_options(term, mode, opt):
+    s_term = term
+    if mode == ScanMode.JAP:
+        s_term = kata2hira(s_term)
+        if opt == 0:
+            s_term = _TERM_START + s_term
+            s_term = s_term + _TERM_END
+        elif opt == 1:
+            s_term = _TERM_START + s_term
+        elif opt == 2:
+            s_term = s_term + _TERM_END
+    else:
+        if opt == 0:
+            s_term = _EXPR_START + s_term + _EXPR_END
+        elif opt == 1:
+            s_term = _WORD_BOUND + s_term + _WORD_BOUND
+    return s_term
+
+# return the next more relaxed option, or None
+def _search_relax(mode, opt):
+    if opt < (3 if mode == ScanMode.JAP else 2):
+        return opt + 1
+    return None
+
+# de-inflection candidates for the job's term
+def _search_inflections(job):
+    if cfg['deinflect'] and job.mode == ScanMode.JAP and _vconj_ready():
+        return _vconj_deinflect(job.term)
+    return []
+
+def _search_deinflected(job, inflist, dic, limit):
+    # the inflected form index, if any, answers single inflections of
+    # regular verbs and adjectives; the rule based candidates cover what
+    # it misses
+    if cfg['inflect_index'] and _dict_lookup is _dict_lookup_load:
+        _dict_load(dic)
+    if dic in _dict_iidx:
+        result = _dict_lookup_inflected(dic, job.term, limit)
+        if result:
+            return result, True
+    result = []
+    # look up all distinct infinitive forms in one go
+    infis = list(dict.fromkeys(inf.infi for inf in inflist))
+    res, ok = _query_lookup_exact(dic, infis, job.mode, limit)
+    if not ok:
+        return result, ok
+    found = dict(zip(infis, res))
+    for inf in inflist:
+        if job.cancelled.is_set():
+            break
+        # keep only results belonging to a suitable word class and
+        # attach the inflection info; reject everything else
+        for r in found[inf.infi][:limit]:
+            if inf.wclass.search(r.gloss):
+                result.append(EntryEx(r.headword, r.reading, r.gloss, inf))
+                limit -= 1
+        if limit <= 0:
+            break
+    return result, ok
+
+# look up one dictionary with the job's options, relaxing them until
+# something is found; returns (deinflected, deinflect_ok, levels),
+# levels mapping each option tried to (result, ok)
+def _search_dict(job, d, inflist, limit):
+    with _stats_scope(job.stats):
+        return _search_dict_run(job, d, inflist, limit)
+
+def _search_dict_run(job, d, inflist, limit):
+    st = job.stats
+    deinf, deinf_ok = [], True
+    levels = {}
+    if cfg['dict_load']:
+        with _stats_phase(st, 'dict_load'):
+            ready = job.wait([d[1]])
+        if not ready:
+            return deinf, deinf_ok, levels
+    # search de-inflected verbs
+    if len(inflist) > 0:
+        with _stats_phase(st, 'deinflected'):
+            deinf, deinf_ok = _search_deinflected(job, inflist, d[1], limit)
+        job.report('progress')
+        limit -= len(deinf)
+        if limit <= 0 or not deinf_ok:
+            return deinf, deinf_ok, levels
+    # 'normal' search
+    if not job.cancelled.is_set():
+        with _stats_phase(st, 'scan'):
+            _search_levels(job, d, job.opt, limit, levels)
+    return deinf, deinf_ok, levels
+
+# look up the options from opt on (just opt without auto adjust) in a
+# single pass, up to the first one giving any result; record the
+# (result, ok) for each option covered in levels
+def _search_levels(job, d, opt, limit, levels):
+    opts = [opt]
+    while job.auto and _search_relax(job.mode, opts[-1]) is not None:
+        opts.append(_search_relax(job.mode, opts[-1]))
+    patterns = [_search_apply_options(job.term, job.mode, o) for o in opts]
+    t, r, ok = _query_lookup_tiered(d[1], patterns, job.mode, limit)
+    job.report('progress')
+    for o in opts[:t]:
+        levels[o] = ([], True)
+    levels[opts[t]] = (r, ok)
+
+# look up all dictionaries of a job concurrently, then merge the results
+# in dictionary order; with more than one dictionary each dictionary's
+# results are preceded by an Entry('#', '', name) caption; returns None,
+# if the job got cancelled
+def _search_lookup(job):
+    with _stats_scope(job.stats):
+        return _search_lookup_run(job)
+
+def _search_lookup_run(job):
+    st = job.stats
+    mode = job.mode
+    opt = job.opt
+    dics = job.dics
+    limit = job.limit
+    t0 = time.perf_counter()
+    inflist = _search_inflections(job)
+    t1 = time.perf_counter()
+    job.timing['deinflect'] = t1 - t0
+    if st:
+        st.add('deinflect_candidates', len(inflist))
+    result = []
+    futures = []
+    pool = ThreadPoolExecutor(max_workers=max(1, min(len(dics), os.cpu_count() or 1)))
+    try:
+        futures = [pool.submit(_search_dict, job, d, inflist, limit) for d in dics]
+        for d, f in zip(dics, futures):
+            deinf, ok, levels = f.result()
+            if job.cancelled.is_set():
+                return None
+            # add dictionary caption
+            if len(dics) > 1:
+                result.append(Entry('#', '', d[0]))
+            # de-inflected verbs
+            if len(inflist) > 0:
+                result.extend(deinf[:limit])
+                limit -= len(deinf)
+                if limit <= 0:
+                    break
+                if not ok:
+                    job.report('dict_error', d[0])
+                    continue
+            # 'normal' search; options relaxed for a previous
+            # dictionary stay relaxed, as in a sequential search
+            rlen = len(result)
+            while ok and not job.cancelled.is_set():
+                if opt not in levels:
+                    with _stats_phase(st, 'relax'):
+                        _search_levels(job, d, opt, limit, levels)
+                r, ok = levels[opt]
+                result.extend(r[:limit])
+                limit -= len(r)
+                if not ok:
+                    job.report('dict_error', d[0])
+                # relax search options
+                if limit <= 0 or len(result) != rlen or not job.auto:
+                    break
+                relaxed = _search_relax(mode, opt)
+                if relaxed is None:
+                    break
+                opt = relaxed
+                if st:
+                    st.add('relax_steps')
+                job.report('relaxed', mode, opt)
+            if limit <= 0:
+                break
+    finally:
+        # don't wait for lookups no longer needed
+        for f in futures:
+            f.cancel()
+        pool.shutdown(wait=False)
+    if job.cancelled.is_set():
+        return None
+    job.timing['lookup'] = time.perf_counter() - t1
+    job.final_opt = opt
+    if st:
+        st.timing.update(job.timing)
+        st.add('results', sum(1 for r in result if r.headword != '#'))
+    return result
+
+
+############################################################
+# kanji <--> radical cross-reference
+
+_srad = [''] * 20   # format: [ stroke_cnt -> 'radical_list' ]
+_radk = dict()      # format: { 'radical': [stroke_cnt, 'kanji_list'], ... }
+_krad = dict()      # format: { 'kanji': 'radical_list', ... }
+
+def _rad_load(version):
+    for x in range(len(_srad)):
+        _srad[x] = ''
+    _radk.clear()
+    _krad.clear()
+    res = True
+    t = time.perf_counter()
+    for v in range(version):
+        radk_name = _JITENPAI_RADK[v]
+        if not os.access(radk_name, os.R_OK):
+            radk_name = _get_dfile_path(os.path.join(_JITENPAI_DIR, radk_name), mode=os.R_OK)
+        try:
+            with open(radk_name) as radk_file:
+                re_radic = re.compile(r'^\$\s+(.)\s+(\d+)')
+                re_kanji = re.compile(r'^([^#$]\S*)')
+                radical = '?'
+                for line in radk_file:
+                    m = re_kanji.search(line)
+                    if m:
+                        _radk[radical][1] += m.group(1)
+                        continue
+                    m = re_radic.search(line)
+                    if m:
+                        radical = m.group(1)
+                        if radical not in _radk:
+                            stroke = int(m.group(2))
+                            _radk[radical] = [stroke, '']
+                            _srad[stroke] += radical
+        except Exception as e:
+            eprint('_rad_load:', radk_name, str(e))
+            res = False
+    _mem_load_time['_radk'] = time.perf_counter() - t
+    t = time.perf_counter()
+    for v in range(version):
+        krad_name = _JITENPAI_KRAD[v]
+        if not os.access(krad_name, os.R_OK):
+            krad_name = _get_dfile_path(os.path.join(_JITENPAI_DIR, krad_name), mode=os.R_OK)
+        try:
+            with open(krad_name) as krad_file:
+                re_krad = re.compile(r'^([^#\s]) : (.+)$')
+                for line in krad_file:
+                    m = re_krad.search(line)
+                    if m:
+                        _krad[m.group(1)] = m.group(2).replace(' ', '')
+        except Exception as e:
+            eprint('_rad_load:', krad_name, str(e))
+            res = False
+    _mem_load_time['_krad'] = time.perf_counter() - t
+    return res
+
+def _rad2k(rad):
+    try:
+        return _radk[rad]
+    except:
+        return ['', '']
+
+def _k2rad(kanji):
+    try:
+        return _krad[kanji]
+    except:
+        return ''
+
+# load kanjidic
+# See: http://www.edrdg.org/kanjidic/kanjidic_doc_legacy.html#IREF02
+#
+# kanjidic1 example lines:
+#
+# 心 3F34 U5fc3 B61 G2 S4 XJ13D38 F157 J3 N1645 V1780 H11 DP11 DK4 DL4 L595
+# DN639 K139 O49 DO80 MN10295 MP4.0937 E147 IN97 DA97 DS95 DF172 DH164 DT96
+# DC64 DJ172 DB2.14 DG766 DM602 P1-1-3 I4k0.1 Q3300.0 DR358 ZPP4-4-4 Yxin1
+# Wsim シン こころ -ごころ T2 りっしんべん {heart} {mind} {spirit} {heart radical (no. 61)}
+#
+# 逢 3029 U9022 B162 G9 S10 S9 S11 F2116 N4694 V6054 DP4002 DL2774 L2417
+# DN2497 O1516 MN38901X MP11.0075 P3-3-7 I2q7.15 Q3730.4 DR2555 ZRP3-4-7
+# Yfeng2 Wbong ホウ あ.う むか.える T1 あい おう {meeting} {tryst} {date} {rendezvous}
+#
+# 挨 3027 U6328 B64 G8 S10 F2258 N1910 V2160 DP510 DL383 L2248 DN1310 MN12082
+# MP5.0229 DA1101 P1-3-7 I3c7.12 Q5303.4 DR1363 Yai1 Yai2 Wae アイ ひら.く
+# {approach} {draw near} {push open}
+
+_kanjidic = dict()     # format: { 'kanji': {info}, ...}
+
+def _kanjidic1_load(dict_fname):
+    ktable = [
+        ['F', 'freq'],
+        ['G', 'grade'],
+        ['S', 'strokes'],
+        ['W', 'r_korean'],
+        ['Y', 'r_pinyin'],
+    ]
+    re_braces = re.compile(r'\{.*\}.*$')
+    re_tags = re.compile(r'[BCFGJHNVDPSUIQMEKLOWYXZ]\S+')
+    krad_set = 1
+    try:
+        with open(dict_fname) as dict_file:
+            for line in dict_file:
+                if line[0] in '# ':
+                    if 'KANJD212' in line:
+                        krad_set = 2
+                    continue
+                info = {
+                    'strokes': '',
+                    'readings': '',
+                    'r_korean': '',
+                    'r_pinyin': '',
+                    'meaning': '',
+                    'freq': '',
+                    'grade': '',
+                }
+                kanji = line[0]
+                # skip kanji and JIS code
+                line = line[6:]
+                # save meaning
+                m = re_braces.search(line)
+                if m:
+                    info['meaning'] = m.group(0).replace('{', '').replace('}', ';').strip()
+                    line = re_braces.sub('', line)
+                # get tags
+                tlist = []
+                while True:
+                    m = re_tags.search(line)
+                    if m is None:
+                        break;
+                    tlist.append(m.group(0))
+                    line = re_tags.sub('', line, 1)
+                for t in tlist:
+                    for k in ktable:
+                        # if a tag appears more than once the first one wins,
+                        # e.g. 'S<num>' (stroke count)
+                        if t[:len(k[0])] == k[0] and not info[k[1]]:
+                            info[k[1]] = t[len(k[0]):]
+                            break
+                # get readings (i.e. all that's left)
+                info['readings'] = line.strip().replace(' ', ', ').replace('T2,', 'T2').replace('T1,', 'T1')
+                _kanjidic[kanji] = info
+    except Exception as e:
+        eprint('_kanjidic1_load:', dict_fname, str(e))
+        return False, 0, 0
+    return True, 1, krad_set
+
+# load kanjidic2.xml
+# See: http://www.edrdg.org/wiki/index.php/KANJIDIC_Project#Content_.26_Format
+
+def _kanjidic2_load(dict_fname):
+    import xml.etree.ElementTree as ET
+    try:
+        for char in ET.parse(dict_fname).iterfind('character'):
+            kanji = char.find('literal').text
+            info = {
+                'strokes': '',
+                'readings': '',
+                'r_korean': '',
+                'r_pinyin': '',
+                'meaning': '',
+                'freq': '',
+                'grade': '',
+            }
+            misc = char.find('misc')
+            for strokes in misc.findall('stroke_count'):
+                info['strokes'] = strokes.text
+                break
+            for freq in misc.findall('freq'):
+                info['freq'] = freq.text
+                break
+            for grade in misc.findall('grade'):
+                info['grade'] = grade.text
+                break
+            rm = char.find('reading_meaning')
+            if rm:
+                rm_group = rm.find('rmgroup')
+                for rd in rm_group.findall('reading'):
+                    r_type = rd.attrib['r_type']
+                    if r_type == 'korean_r':
+                        info['r_korean'] = rd.text
+                    elif r_type == 'pinyin':
+                        info['r_pinyin'] = rd.text
+                    elif r_type[:3] == 'ja_':
+                        info['readings'] += '%s, ' % rd.text
+                for m in rm_group.findall('meaning'):
+                    if m.attrib.get('m_lang', 'en') == 'en':
+                        info['meaning'] += '%s; ' % m.text
+                nanori = ''
+                for n in rm.findall('nanori'):
+                    nanori += '%s, ' % n.text
+                if nanori:
+                    info['readings'] += 'T1 %s' % nanori
+            rad_name = ''
+            for n in misc.findall('rad_name'):
+                rad_name +=  '%s, ' % n.text
+            if rad_name:
+                info['readings'] += 'T2 %s' % rad_name
+            info['readings'] = info['readings'].rstrip(', ')
+            _kanjidic[kanji] = info
+    except Exception as e:
+        eprint('_kanjidic2_load:', dict_fname, str(e))
+        return False, 0, 0
+    return True, 2, 2
+
+def _kanjidic_load(dict_fname):
+    _kanjidic.clear()
+    t = time.perf_counter()
+    res = False, 0, 0
+    tag_line = ''
+    try:
+        with open(dict_fname) as f:
+            tag_line = f.readline()
+        if '<?xml' in tag_line:
+            res = _kanjidic2_load(dict_fname)
+        else:
+            res = _kanjidic1_load(dict_fname)
+    except Exception as e:
+        eprint('_kanjidic_load:', dict_fname, str(e))
+    _mem_load_time['_kanjidic'] = time.perf_counter() - t
+    return res
+
+def _kanjidic_lookup(kanji):
+    try:
+        kanji = kanji[0]
+        res = {
+            'kanji': kanji,
+            'radicals': _k2rad(kanji),
+        }
+        res.update(_kanjidic[kanji])
+    except:
+        res = {}
+    return res
+
+def _kanjidic_full_text_search(dict_fname, text):
+    kanji = ''
+    try:
+        with open(dict_fname) as dict_file:
+            for line in dict_file:
+                if line[0] in '# ':
+                    continue
+                if text in line.lower():
+                    kanji += line[0]
+    except Exception as e:
+        eprint('_kanjidic_full_text_search:', dict_fname, str(e))
+    return kanji
+
+def _s2kanji(min_strokes, max_strokes=-1):
+    if max_strokes < 0:
+        max_strokes = min_strokes
+    res = ''
+    for k, v in _kanjidic.items():
+        try:
+            s = int(v['strokes'])
+        except:
+            continue
+        if min_strokes <= s <= max_strokes:
+            res += k
+    return res
+
+# set of kanji in dict_fname matching all given criteria; strokes: (min, max)
+# or None, rads: string of radicals, text: lower case full text search term;
+# timing: dict receiving the seconds spent per criterion, or None
+def _kanjidic_search(dict_fname, strokes=None, rads='', text='', timing=None):
+    clock = time.perf_counter
+    if timing is None:
+        timing = {}
+    sets = []
+    # kanji set based on stroke count
+    if strokes:
+        t = clock()
+        sets.append(set(_s2kanji(strokes[0], strokes[1])))
+        timing['strokes'] = clock() - t
+    # kanji set for each radical
+    if rads:
+        t = clock()
+        for rad in rads:
+            sets.append(set(_rad2k(rad)[1]))
+        timing['radicals'] = clock() - t
+    # kanji set based on full text search
+    if text:
+        t = clock()
+        sets.append(set(_kanjidic_full_text_search(dict_fname, text)))
+        timing['text'] = clock() - t
+    # get intersection of all kanji sets
+    t = clock()
+    res = set()
+    if len(sets) > 0:
+        res = sets[0]
+        for s in sets[1:]:
+            res = res.intersection(s)
+    timing['intersect'] = clock() - t
+    return res
+
+# memory report rows, see _mem_rows()
+def _kanjidic_mem_rows():
+    return [
+        ('_kanjidic', len(_kanjidic), _mem_sizeof(_kanjidic), _mem_load_time.get('_kanjidic')),
+        ('_radk', len(_radk), _mem_sizeof(_radk, _srad), _mem_load_time.get('_radk')),
+        ('_krad', len(_krad), _mem_sizeof(_krad), _mem_load_time.get('_krad')),
+    ]
+
+
+############################################################
+# query log
+#
+# Opt-in: with a log file set in cfg['query_log'] or on the command line,
+# each search made in the GUI appends one line of JSON:
+#   {"time": 1634000000.0, "kind": "word"|"kanji_search"|"kanji_info",
+#    "term": "...", "options": {...}, "pattern": "...", "dicts": [...],
+#    "count": 3, "timing": {"phase": milliseconds, ...}}
+# The term is recorded as entered, see benchmark.py --replay.
+
+_qlog_file = None
+_qlog_lock = threading.Lock()
+
+def _qlog_open(fname):
+    global _qlog_file
+    if not fname or _qlog_file:
+        return
+    try:
+        _qlog_file = open(fname, 'a', encoding='utf-8')
+    except Exception as e:
+        eprint('_qlog_open:', fname, str(e))
+
+def _qlog_active():
+    return _qlog_file is not None
+
+# timing: { 'phase': seconds, ... }
+def _qlog_write(kind, term, options, pattern, dicts, count, timing):
+    rec = {
+        'time': round(time.time(), 3),
+        'kind': kind,
+        'term': term,
+        'options': options,
+        'pattern': pattern,
+        'dicts': dicts,
+        'count': count,
+        'timing': {k: round(v * 1000, 3) for k, v in timing.items()},
+    }
+    line = json.dumps(rec, ensure_ascii=False) + '\n'
+    with _qlog_lock:
+        try:
+            _qlog_file.write(line)
+            _qlog_file.flush()
+        except Exception as e:
+            eprint('_qlog_write:', str(e))
+
+# log a finished word search job; term: as entered
+def _qlog_word(job, term, romaji, count, timing):
+    options = {
+        'mode': job.mode.name,
+        'opt': job.opt,
+        'final_opt': job.final_opt,
+        'romaji': romaji,
+        'auto': job.auto,
+        'limit': job.limit,
+        'deinflect': cfg['deinflect'],
+    }
+    _qlog_write('word', term, options, _search_apply_options(job.term, job.mode, job.opt),
+                job.dics, count, timing)
+
+
+############################################################
+# search statistics
+#
+# Off by default, costing a flag test per lookup at most.  Enabled with
+# _stats_setup(), each search job gets a searchStats collecting the time
+# spent per phase (summed over dictionaries, which are searched
+# concurrently) and counters: entries scanned, index lookups, query cache
+# hits and misses, narrowing hits, relax steps.  Code running on behalf
+# of a job finds its stats through _stats_local.  The GUI shows a summary
+# in the status bar; with a dump file given, each search's figures are
+# also appended to it as a line of JSON.
+
+_stats_enabled = False
+_stats_dump = None
+_stats_lock = threading.Lock()
+_stats_local = threading.local()
+
+class searchStats:
+    def __init__(self):
+        self.timing = {}    # format: { 'phase': seconds, ... }
+        self.counts = {}    # format: { 'counter': n, ... }
+        self.lock = threading.Lock()
+
+    def add(self, counter, n=1):
+        with self.lock:
+            self.counts[counter] = self.counts.get(counter, 0) + n
+
+    def add_time(self, phase, secs):
+        with self.lock:
+            self.timing[phase] = self.timing.get(phase, 0) + secs
+
+    def summary(self):
+        with self.lock:
+            t = ', '.join('%s %.1f' % (k, v * 1000) for k, v in self.timing.items())
+            c = ', '.join('%s %d' % (k.replace('_', ' '), v) for k, v in self.counts.items())
+        return 'ms: %s | %s' % (t, c)
+
+class _statsPhase:
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.stats.add_time(self.phase, time.perf_counter() - self.t)
+
+class _statsScope:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.prev = getattr(_stats_local, 'stats', None)
+        _stats_local.stats = self.stats
+
+    def __exit__(self, *args):
+        _stats_local.stats = self.prev
+
+_stats_null = contextlib.nullcontext()
+
+# dump: file name ('-' for stderr) to append JSON lines to, '' or '1'
+# for none; None: leave disabled
+def _stats_setup(dump):
+    global _stats_enabled, _stats_dump
+    if dump is None:
+        return
+    _stats_enabled = True
+    if dump == '-':
+        _stats_dump = sys.stderr
+    elif dump not in ('', '1'):
+        try:
+            _stats_dump = open(dump, 'a', encoding='utf-8')
+        except Exception as e:
+            eprint('_stats_setup:', dump, str(e))
+
+def _stats_active():
+    return _stats_enabled
+
+def _stats_new():
+    return searchStats() if _stats_enabled else None
+
+# time the enclosed code as phase of stats, if any
+def _stats_phase(stats, phase):
+    return _statsPhase(stats, phase) if stats else _stats_null
+
+# make stats the current thread's ones for the enclosed code
+def _stats_scope(stats):
+    return _statsScope(stats) if stats else _stats_null
+
+def _stats_add(counter, n=1):
+    st = getattr(_stats_local, 'stats', None)
+    if st is not None:
+        st.add(counter, n)
+
+def _stats_add_time(phase, secs):
+    st = getattr(_stats_local, 'stats', None)
+    if st is not None:
+        st.add_time(phase, secs)
+
+# count items as they are consumed
+def _stats_counted(items, counter):
+    st = getattr(_stats_local, 'stats', None)
+    if st is None:
+        return items
+    def counted():
+        n = 0
+        try:
+            for item in items:
+                n += 1
+                yield item
+        finally:
+            st.add(counter, n)
+    return counted()
+
+def _stats_write(kind, term, stats):
+    if _stats_dump is None:
+        return
+    with stats.lock:
+        rec = {
+            'time': round(time.time(), 3),
+            'kind': kind,
+            'term': term,
+            'timing': {k: round(v * 1000, 3) for k, v in stats.timing.items()},
+            'counts': dict(stats.counts),
+        }
+    line = json.dumps(rec, ensure_ascii=False) + '\n'
+    with _stats_lock:
+        try:
+            _stats_dump.write(line)
+            _stats_dump.flush()
+        except Exception as e:
+            eprint('_stats_write:', str(e))
+
+
+############################################################
+# lookup server
+#
+# A long running process can keep the dictionaries loaded and answer
+# lookups over a Unix domain socket.  Requests and responses are single
+# lines of JSON:
+#   {"word": "...", "opt": 0, "limit": 100, "auto": true, "romaji": false, "dict": "name"}
+#       -> {"ok": true, "result": [[headword, reading, gloss, inflection], ...]}
+#          (a headword of '#' marks a dictionary caption, as with _search_lookup)
+#   {"kanji": "..."}
+#       -> {"ok": true, "result": {"kanji": ..., "readings": ..., ...}}
+#   {"show": true, "word" | "kanji": "..."}
+#       -> {"ok": true}, if the server runs in a GUI window that shows the lookup
+# Failures are answered by {"ok": false, "error": "..."}.
+
+_kd_loaded = None
+_kd_lock = threading.Lock()
+
+def _server_sock_path():
+    rdir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(rdir, '%s-%d.sock' % (_JITENPAI_DIR, os.getuid()))
+
+# load the kanji dictionary on first use; returns True, if it is available
+def _server_kanjidic():
+    global _kd_loaded
+    with _kd_lock:
+        if _kd_loaded is None:
+            ok, _, krad_set = _kanjidic_load(cfg['kanjidic'])
+            if ok:
+                _rad_load(krad_set)
+            _kd_loaded = ok
+    return _kd_loaded
+
+# wait: callable(paths, cancel) blocking until dictionaries are loaded, or None
+def _server_word(req, wait=None):
+    term, mode = _search_term(req['word'].strip(), req.get('romaji', False))
+    if not term:
+        raise ValueError('empty search term')
+    dics = cfg['dicts']
+    if req.get('dict'):
+        dics = [d for d in dics if d[0] == req['dict']]
+        if not dics:
+            raise ValueError('unknown dictionary: %s' % req['dict'])
+    opt = int(req.get('opt', 0))
+    if not 0 <= opt <= (3 if mode == ScanMode.JAP else 2):
+        raise ValueError('invalid search option: %d' % opt)
+    limit = req.get('limit', cfg['limit'])
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        raise ValueError('invalid limit')
+    limit = min(limit, cfg['hardlimit'])
+    job = lookupJob(term, mode, opt, dics, limit, req.get('auto', cfg['auto_adj']))
+    if wait is not None:
+        job.wait = lambda paths: wait(paths, job.cancelled)
+    result = _search_lookup(job)
+    return [[r.headword, r.reading, r.gloss, r.inf.blurb if len(r) > 3 else ''] for r in result]
+
+def _server_kanji(req):
+    if not _server_kanjidic():
+        raise ValueError('kanji dictionary not available')
+    return _kanjidic_lookup(req['kanji'])
+
+class serverHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                if req.get('show'):
+                    if self.server.show is None or not ('word' in req or 'kanji' in req):
+                        raise ValueError('cannot show lookup')
+                    self.server.show(req)
+                    resp = {'ok': True}
+                elif 'word' in req:
+                    resp = {'ok': True, 'result': _server_word(req, self.server.wait)}
+                elif 'kanji' in req:
+                    resp = {'ok': True, 'result': _server_kanji(req)}
+                else:
+                    raise ValueError('invalid request')
+            except Exception as e:
+                resp = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(resp, ensure_ascii=False).encode() + b'\n')
+            self.wfile.flush()
+
+class lookupServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    # show: callable taking a 'show' request, or None
+    # wait: see _server_word()
+    def __init__(self, path, show=None, wait=None):
+        self.show = show
+        self.wait = wait
+        # replace a stale socket, but don't hijack a live server
+        if os.path.exists(path):
+            sock = _client_connect(path)
+            if sock is not None:
+                sock.close()
+                raise OSError('server already running on %s' % path)
+            os.unlink(path)
+        super().__init__(path, serverHandler, bind_and_activate=False)
+        try:
+            # create the socket accessible to its owner only
+            umask = os.umask(0o177)
+            try:
+                self.server_bind()
+            finally:
+                os.umask(umask)
+            self.server_activate()
+        except:
+            self.server_close()
+            raise
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+# load everything needed for lookups up front
+def _server_prepare():
+    _vconj_ready()
+    if cfg['dict_load']:
+        for d in cfg['dicts']:
+            _dict_load(d[1])
+
+def _server_run(path):
+    try:
+        server = lookupServer(path)
+    except Exception as e:
+        eprint('_server_run:', path, str(e))
+        return False
+    try:
+        _server_prepare()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return True
+
+def _client_connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return sock
+    except OSError:
+        sock.close()
+    return None
+
+# send one request, returns the response, or None if no server is running
+def _client_request(path, req):
+    sock = _client_connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile('rwb') as f:
+        f.write(json.dumps(req, ensure_ascii=False).encode() + b'\n')
+        f.flush()
+        return json.loads(f.readline())
+
+def _client_print(resp, as_json=False):
+    if as_json:
+        print(json.dumps(resp, ensure_ascii=False))
+    elif not resp['ok']:
+        eprint(resp['error'])
+    elif isinstance(resp.get('result'), dict):
+        for k, v in resp['result'].items():
+            print('%s: %s' % (k, v))
+    else:
+        for headword, reading, gloss, inf in resp.get('result', []):
+            if headword == '#':
+                print('# %s' % gloss)
+                continue
+            if inf:
+                print('  (%s)' % inf)
+            print('%s%s%s' % (headword, ' [%s]' % reading if reading else '', gloss))
+
+
+############################################################
+# batch lookup
+#
+# Terms are read one per line and looked up just like in the main window
+# by a pool of worker processes.  Results are written in input order,
+# either as tab separated values: term, dictionary, headword, reading,
+# gloss, inflection (a term without any match gets a line holding only
+# the term), or as JSON lines: {"term": ..., "result": [{...}, ...]}.
+
+_BATCH_FIELDS = ['dict', 'headword', 'reading', 'gloss', 'inflection']
+_BATCH_JAP_OPT = ['exact', 'start', 'end', 'any']
+_BATCH_ENG_OPT = ['expr', 'word', 'any']
+
+_batch_args = None
+
+# per process set up; args: see _batch_run()
+def _batch_init(args):
+    global _batch_args
+    _batch_args = args
+    cfg.update(args['cfg'])
+    _dict_set_load(cfg['dict_load'])
+    _vconj_ready()
+    if cfg['dict_load']:
+        for d in args['dics']:
+            _dict_load(d[1])
+
+# returns (line, [[dict, headword, reading, gloss, inflection], ...])
+def _batch_lookup(line):
+    a = _batch_args
+    line = line.strip()
+    rows = []
+    term, mode = _search_term(line, a['romaji'])
+    opt = a['jap_opt'] if mode == ScanMode.JAP else a['eng_opt']
+    job = lookupJob(term, mode, opt, a['dics'], a['limit'], a['auto'])
+    try:
+        result = _search_lookup(job)
+    except Exception as e:
+        eprint('_batch_lookup:', line, str(e))
+        return line, rows
+    dname = a['dics'][0][0] if a['dics'] else ''
+    for r in result:
+        if r.headword == '#':
+            dname = r.gloss
+            continue
+        rows.append([dname, r.headword, r.reading, r.gloss.strip(), r.inf.blurb if len(r) > 3 else ''])
+    return line, rows
+
+def _batch_write(out, fmt, line, rows):
+    if fmt == 'jsonl':
+        res = [dict(zip(_BATCH_FIELDS, row)) for row in rows]
+        out.write(json.dumps({'term': line, 'result': res}, ensure_ascii=False) + '\n')
+        return
+    for row in rows or [[]]:
+        out.write('\t'.join(f.replace('\t', ' ') for f in [line] + row) + '\n')
+
+# args: { 'cfg': cfg, 'dics': [...], 'jap_opt': int, 'eng_opt': int,
+#         'limit': int, 'auto': bool, 'romaji': bool }
+def _batch_run(fname, fmt, jobs, args):
+    try:
+        infile = sys.stdin if fname == '-' else open(fname)
+    except Exception as e:
+        eprint('_batch_run:', fname, str(e))
+        return False
+    import multiprocessing
+    with infile:
+        lines = (line for line in infile if line.strip())
+        # load in this process first: forked workers share the result
+        _batch_init(args)
+        if jobs > 1:
+            with multiprocessing.Pool(jobs, _batch_init, (args,)) as pool:
+                for line, rows in pool.imap(_batch_lookup, lines, chunksize=16):
+                    _batch_write(sys.stdout, fmt, line, rows)
+        else:
+            for line, rows in map(_batch_lookup, lines):
+                _batch_write(sys.stdout, fmt, line, rows)
+    return True
+
+
+############################################################
+# memory statistics
+#
+# Entry counts, approximate deep sizes and load times of the loaded data
+# structures, and the peak resident set size of the process, as shown by
+# --stats and the main window's Help→Diagnostics dialog.  A deep size is
+# the sum of sys.getsizeof() over all objects reachable through
+# containers, each counted once.  While tracemalloc is tracing (see
+# --tracemalloc, or PYTHONTRACEMALLOC=1 for the GUI) the report also lists
+# the source lines that allocated most of the memory still held.
+
+_mem_load_time = {}  # format: { 'filename_1' | 'structure': seconds, ... }
+
+def _mem_sizeof(*objs):
+    seen = set()
+    todo = list(objs)
+    size = 0
+    while todo:
+        o = todo.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            todo.extend(o.keys())
+            todo.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            todo.extend(o)
+        elif hasattr(o, '__dict__') and not isinstance(o, type):
+            todo.append(vars(o))
+    return size
+
+def _mem_fmt(size):
+    if size < 1024:
+        return '%d B' % size
+    for unit in ['KiB', 'MiB', 'GiB']:
+        size /= 1024
+        if size < 1024:
+            break
+    return '%.1f %s' % (size, unit)
+
+# peak resident set size in bytes, or None, if unknown
+def _mem_peak_rss():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    except Exception:
+        return None
+
+# report rows for the loaded data structures, format:
+#   [ (name, entries, bytes, load_seconds), ... ]
+# entries and load_seconds may be None; rows whose name starts with a
+# blank break down the size of the row above
+def _mem_rows():
+    rows = []
+    names = {d[1]: d[0] for d in cfg['dicts']}
+    for d, dic in list(_dict.items()):
+        if not dic:
+            continue
+        parts = [
+            ('entries', dic), ('jidx', _dict_jidx.get(d)), ('jsa', _dict_jsa.get(d)),
+            ('eidx', _dict_eidx.get(d)), ('blob', _dict_blob.get(d)), ('iidx', _dict_iidx.get(d)),
+        ]
+        parts = [(p, _mem_sizeof(o)) for p, o in parts if o]
+        rows.append(('_dict ' + names.get(d, os.path.basename(d)), len(dic),
+                     sum(size for _, size in parts), _mem_load_time.get(d)))
+        rows.extend(('  ' + p, None, size, None) for p, size in parts)
+    rows.append(('_dict_narrow', len(_dict_narrow), _mem_sizeof(_dict_narrow), None))
+    rows.append(('_vconj_deinf', len(_vconj_deinf),
+                 _mem_sizeof(_vconj_type, _vconj_deinf, _vconj_suffix, _vconj_other, _vconj_memo),
+                 _mem_load_time.get('_vconj_deinf')))
+    with _query_cache_lock:
+        rows.append(('_query_cache', len(_query_cache), _mem_sizeof(_query_cache), None))
+    # kanjidic only if loaded
+    if _kanjidic or _radk or _krad:
+        rows.extend(_kanjidic_mem_rows())
+    return rows
+
+# format rows as returned by _mem_rows() as text; top: number of source
+# lines to list, if tracemalloc is tracing
+def _mem_report(rows, top=10):
+    fmt = '%-24s %10s %12s %10s'
+    lines = [fmt % ('data', 'entries', 'size', 'load ms')]
+    total = 0
+    for name, n, size, secs in rows:
+        lines.append((fmt % (name, '' if n is None else n, _mem_fmt(size),
+                             '' if secs is None else '%.1f' % (secs * 1000))).rstrip())
+        if not name.startswith(' '):
+            total += size
+    lines.append((fmt % ('total', '', _mem_fmt(total), '')).rstrip())
+    lines.append('')
+    rss = _mem_peak_rss()
+    lines.append('peak RSS: %s' % (_mem_fmt(rss) if rss is not None else 'unknown'))
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        lines.append('tracemalloc: not tracing')
+        return '\n'.join(lines)
+    cur, peak = tracemalloc.get_traced_memory()
+    lines.append('tracemalloc: %s traced, peak %s; largest by source line:' % (_mem_fmt(cur), _mem_fmt(peak)))
+    snap = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ])
+    for st in snap.statistics('lineno')[:top]:
+        frame = st.traceback[0]
+        lines.append('%12s  %s:%d' % (_mem_fmt(st.size), os.path.basename(frame.filename), frame.lineno))
+    return '\n'.join(lines)
+
+# load all word dictionaries, the VCONJ rules and the kanji dictionary, then
+# print the report; top: number of source lines to attribute memory to, 0 to
+# not trace allocations
+def _mem_main(top):
+    if top:
+        import tracemalloc
+        tracemalloc.start()
+    _dict_set_load(True)
+    for d in cfg['dicts']:
+        _dict_load(d[1])
+    _vconj_ready()
+    _server_kanjidic()
+    print(_mem_report(_mem_rows(), top))
+
+
+############################################################
+# main function
+#
+# Without a server running, the client falls back to looking up words
+# in-process.
+
+def _parse_cmdline():
+    parser = ArgumentParser(
+        formatter_class=lambda prog: RawTextHelpFormatter(prog, max_help_position=40),
+        description='Jiten-pai dictionary lookup server and client',
+        epilog='Only one of --server, --batch, --stats, -w and -l should be used at a time.\n'
+               'Search options default to the ones last used in the main window.\n'
+    )
+    parser.add_argument('--server', action='count', help='load dictionaries and answer lookups on SOCKET')
+    parser.add_argument('-w', '--word-lookup', metavar='WORD', help='look up WORD in word dictionary')
+    parser.add_argument('-l', '--kanji-lookup', metavar='KANJI', help='look up KANJI in kanji dictionary')
+    parser.add_argument('--show', action='count', help='show lookup in the window of a GUI server')
+    parser.add_argument('--json', action='count', help='print the raw JSON response')
+    parser.add_argument('--socket', metavar='SOCKET', default=_server_sock_path(), help='server socket (default: %(default)s)')
+    parser.add_argument('--batch', metavar='FILE', nargs='?', const='-', help='look up each line of FILE (default: stdin)')
+    parser.add_argument('--format', choices=['tsv', 'jsonl'], default='tsv', help='batch output format (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=os.cpu_count() or 1, help='batch worker processes (default: %(default)s)')
+    parser.add_argument('--dict', metavar='NAME', help='look up words in dictionary NAME only')
+    parser.add_argument('--jap-opt', choices=_BATCH_JAP_OPT, help='Japanese search option')
+    parser.add_argument('--eng-opt', choices=_BATCH_ENG_OPT, help='English search option')
+    parser.add_argument('--limit', metavar='N', type=int, help='limit number of results per term')
+    parser.add_argument('--no-auto', action='count', help='do not relax search options without results')
+    parser.add_argument('--romaji', action='count', help='convert Romaji search terms to Kana')
+    parser.add_argument('--stats', action='count', help='load all dictionaries and report their memory use')
+    parser.add_argument('--tracemalloc', metavar='N', nargs='?', type=int, const=10, default=0,
+                        help='with --stats, list the N source lines allocating most (default: 10)')
+    return parser, parser.parse_args()
+
+def _main():
+    parser, cl_args = _parse_cmdline()
+    _load_cfg()
+    if cl_args.server:
+        die(0 if _server_run(cl_args.socket) else 1)
+    if cl_args.stats:
+        _mem_main(cl_args.tracemalloc)
+        die(0)
+    if cl_args.batch:
+        dics = [d for d in cfg['dicts'] if not cl_args.dict or d[0] == cl_args.dict]
+        if not dics:
+            eprint('unknown dictionary:', cl_args.dict)
+            die(2)
+        jap_opt = cfg['jap_opt'].index(True) if True in cfg['jap_opt'] else len(cfg['jap_opt']) - 1
+        eng_opt = cfg['eng_opt'].index(True) if True in cfg['eng_opt'] else len(cfg['eng_opt']) - 1
+        args = {
+            'cfg': cfg,
+            'dics': dics,
+            'jap_opt': _BATCH_JAP_OPT.index(cl_args.jap_opt) if cl_args.jap_opt else jap_opt,
+            'eng_opt': _BATCH_ENG_OPT.index(cl_args.eng_opt) if cl_args.eng_opt else eng_opt,
+            'limit': cl_args.limit or (cfg['limit'] if cfg['do_limit'] else cfg['hardlimit']),
+            'auto': cfg['auto_adj'] and not cl_args.no_auto,
+            'romaji': cfg['romaji'] or bool(cl_args.romaji),
+        }
+        die(0 if _batch_run(cl_args.batch, cl_args.format, max(1, cl_args.jobs), args) else 1)
+    if cl_args.word_lookup:
+        req = {'word': cl_args.word_lookup}
+        if cl_args.dict:
+            req['dict'] = cl_args.dict
+    elif cl_args.kanji_lookup:
+        req = {'kanji': cl_args.kanji_lookup}
+    else:
+        parser.print_usage(sys.stderr)
+        die(2)
+    if cl_args.show:
+        req['show'] = True
+    resp = _client_request(cl_args.socket, req)
+    if resp is None:
+        if cl_args.show:
+            eprint('no server running on', cl_args.socket)
+            die(1)
+        try:
+            resp = {'ok': True, 'result': _server_word(req) if 'word' in req else _server_kanji(req)}
+        except Exception as e:
+            resp = {'ok': False, 'error': str(e)}
+    _client_print(resp, cl_args.json)
+    die(0 if resp['ok'] else 1)
+
+if __name__== "__main__":
+    _main()
+
+# EOF
@@ -15,9 +15,6 @@ See `LICENSE` file for more information.
 
 _JITENPAI_VERSION = '0.1.0'
 _JITENPAI_NAME = 'Jiten-pai'
-_JITENPAI_DIR = 'jiten-pai'
-_JITENPAI_CFG = 'jiten-pai.conf'
-_JITENPAI_VCONJ = 'vconj.utf8'
 
 _JITENPAI_INFO = """<p>Jiten-pai incorporates parts taken from other projects:
 </p><p>
@@ -36,380 +33,48 @@ and Development Group; Creative Commons Attribution-ShareAlike Licence (V3.0)
 
 import sys
 
-_PYTHON_VERSION = float("%d.%d" % (sys.version_info.major, sys.version_info.minor))
-if _PYTHON_VERSION < 3.6:
+if sys.version_info < (3, 6):
     raise Exception ('Need Python version 3.6 or later, got version ' + str(sys.version))
 
+############################################################
+# start-up profiling, see --profile-startup
+
+import time
+
+_startup = [('', time.perf_counter())]  # format: [ (phase, end_time), ... ]
+
+def _startup_mark(phase):
+    _startup.append((phase, time.perf_counter()))
+
 import platform
 import io
 import os
 import re
-import json
-import unicodedata
-import enum
 import base64
-from collections import namedtuple
+import threading
+import importlib.util
 from argparse import ArgumentParser, RawTextHelpFormatter
+_startup_mark('modules')
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
+_startup_mark('PyQt5')
+
+from edict import (
+    die, eprint, _is_kanji, ScanMode, cfg, _load_cfg, _save_cfg, _vconj_ready, kata2hira,
+    _dict, _dict_load, _dict_set_load, _dict_cache_rebuild,
+    _query_cache_clear, _query_cache_save, _query_cache_load,
+    _search_term, _search_inflections, _search_dict, _search_lookup,
+    _qlog_open, _qlog_active, _qlog_word,
+    _stats_setup, _stats_new, _stats_write,
+    _mem_rows, _mem_report,
+    lookupServer, _server_sock_path,
+)
+_startup_mark('edict')
 
 ############################################################
-# utility functions and classes
-
-def die(rc=0):
-    sys.exit(rc)
-
-def eprint(*args, **kwargs):
-    print(*args, file=sys.stderr, **kwargs)
-
-# Note: we only test for common CJK ideographs
-_u_CJK_Uni = r'\u4e00-\u9FFF'
-_u_CJK_Kana = r'\u3040-\u30ff'
-_u_CJK_FullHalf = r'\uFF00-\uFFEF'
-
-_re_kanji = re.compile('^[' + _u_CJK_Uni + ']$')
-_re_jap = re.compile('[' + _u_CJK_Uni + _u_CJK_Kana + _u_CJK_FullHalf + ']')
-
-# test, if a single character /might/ be a kanji
-def _is_kanji(s):
-    return _re_kanji.match(s)
-
-# test, if a string contains any common Japanese characters
-def _has_jap(s):
-    return _re_jap.search(s)
-
-class ScanMode(enum.Enum):
-    JAP = 1
-    ENG = 2
-
-
-############################################################
-# configuration
-
-cfg = {
-    'kanjidic': '/usr/local/share/jiten-pai/kanjidic',
-    'dicts': [
-        ['edict2', '/usr/local/share/jiten-pai/edict2'],
-    ],
-    'dict_load': True,
-    'dict_idx': 0,
-    'dict_all': False,
-    'limit': 100,
-    'do_limit': True,
-    'auto_adj': True,
-    'jap_opt': [True, False, False, False],
-    'eng_opt': [True, False, False],
-    'romaji': False,
-    'nfont': 'sans',
-    'nfont_sz': 12.0,
-    'lfont': 'IPAPMincho',
-    'lfont_sz': 24.0,
-    'hl_col': 'blue',
-    'deinflect': False,
-    # saved, but not editable from GUI:
-    'hardlimit': 10000,
-    'max_hist': 12,
-    'history': [],
-    # not saved, run-time only:
-    'cfgfile': None,
-}
-
-def _get_cfile_path(fname, mode=os.R_OK):
-    # try to find a suitable configuration file / prefix
-    cdirs = []
-    if os.environ.get('APPDATA'):
-        cdirs.append(os.environ.get('APPDATA'))
-    if os.environ.get('XDG_CONFIG_HOME'):
-        cdirs.append(os.environ.get('XDG_CONFIG_HOME'))
-    if os.environ.get('HOME'):
-        cdirs.append(os.path.join(os.environ.get('HOME'), '.config'))
-    cdirs.append(os.path.dirname(os.path.realpath(__file__)))
-    for d in cdirs:
-        path = os.path.join(d, fname)
-        if os.access(path, mode):
-            return path
-    return fname
-
-def _save_cfg():
-    s_cfg = cfg.copy()
-    s_cfg.pop('cfgfile', None)
-    if cfg['cfgfile']:
-        try:
-            with open(cfg['cfgfile'], 'w') as cfgfile:
-                json.dump(s_cfg, cfgfile, indent=2)
-                return
-        except Exception as e:
-            eprint('_save_cfg:', cfg['cfgfile'], str(e))
-    cfgdir = _get_cfile_path('', mode=os.R_OK | os.W_OK | os.X_OK)
-    cfname = os.path.join(cfgdir, _JITENPAI_CFG)
-    try:
-        with open(cfname, 'w') as cfgfile:
-            json.dump(s_cfg, cfgfile, indent=2)
-            cfg['cfgfile'] = cfname
-            return
-    except Exception as e:
-        eprint('_save_cfg:', cfname, str(e))
-
-def _load_cfg():
-    cfname = _get_cfile_path('', mode=os.R_OK)
-    cfname = os.path.join(cfname, _JITENPAI_CFG)
-    try:
-        with open(cfname, 'r') as cfgfile:
-            cfg.update(json.load(cfgfile))
-            cfg['cfgfile'] = cfname
-    except Exception as e:
-        eprint('_load_cfg:', cfname, str(e))
-    global _dict_lookup
-    _dict_lookup = _dict_lookup_load if cfg['dict_load'] else _dict_lookup_noload
-
-
-############################################################
-# import kanjidic
-try:
-    from kanjidic import kdMainWindow
-    _got_kd = True
-except Exception as e:
-    eprint('kanjidic.py:', e)
-    _got_kd = False
-
-############################################################
-# verb de-inflection
-
-Vtype = namedtuple('Vtype', 'wclass label')
-Vconj = namedtuple('Vconj', 'regex conj infi rule')
-
-_vconj_type = dict()  # format: { rule_no: (wclass, label), ... }
-_vconj_deinf = []     # format: [ (regex, conj, infinitve, rule_no), ... ]
-_vconj_loaded = False
-
-def _get_dfile_path(fname, mode=os.R_OK):
-    # try to locate a data file in some common prefixes:
-    cdirs = []
-    if os.environ.get('APPDATA'):
-        cdirs.append(os.environ.get('APPDATA'))
-    if os.environ.get('HOME'):
-        cdirs.append(os.path.join(os.environ.get('HOME'), '.local/share'))
-    cdirs.append('/usr/local/share')
-    cdirs.append('/usr/share')
-    cdirs.append(os.path.dirname(os.path.realpath(__file__)))
-    for d in cdirs:
-        path = os.path.join(d, fname)
-        if os.access(path, mode):
-            return path
-    return fname
-
-# load and parse VCONJ rule file
-def _vconj_load():
-    global _vconj_loaded
-    vcname = _JITENPAI_VCONJ
-    if not os.access(vcname, os.R_OK):
-        vcname = _get_dfile_path(os.path.join(_JITENPAI_DIR, _JITENPAI_VCONJ), mode=os.R_OK)
-    try:
-        with open(vcname) as vcfile:
-            re_type = re.compile(r'^(\d+)\s+"(\S+)"\s+(.+)$')
-            re_deinf = re.compile(r'^\s*([^#\s]+)\s+(\S+)\s+(\d+)\s*$')
-            for line in vcfile:
-                match = re_type.match(line)
-                if match:
-                    wclass = re.compile(r'(\((.+?,)*?)' + match.group(2))
-                    _vconj_type[int(match.group(1))] = Vtype(wclass, match.group(3))
-                    continue
-                match = re_deinf.match(line)
-                if match:
-                    regex = re.compile('%s$' % match.group(1))
-                    _vconj_deinf.append(Vconj(regex, match.group(1), match.group(2), int(match.group(3))))
-                    continue
-        _vconj_loaded = len(_vconj_deinf) > 0
-    except Exception as e:
-        eprint('_vconj_load:', vcname, str(e))
-
-# collect inflection rules potentially applicable to a verb(-candidate)
-Vinf = namedtuple('Vinf', 'infi blurb wclass')
-
-def _vconj_deinflect(verb):
-    inf = []
-    blurb = ''
-    for deinf in _vconj_deinf:
-        verb_inf = deinf.regex.sub(deinf.infi, verb)
-        if verb_inf != verb:
-            blurb = '%s %s → %s' % (_vconj_type[deinf.rule].label, deinf.conj, deinf.infi)
-            wclass = _vconj_type[deinf.rule].wclass
-            inf.append(Vinf(verb_inf, blurb, wclass))
-    return inf
-
-
-############################################################
-# Katakana -> Hiragana <- Romaji conversion code adapted from:
-#   https://github.com/ikegami-yukino/jaconv
-#   Copyright (c) 2014 Yukino Ikegami
-#   MIT License
-
-HIRAGANA = list('ぁあぃいぅうぇえぉおかがきぎくぐけげこごさざしじすず'
-                'せぜそぞただちぢっつづてでとどなにぬねのはばぱひびぴ'
-                'ふぶぷへべぺほぼぽまみむめもゃやゅゆょよらりるれろわ'
-                'をんーゎゐゑゕゖゔゝゞ・「」。、')
-
-FULL_KANA = list('ァアィイゥウェエォオカガキギクグケゲコゴサザシジスズセゼソ'
-                 'ゾタダチヂッツヅテデトドナニヌネノハバパヒビピフブプヘベペ'
-                 'ホボポマミムメモャヤュユョヨラリルレロワヲンーヮヰヱヵヶヴ'
-                 'ヽヾ・「」。、')
-
-HEPBURN = list('aiueoaiueon')
-HEPBURN_KANA = list('ぁぃぅぇぉあいうえおん')
-
-def _to_ord_list(chars):
-    return list(map(ord, chars))
-
-def _to_dict(_from, _to):
-    return dict(zip(_from, _to))
-
-K2H_TABLE = _to_dict(_to_ord_list(FULL_KANA), HIRAGANA)
-HEP2KANA = _to_dict(_to_ord_list(HEPBURN), HEPBURN_KANA)
-
-del _to_ord_list
-del _to_dict
-del HIRAGANA
-del FULL_KANA
-del HEPBURN
-del HEPBURN_KANA
-
-def kata2hira(text):
-    return text.translate(K2H_TABLE)
-
-def alphabet2kana(text):
-    # replace final h with う, e.g., Itoh -> いとう
-    ending_h_pattern = re.compile(r'h$')
-    text = re.sub(ending_h_pattern, 'う', text)
-
-    text = text.replace('kya', 'きゃ').replace('kyi', 'きぃ').replace('kyu', 'きゅ')
-    text = text.replace('kye', 'きぇ').replace('kyo', 'きょ')
-    text = text.replace('gya', 'ぎゃ').replace('gyi', 'ぎぃ').replace('gyu', 'ぎゅ')
-    text = text.replace('gye', 'ぎぇ').replace('gyo', 'ぎょ')
-    text = text.replace('sha', 'しゃ').replace('shu', 'しゅ').replace('she', 'しぇ')
-    text = text.replace('sho', 'しょ')
-    text = text.replace('sya', 'しゃ').replace('syi', 'しぃ').replace('syu', 'しゅ')
-    text = text.replace('sye', 'しぇ').replace('syo', 'しょ')
-    text = text.replace('zya', 'じゃ').replace('zyu', 'じゅ').replace('zyo', 'じょ')
-    text = text.replace('zyi', 'じぃ').replace('zye', 'じぇ')
-    text = text.replace('ja', 'じゃ').replace('ju', 'じゅ').replace('jo', 'じょ')
-    text = text.replace('jya', 'じゃ').replace('jyi', 'じぃ').replace('jyu', 'じゅ')
-    text = text.replace('jye', 'じぇ').replace('jyo', 'じょ')
-    text = text.replace('dya', 'ぢゃ').replace('dyi', 'ぢぃ').replace('dyu', 'ぢゅ')
-    text = text.replace('dye', 'ぢぇ').replace('dyo', 'ぢょ')
-    text = text.replace('cha', 'ちゃ').replace('chu', 'ちゅ').replace('che', 'ちぇ')
-    text = text.replace('cho', 'ちょ')
-    text = text.replace('cya', 'ちゃ').replace('cyi', 'ちぃ').replace('cyu', 'ちゅ')
-    text = text.replace('cye', 'ちぇ').replace('cyo', 'ちょ')
-    text = text.replace('tya', 'ちゃ').replace('tyi', 'ちぃ').replace('tyu', 'ちゅ')
-    text = text.replace('tye', 'ちぇ').replace('tyo', 'ちょ')
-    text = text.replace('tsa', 'つぁ').replace('tsi', 'つぃ').replace('tse', 'つぇ')
-    text = text.replace('tso', 'つぉ')
-    text = text.replace('thi', 'てぃ').replace('t\'i', 'てぃ')
-    text = text.replace('tha', 'てゃ').replace('thu', 'てゅ').replace('t\'yu', 'てゅ')
-    text = text.replace('the', 'てぇ').replace('tho', 'てょ')
-    text = text.replace('dha', 'でゃ').replace('dhi', 'でぃ').replace('d\'i', 'でぃ')
-    text = text.replace('dhu', 'でゅ').replace('dhe', 'でぇ').replace('dho', 'でょ')
-    text = text.replace('d\'yu', 'でゅ')
-    text = text.replace('twa', 'とぁ').replace('twi', 'とぃ').replace('twu', 'とぅ')
-    text = text.replace('twe', 'とぇ').replace('two', 'とぉ').replace('t\'u', 'とぅ')
-    text = text.replace('dwa', 'どぁ').replace('dwi', 'どぃ').replace('dwu', 'どぅ')
-    text = text.replace('dwe', 'どぇ').replace('dwo', 'どぉ').replace('d\'u', 'どぅ')
-    text = text.replace('nya', 'にゃ').replace('nyi', 'にぃ').replace('nyu', 'にゅ')
-    text = text.replace('nye', 'にぇ').replace('nyo', 'にょ')
-    text = text.replace('hya', 'ひゃ').replace('hyi', 'ひぃ').replace('hyu', 'ひゅ')
-    text = text.replace('hye', 'ひぇ').replace('hyo', 'ひょ')
-    text = text.replace('mya', 'みゃ').replace('myi', 'みぃ').replace('myu', 'みゅ')
-    text = text.replace('mye', 'みぇ').replace('myo', 'みょ')
-    text = text.replace('rya', 'りゃ').replace('ryi', 'りぃ').replace('ryu', 'りゅ')
-    text = text.replace('rye', 'りぇ').replace('ryo', 'りょ')
-    text = text.replace('bya', 'びゃ').replace('byi', 'びぃ').replace('byu', 'びゅ')
-    text = text.replace('bye', 'びぇ').replace('byo', 'びょ')
-    text = text.replace('pya', 'ぴゃ').replace('pyi', 'ぴぃ').replace('pyu', 'ぴゅ')
-    text = text.replace('pye', 'ぴぇ').replace('pyo', 'ぴょ')
-    text = text.replace('vyi', 'ゔぃ').replace('vyu', 'ゔゅ').replace('vye', 'ゔぇ')
-    text = text.replace('vyo', 'ゔょ')
-    text = text.replace('fya', 'ふゃ').replace('fyu', 'ふゅ').replace('fyo', 'ふょ')
-    text = text.replace('hwa', 'ふぁ').replace('hwi', 'ふぃ').replace('hwe', 'ふぇ')
-    text = text.replace('hwo', 'ふぉ').replace('hwyu', 'ふゅ')
-    text = text.replace('pha', 'ふぁ').replace('phi', 'ふぃ').replace('phu', 'ふぅ')
-    text = text.replace('phe', 'ふぇ').replace('pho', 'ふぉ')
-    text = text.replace('xn', 'ん').replace('xa', 'ぁ').replace('xi', 'ぃ')
-    text = text.replace('xu', 'ぅ').replace('xe', 'ぇ').replace('xo', 'ぉ')
-    text = text.replace('lyi', 'ぃ').replace('xyi', 'ぃ').replace('lye', 'ぇ')
-    text = text.replace('xye', 'ぇ').replace('xka', 'ヵ').replace('xke', 'ヶ')
-    text = text.replace('lka', 'ヵ').replace('lke', 'ヶ')
-    text = text.replace('ca', 'か').replace('ci', 'し').replace('cu', 'く')
-    text = text.replace('co', 'こ')
-    text = text.replace('qa', 'くぁ').replace('qi', 'くぃ').replace('qu', 'く')
-    text = text.replace('qe', 'くぇ').replace('qo', 'くぉ')
-    text = text.replace('kwa', 'くぁ').replace('kwi', 'くぃ').replace('kwu', 'くぅ')
-    text = text.replace('kwe', 'くぇ').replace('kwo', 'くぉ')
-    text = text.replace('gwa', 'ぐぁ').replace('gwi', 'ぐぃ').replace('gwu', 'ぐぅ')
-    text = text.replace('gwe', 'ぐぇ').replace('gwo', 'ぐぉ')
-    text = text.replace('swa', 'すぁ').replace('swi', 'すぃ').replace('swu', 'すぅ')
-    text = text.replace('swe', 'すぇ').replace('swo', 'すぉ')
-    text = text.replace('zwa', 'ずぁ').replace('zwi', 'ずぃ').replace('zwu', 'ずぅ')
-    text = text.replace('zwe', 'ずぇ').replace('zwo', 'ずぉ')
-    text = text.replace('je', 'じぇ')
-    text = text.replace('ti', 'ち')
-    text = text.replace('xtu', 'っ').replace('xtsu', 'っ')
-    text = text.replace('ltu', 'っ').replace('ltsu', 'っ')
-    text = text.replace('xya', 'ゃ').replace('lya', 'ゃ')
-    text = text.replace('xyu', 'ゅ').replace('lyu', 'ゅ')
-    text = text.replace('xyo', 'ょ').replace('lyo', 'ょ')
-    text = text.replace('wha', 'うぁ').replace('whi', 'うぃ').replace('whu', 'う')
-    text = text.replace('whe', 'うぇ').replace('who', 'うぉ')
-    text = text.replace('xwa', 'ゎ').replace('lwa', 'ゎ')
-    text = text.replace('tsu', 'つ')
-    text = text.replace('ga', 'が').replace('gi', 'ぎ').replace('gu', 'ぐ')
-    text = text.replace('ge', 'げ').replace('go', 'ご')
-    text = text.replace('za', 'ざ').replace('ji', 'じ').replace('zi', 'じ')
-    text = text.replace('zu', 'ず').replace('ze', 'ぜ').replace('zo', 'ぞ')
-    text = text.replace('da', 'だ').replace('di', 'ぢ')
-    text = text.replace('zu', 'づ').replace('du', 'づ')
-    text = text.replace('de', 'で').replace('do', 'ど')
-    text = text.replace('va', 'ゔぁ').replace('vi', 'ゔぃ').replace('vu', 'ゔ')
-    text = text.replace('ve', 'ゔぇ').replace('vo', 'ゔぉ').replace('vya', 'ゔゃ')
-    text = text.replace('ba', 'ば').replace('bi', 'び').replace('bu', 'ぶ')
-    text = text.replace('be', 'べ').replace('bo', 'ぼ').replace('pa', 'ぱ')
-    text = text.replace('pi', 'ぴ').replace('pu', 'ぷ').replace('pe', 'ぺ')
-    text = text.replace('po', 'ぽ')
-    text = text.replace('ka', 'か').replace('ki', 'き').replace('ku', 'く')
-    text = text.replace('ke', 'け').replace('ko', 'こ').replace('sa', 'さ')
-    text = text.replace('shi', 'し').replace('su', 'す').replace('se', 'せ').replace('si', 'し')
-    text = text.replace('so', 'そ').replace('ta', 'た').replace('chi', 'ち')
-    text = text.replace('te', 'て').replace('to', 'と')
-    text = text.replace('na', 'な').replace('ni', 'に').replace('nu', 'ぬ')
-    text = text.replace('ne', 'ね').replace('no', 'の').replace('ha', 'は')
-    text = text.replace('hi', 'ひ').replace('fu', 'ふ').replace('he', 'へ')
-    text = text.replace('ho', 'ほ').replace('ma', 'ま').replace('mi', 'み')
-    text = text.replace('mu', 'む').replace('me', 'め').replace('mo', 'も')
-    text = text.replace('ra', 'ら').replace('ri', 'り').replace('ru', 'る')
-    text = text.replace('re', 'れ').replace('ro', 'ろ')
-    text = text.replace('la', 'ら').replace('li', 'り').replace('lu', 'る')
-    text = text.replace('le', 'れ').replace('lo', 'ろ')
-    text = text.replace('ya', 'や').replace('yu', 'ゆ').replace('yo', 'よ')
-    text = text.replace('wa', 'わ').replace('wyi', 'ゐ').replace('wu', 'う')
-    text = text.replace('wye', 'ゑ')
-    text = text.replace('wo', 'を')
-    text = text.replace('nn', 'ん').replace('m', 'ん')
-    text = text.replace('tu', 'つ').replace('hu', 'ふ')
-    text = text.replace('fa', 'ふぁ').replace('fi', 'ふぃ').replace('fe', 'ふぇ')
-    text = text.replace('fo', 'ふぉ').replace('oh', 'おお')
-    text = text.replace('l', 'る').replace('-', 'ー')
-    text = text.translate(HEP2KANA)
-    ret = []
-    consonants = frozenset('sdfghjklqwrtypzxcvbnm')
-    for (i, char) in enumerate(text):
-        if char in consonants:
-            char = 'っ'
-        ret.append(char)
-    return ''.join(ret)
-
-# End of code adapted from jaconv.
-############################################################
-
+# kanjidic is imported on first use, see jpMainWindow.kanjidic()
+_got_kd = importlib.util.find_spec('kanjidic') is not None
 
 ############################################################
 # widgets and layouts with custom styles
@@ -499,9 +164,20 @@ class sQPixmap(QPixmap):
         if imgdata is not None:
             super().loadFromData(base64.b64decode(imgdata))
 
-class jpIcon:
+# decode icons on first access of jpIcon.<name> or jpIcon.<name>_pxm
+class _jpIconMeta(type):
+    def __getattr__(cls, name):
+        base = name[:-4] if name.endswith('_pxm') else name
+        imgdata = cls.__dict__.get(base + '_png')
+        if imgdata is None:
+            raise AttributeError(name)
+        pxm = sQPixmap(imgdata=imgdata)
+        setattr(cls, base + '_pxm', pxm)
+        setattr(cls, base, QIcon(pxm))
+        return getattr(cls, name)
+
+class jpIcon(metaclass=_jpIconMeta):
     """ Icon resource storage with only class attributes, not instantiated."""
-    initialized = False
     add_png = """iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAMAAAAoLQ9TAAAAz1BMVEX///87a6g2Z6U1ZqU3Z6QzY6I6aKQxXp0rWJYrWZYwX50nUpAsWpgjTYoqV5QpVJIoVZImUo4hSockT4oiS4gmUYypwNymvdo0ZaSkvNl7nsgzZKOWsdJnjb0wYJ8xYaCGpMpTfbMsWpgrWZd5
 msN/n8d9ncV6msRcg7c+baltkL50lsFylMBmirlojbw1ZqQ1ZqU3aKY5aqg7bKk9bao/b6xBca1AcKsnU5EmUo92mcVKebMhTIkhS4iIqdBYh70gSoeTs9dnlMeQsddrl8m84eAJAAAAFnRSTlMAgfv7gfv39/uB+/v7+4H79/f7gfuBOt2MIAAAAHNJREFUGNNjYCAS
 MDIxMaIIMIuJM6MISEhKSaAISMvIysE5LKzycmwKiuxKyhycYAEuFVU1dQ1NLW0dXW6wAI+evoGhkbGJqZk5L1iAj9/CUsDKWtDGVkgYbo6Nnb0Dii0Ojk6oAiLOLiIoAqIiIqLEehMA974KdF73TRoAAAAASUVORK5CYII=
@@ -596,36 +272,6 @@ AElFTkSuQmCC
 39ze3tv4+Pfa29jJysfV1tPT09D///8aLa7GAAAAHXRSTlMAVvhU+/uQR/v7VEvB+1TZy/tUgfTCOsLZS0fBy7E7NWcAAAB6SURBVBjTfY3ZDoIwFAUP+yZooSIK1CsURf3//7NtwhYT5m3mnrSAwbItrHHc1nU2Lu5iVZTTg5aiveu7uRj3fG8qQShIRjHiSJIIE+DQ
 0pBm6pKlw/N1BE7jm+UoeIGcfcYzUF6qK8C/HLjVTTn9rBf7/C3MG7uLhR8SHQiljWH7zAAAAABJRU5ErkJggg==
 """
-    def __new__(cls):
-        if cls.initialized:
-            return
-        cls.initialized = True
-        jpIcon.add_pxm = sQPixmap(imgdata=jpIcon.add_png)
-        jpIcon.add = QIcon(jpIcon.add_pxm)
-        jpIcon.apply_pxm = sQPixmap(imgdata=jpIcon.apply_png)
-        jpIcon.apply = QIcon(jpIcon.apply_pxm)
-        jpIcon.cancel_pxm = sQPixmap(imgdata=jpIcon.cancel_png)
-        jpIcon.cancel = QIcon(jpIcon.cancel_pxm)
-        jpIcon.clear_pxm = sQPixmap(imgdata=jpIcon.clear_png)
-        jpIcon.clear = QIcon(jpIcon.clear_pxm)
-        jpIcon.close_pxm = sQPixmap(imgdata=jpIcon.close_png)
-        jpIcon.close = QIcon(jpIcon.close_pxm)
-        jpIcon.down_pxm = sQPixmap(imgdata=jpIcon.down_png)
-        jpIcon.down = QIcon(jpIcon.down_pxm)
-        jpIcon.find_pxm = sQPixmap(imgdata=jpIcon.find_png)
-        jpIcon.find = QIcon(jpIcon.find_pxm)
-        jpIcon.jiten_pai_pxm = sQPixmap(imgdata=jpIcon.jiten_pai_png)
-        jpIcon.jiten_pai = QIcon(jpIcon.jiten_pai_pxm)
-        jpIcon.ok_pxm = sQPixmap(imgdata=jpIcon.ok_png)
-        jpIcon.ok = QIcon(jpIcon.ok_pxm)
-        jpIcon.open_pxm = sQPixmap(imgdata=jpIcon.open_png)
-        jpIcon.open = QIcon(jpIcon.open_pxm)
-        jpIcon.properties_pxm = sQPixmap(imgdata=jpIcon.properties_png)
-        jpIcon.properties = QIcon(jpIcon.properties_pxm)
-        jpIcon.remove_pxm = sQPixmap(imgdata=jpIcon.remove_png)
-        jpIcon.remove = QIcon(jpIcon.remove_pxm)
-        jpIcon.up_pxm = sQPixmap(imgdata=jpIcon.up_png)
-        jpIcon.up = QIcon(jpIcon.up_pxm)
 
 
 ############################################################
@@ -672,6 +318,44 @@ class aboutDialog(QDialog):
         self.dlg_layout.addLayout(self.btn_layout)
 
 
+############################################################
+# 'Diagnostics' dialog
+
+class diagDialog(QDialog):
+    def __init__(self, *args, report=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle('Diagnostics')
+        self.resize(700, 500)
+        self.report = report
+        self.info_pane = QPlainTextEdit()
+        self.info_pane.setReadOnly(True)
+        self.info_pane.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.info_pane.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.refresh_button = QPushButton('Refresh')
+        self.refresh_button.clicked.connect(self.refresh)
+        self.ok_button = QPushButton('Ok')
+        self.ok_button.setIcon(jpIcon.ok)
+        self.ok_button.clicked.connect(self.accept)
+        self.ok_button.setDefault(True)
+        self.btn_layout = QHBoxLayout()
+        self.btn_layout.addWidget(self.refresh_button)
+        self.btn_layout.addStretch()
+        self.btn_layout.addWidget(self.ok_button)
+        self.dlg_layout = QVBoxLayout(self)
+        self.dlg_layout.addWidget(self.info_pane)
+        self.dlg_layout.addLayout(self.btn_layout)
+        self.refresh()
+
+    def refresh(self):
+        # deep sizes of large dictionaries take a moment
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.info_pane.setPlainText(self.report())
+        finally:
+            QApplication.restoreOverrideCursor()
+
+
 ############################################################
 # 'Preferences' dialogs
 
@@ -791,10 +475,14 @@ class prefDialog(QDialog):
         self.search_deinflect = QCheckBox('&Verb Deinflection')
         self.search_deinflect.setToolTip('Enable search heuristic for possibly inflected verbs or adjectives.')
         self.search_deinflect.setChecked(cfg['deinflect'])
-        self.search_deinflect.setEnabled(_vconj_loaded)
+        self.search_deinflect.setEnabled(_vconj_ready())
+        self.search_live = QCheckBox('Search &While Typing')
+        self.search_live.setToolTip('Start a search shortly after the search expression was changed.')
+        self.search_live.setChecked(cfg['live_search'])
         search_layout = zQVBoxLayout(search_group)
         search_layout.addWidget(self.dict_load)
         search_layout.addWidget(self.search_deinflect)
+        search_layout.addWidget(self.search_live)
         search_layout.addSpacing(10)
         # kanjidic options
         kdic_group = zQGroupBox('Kanji Dictionary')
@@ -937,15 +625,10 @@ class prefDialog(QDialog):
         self.color_edit.setText(color.name())
         self.update_font_sample()
         cfg['deinflect'] = self.search_deinflect.isChecked()
+        cfg['live_search'] = self.search_live.isChecked()
         cfg['kanjidic'] = self.kdic_button.text()
         cfg['dict_load'] = self.dict_load.isChecked()
-        global _dict_lookup
-        if cfg['dict_load']:
-            _dict_lookup = _dict_lookup_load
-        else:
-            global _dict
-            _dict = {}
-            _dict_lookup = _dict_lookup_noload
+        _dict_set_load(cfg['dict_load'])
         d = []
         it = QTreeWidgetItemIterator(self.dict_list)
         while it.value():
@@ -955,6 +638,7 @@ class prefDialog(QDialog):
             d.append([name, path])
             it += 1
         cfg['dicts'] = d
+        _query_cache_clear()
         _save_cfg()
 
     def accept(self):
@@ -1020,17 +704,136 @@ class prefDialog(QDialog):
             self.dict_list.setCurrentItem(item)
 
 
+############################################################
+# background dictionary loading
+#
+# Dictionaries are loaded one after another on a daemon thread, in queue
+# order.  A dictionary is pending while it is queued or being loaded;
+# callers needing particular dictionaries move them to the front of the
+# queue and wait until none of them is pending.
+
+class dictLoader(QObject):
+    progress = pyqtSignal(int, int, str)
+    loaded = pyqtSignal(str)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cond = threading.Condition()
+        self.queue = []     # format: [ [name, path], ... ]
+        self.current = None
+        self.count = 0
+        self.thread = None
+
+    def start(self, dicts):
+        with self.cond:
+            for d in dicts:
+                if d[1] not in _dict and not self.pending([d[1]]):
+                    self.queue.append(list(d))
+            if self.queue and self.thread is None:
+                self.count = 0
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def cancel(self):
+        with self.cond:
+            self.queue.clear()
+
+    def pending(self, paths):
+        with self.cond:
+            return any(p == self.current or p in (d[1] for d in self.queue) for p in paths)
+
+    def prioritise(self, paths):
+        with self.cond:
+            self.queue.sort(key=lambda d: d[1] not in paths)
+
+    # block until none of paths is pending; returns False, if cancel
+    # (a threading.Event) got set meanwhile
+    def wait(self, paths, cancel=None):
+        with self.cond:
+            self.prioritise(paths)
+            while self.pending(paths):
+                if cancel and cancel.is_set():
+                    return False
+                self.cond.wait(0.1)
+        return True
+
+    def run(self):
+        while True:
+            with self.cond:
+                if not self.queue:
+                    self.thread = None
+                    self.progress.emit(self.count, self.count, '')
+                    return
+                name, self.current = self.queue.pop(0)
+                self.progress.emit(self.count, self.count + len(self.queue) + 1, name)
+            _dict_load(self.current)
+            with self.cond:
+                path, self.current = self.current, None
+                self.count += 1
+                self.cond.notify_all()
+            self.loaded.emit(path)
+
+
+############################################################
+# search job
+#
+# Parameters of a single word search, plus the signals the search
+# worker uses to report back to the main window; implements the
+# edict.lookupJob interface.
+
+class searchJob(QObject):
+    title = pyqtSignal(str)
+    progress = pyqtSignal()
+    dict_error = pyqtSignal(str)
+    relaxed = pyqtSignal(object, int)
+    notice = pyqtSignal(str)
+    result = pyqtSignal(str)
+
+    def __init__(self, term, mode, opt, dics, limit, auto, loader, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.term = term
+        self.mode = mode
+        self.opt = opt
+        self.dics = dics
+        self.limit = limit
+        self.auto = auto
+        self.loader = loader
+        self.cancelled = threading.Event()
+        self.timing = {}
+        self.final_opt = opt
+        self.log = None     # format: (term as entered, romaji), if logged
+        self.stats = _stats_new()
+
+    def report(self, what, *args):
+        getattr(self, what).emit(*args)
+
+    def wait(self, paths):
+        return self.loader.wait(paths, self.cancelled)
+
+
 ############################################################
 # main window class
 
 class jpMainWindow(QMainWindow):
     kanji_dlg = None
+    search_job = None
+    search_term = None
+    server = None
+    server_show = pyqtSignal(object)
+    words_ready = False
 
     def __init__(self, *args, title='', cl_args=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.init_ui(title)
+        self.dict_loader = dictLoader(self)
+        self.dict_loader.progress.connect(self.dict_load_progress)
+        # kanji only start-ups leave word lookups until the window is shown
+        if cl_args is None or cl_args.server or not (cl_args.kanjidic or cl_args.kanji_lookup or cl_args.clip_kanji):
+            self._words_init()
         # evaluate command line arguments
         if cl_args is not None:
+            if cl_args.server:
+                self._server_start()
             if cl_args.kanjidic:
                 self.kanjidic()
             elif cl_args.K:
@@ -1051,8 +854,23 @@ class jpMainWindow(QMainWindow):
             else:
                 self.show()
 
+    # set up the word dictionary machinery
+    def _words_init(self):
+        if self.words_ready:
+            return
+        self.words_ready = True
+        if cfg['query_cache'] and cfg['query_cache_save']:
+            _query_cache_load()
+        if cfg['dict_load']:
+            self.dict_loader.start(cfg['dicts'])
+        if cfg['query_cache'] and cfg['history']:
+            self._search_prewarm()
+
+    def showEvent(self, event):
+        self._words_init()
+        super().showEvent(event)
+
     def init_ui(self, title=''):
-        jpIcon()
         self.setWindowTitle(title)
         self.setWindowIcon(jpIcon.jiten_pai)
         self.resize(800, 600)
@@ -1084,6 +902,9 @@ class jpMainWindow(QMainWindow):
             kanjidic_action.setShortcut('Alt+K')
             tools_menu.addAction(kanjidic_action)
         help_menu = menubar.addMenu('&Help')
+        diag_action = QAction('&Diagnostics', self)
+        help_menu.addAction(diag_action)
+        diag_action.triggered.connect(self.diag_dlg)
         about_action = QAction('&About', self)
         help_menu.addAction(about_action)
         about_action.triggered.connect(self.about_dlg)
@@ -1201,6 +1022,11 @@ class jpMainWindow(QMainWindow):
         search_layout.addWidget(search_button, 5)
         search_layout.addWidget(clear_button, 1)
         search_group.setLayout(search_layout)
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.timeout.connect(self.live_search)
+        cancel_shortcut = QShortcut(QKeySequence('Esc'), self)
+        cancel_shortcut.activated.connect(self.search_cancel)
         # result area
         self.result_group = zQGroupBox('Search results:')
         self.result_pane = zQTextEdit()
@@ -1218,8 +1044,24 @@ class jpMainWindow(QMainWindow):
         main_layout.addWidget(search_group, 1)
         main_layout.addWidget(self.result_group, 1000)
         self.setCentralWidget(main_frame)
+        # status bar
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(200)
+        self.load_progress.setFormat('%v/%m')
+        self.load_progress.hide()
+        self.statusBar().addPermanentWidget(self.load_progress)
         self.search_box.setFocus()
 
+    def dict_load_progress(self, done, total, name):
+        if done < total:
+            self.load_progress.setRange(0, total)
+            self.load_progress.setValue(done)
+            self.load_progress.show()
+            self.statusBar().showMessage("Loading dictionary '%s' ..." % name)
+        else:
+            self.load_progress.hide()
+            self.statusBar().showMessage('Dictionaries loaded.', 3000)
+
     def kbd_copy(self):
         self.clipboard.setText(self.result_pane.textCursor().selectedText())
 
@@ -1244,6 +1086,12 @@ class jpMainWindow(QMainWindow):
         cfg['romaji'] = self.search_romaji.isChecked()
         cfg['history'] = [self.search_box.itemText(i) for i in range(min(cfg['max_hist'], self.search_box.count()))]
         _save_cfg()
+        self._search_abort()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        if cfg['query_cache_save'] and self.words_ready:
+            _query_cache_save()
         die()
 
     def pref_dlg(self):
@@ -1261,12 +1109,28 @@ class jpMainWindow(QMainWindow):
             if idx >= self.genopt_dictsel.count() or idx < 0:
                 idx = 0
             self.genopt_dictsel.setCurrentIndex(idx)
+            if cfg['dict_load']:
+                self.dict_loader.start(cfg['dicts'])
+            else:
+                self.dict_loader.cancel()
             self.search()
 
     def about_dlg(self):
         dlg = aboutDialog(self)
         dlg.exec_()
 
+    def diag_dlg(self):
+        dlg = diagDialog(self, report=self.diag_report)
+        dlg.exec_()
+
+    # memory report, plus the result pane document, its size approximated
+    # by the size of its HTML
+    def diag_report(self):
+        rows = _mem_rows()
+        doc = self.result_pane.document()
+        rows.append(('result pane', doc.blockCount(), sys.getsizeof(doc.toHtml()), None))
+        return _mem_report(rows)
+
     def kanjidic_clicked(self, kanji=''):
         if kanji:
             self.show()
@@ -1276,6 +1140,12 @@ class jpMainWindow(QMainWindow):
 
     def kanjidic(self, kanji=''):
         if not self.kanji_dlg:
+            try:
+                from kanjidic import kdMainWindow
+            except Exception as e:
+                eprint('kanjidic.py:', e)
+                return
+            _startup_mark('kanjidic')
             self.kanji_dlg = kdMainWindow(parent=self)
             self.kanji_dlg.kanji_click.connect(self.kanjidic_clicked)
         self.kanji_dlg.showNormal()
@@ -1287,6 +1157,8 @@ class jpMainWindow(QMainWindow):
             re.compile(text, re.IGNORECASE)
             self.search_box.lineEdit().setStyleSheet(self.search_box_edit_style)
             self.search_box_edit_valid = True
+            if cfg['live_search']:
+                self.live_timer.start(cfg['live_delay'])
         except Exception as e:
             self.search_box.lineEdit().setStyleSheet('QLineEdit { background-color: #ffffd8; }');
             self.search_box_edit_valid = False
@@ -1296,48 +1168,18 @@ class jpMainWindow(QMainWindow):
         self.search_box.setCurrentIndex(-1)
         self.search_box.clearEditText()
 
-    TERM_END = r'(\(.+?\))?(;|$)'
-    def _search_apply_options(self, term, mode):
-        s_term = term
+    # opt: index of the selected Japanese (exact, start, end, any) or
+    # English (expression, word, any) search option, see edict.py
+    def _search_opt_buttons(self, mode):
         if mode == ScanMode.JAP:
-            s_term = kata2hira(s_term)
-            if self.japopt_exact.isChecked():
-                s_term = r'(^|;)' + s_term
-                s_term = s_term + self.TERM_END
-            elif self.japopt_start.isChecked():
-                s_term = r'(^|;)' + s_term
-            elif self.japopt_end.isChecked():
-                s_term = s_term + self.TERM_END
-        else:
-            if self.engopt_expr.isChecked():
-                s_term = r'\W( to)? ' + s_term + r'(\s+\(.*\))?;'
-            elif self.engopt_word.isChecked():
-                s_term = r'\b' + s_term + r'\b'
-        return s_term
+            return [self.japopt_exact, self.japopt_start, self.japopt_end, self.japopt_any]
+        return [self.engopt_expr, self.engopt_word, self.engopt_any]
 
-    def _search_relax(self, mode):
-        if mode == ScanMode.JAP:
-            if self.japopt_exact.isChecked():
-                self.japopt_start.setChecked(True);
-                return True
-            elif self.japopt_start.isChecked():
-                self.japopt_end.setChecked(True);
-                return True
-            elif self.japopt_end.isChecked():
-                self.japopt_any.setChecked(True);
-                return True
-        else:
-            if self.engopt_expr.isChecked():
-                self.engopt_word.setChecked(True);
-                return True
-            elif self.engopt_word.isChecked():
-                self.engopt_any.setChecked(True);
-                return True
-        return False
+    def _search_set_option(self, mode, opt):
+        self._search_opt_buttons(mode)[opt].setChecked(True)
 
     def _search_show_progress(self):
         self.result_group.setTitle(self.result_group.title() + '.')
-        QApplication.processEvents()
 
     def _search_show_dict_error(self, dname):
         mbox = QMessageBox(self)
@@ -1349,23 +1191,6 @@ class jpMainWindow(QMainWindow):
         mbox.hide()
         QApplication.processEvents()
 
-    def _search_deinflected(self, inflist, dic, mode, limit):
-        result = []
-        ok = True
-        for inf in inflist:
-            # perform lookup for the infinitive form
-            s_term = r'(^|;)' + inf.infi + self.TERM_END
-            res, ok = _dict_lookup(dic, s_term, mode, limit)
-            # keep only results belonging to a suitable word class and
-            # attach the inflection info; reject everything else
-            for r in res:
-                if inf.wclass.search(r.gloss):
-                    result.append(EntryEx(r.headword, r.reading, r.gloss, inf))
-                    limit -= 1
-            if limit <= 0 or not ok:
-                break
-        return result, ok
-
     def search(self):
         self.search_box.setFocus()
         # validate input
@@ -1384,71 +1209,128 @@ class jpMainWindow(QMainWindow):
                 break
         self.search_box.insertItem(0, term)
         self.search_box.setCurrentIndex(0)
-        # convert Romaji
-        if self.search_romaji.isChecked():
-            term = alphabet2kana(term)
-        # convert Katakana to Hiragana
-        term = kata2hira(term)
-        # result limiting
-        slimit = self.genopt_limit.value() if self.genopt_limit.isEnabled() else cfg['hardlimit']
-        limit = slimit
-        # search
+        self.live_timer.stop()
+        self._search_submit(term, log=True)
+
+    # search while typing: leave search box and history alone, and skip
+    # terms just searched for
+    def live_search(self):
+        term = self.search_box.currentText().strip()
+        if len(term) < 1 or not self.search_box_edit_valid or term == self.search_term:
+            return
+        self.result_pane.setEnabled(False)
+        self._search_submit(term)
+
+    def _search_submit(self, term, log=False):
+        self.search_term = term
+        job = self._search_job(term)
+        if log and _qlog_active():
+            job.log = (term, self.search_romaji.isChecked())
+        # supersede running search
+        self._search_abort()
+        self.search_job = job
+        def current(slot):
+            return lambda *args: slot(*args) if job is self.search_job else None
+        job.title.connect(current(self.result_group.setTitle))
+        job.progress.connect(current(self._search_show_progress))
+        job.dict_error.connect(current(self._search_show_dict_error))
+        job.relaxed.connect(current(self._search_set_option))
+        job.notice.connect(current(self.result_pane.setPlainText))
+        job.result.connect(current(lambda html: self._search_done(html, job)))
         self.result_group.setTitle('Search results: ...')
-        QApplication.processEvents()
-        mode = ScanMode.JAP if _has_jap(term) else ScanMode.ENG
+        threading.Thread(target=self._search_work, args=(job,), daemon=True).start()
+
+    # collect search parameters, the worker must not touch any widgets
+    def _search_job(self, term):
+        term, mode = _search_term(term, self.search_romaji.isChecked())
+        opts = [b.isChecked() for b in self._search_opt_buttons(mode)]
+        opt = opts.index(True) if True in opts else len(opts) - 1
         if self.genopt_dict.isChecked():
             dics = [[self.genopt_dictsel.currentText(), self.genopt_dictsel.itemData(self.genopt_dictsel.currentIndex())]]
         else:
             dics = cfg['dicts']
-        result = []
-        # de-inflect verb
-        inflist = []
-        if cfg['deinflect'] and mode == ScanMode.JAP and _vconj_loaded:
-            inflist = _vconj_deinflect(term)
-        # perform lookup
-        rdiff = 0
-        for d in dics:
-            ok = True
-            # add dictionary caption
-            if len(dics) > 1:
-                result.append(Entry('#', '', d[0]))
-                rdiff += 1
-            # search de-inflected verbs
-            if len(inflist) > 0:
-                r, ok = self._search_deinflected(inflist, d[1], mode, limit)
-                self._search_show_progress()
-                result.extend(r)
-                limit -= len(r)
-                if limit <= 0:
-                    break
-                if not ok:
-                    self._search_show_dict_error(d[0])
-                    continue
-            # 'normal' search
-            rlen = len(result)
-            while ok:
-                s_term = self._search_apply_options(term, mode)
-                r, ok = _dict_lookup(d[1], s_term, mode, limit)
-                self._search_show_progress()
-                result.extend(r)
-                limit -= len(r)
-                if not ok:
-                    self._search_show_dict_error(d[0])
-                # relax search options
-                if limit <= 0 or len(result) != rlen \
-                   or not self.genopt_auto.isChecked() \
-                   or not self._search_relax(mode):
-                        break;
-            if limit <= 0:
-                break
+        slimit = self.genopt_limit.value() if self.genopt_limit.isEnabled() else cfg['hardlimit']
+        return searchJob(term, mode, opt, dics, slimit, self.genopt_auto.isChecked(), self.dict_loader)
+
+    # answer lookups on the server socket, showing requested ones in the
+    # window; see edict.py
+    def _server_start(self):
+        self.server_show.connect(self._server_show)
+        try:
+            self.server = lookupServer(_server_sock_path(), show=self.server_show.emit, wait=self.dict_loader.wait)
+        except Exception as e:
+            eprint('_server_start:', str(e))
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _server_show(self, req):
+        if 'kanji' in req:
+            self.kanjidic(req['kanji'])
+            return
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_box.setCurrentText(req['word'])
+        self.search()
+
+    # fill the query cache with the lookups for the history entries
+    def _search_prewarm(self):
+        jobs = [self._search_job(h) for h in cfg['history'] if h.strip()]
+        def prewarm():
+            for job in jobs:
+                inflist = _search_inflections(job)
+                for d in job.dics:
+                    _search_dict(job, d, inflist, job.limit)
+        threading.Thread(target=prewarm, daemon=True).start()
+
+    def _search_abort(self):
+        if self.search_job:
+            self.search_job.cancelled.set()
+            self.search_job = None
+
+    def search_cancel(self):
+        if self.search_job:
+            self._search_abort()
+            self.result_group.setTitle('Search results: cancelled')
+            self.result_pane.setEnabled(True)
+
+    def _search_done(self, html, job=None):
+        self.search_job = None
+        t = time.perf_counter()
+        self.result_pane.setHtml(html)
+        self.result_pane.setEnabled(True)
+        if job and job.stats:
+            job.stats.add_time('set_html', time.perf_counter() - t)
+            self.statusBar().showMessage(job.stats.summary())
+            _stats_write('word', self.search_term, job.stats)
+
+    def _search_work(self, job):
+        try:
+            self._search_run(job)
+        except Exception as e:
+            eprint('_search_run:', str(e))
+            job.title.emit('Search results: error')
+            job.result.emit('')
+
+    # search worker, runs on its own thread and reports through the
+    # signals of job; stops early once job gets cancelled
+    def _search_run(self, job):
+        term = job.term
+        mode = job.mode
+        slimit = job.limit
+        if cfg['dict_load'] and self.dict_loader.pending([d[1] for d in job.dics]):
+            job.title.emit('Search results: loading dictionaries ...')
+        result = _search_lookup(job)
+        if result is None:
+            return
+        t_render = time.perf_counter()
+        rdiff = sum(1 for r in result if r.headword == '#')
         # report results
         rlen = len(result)
-        self.result_group.setTitle('Search results: %d%s' % (rlen - rdiff, '+' if (rlen-rdiff)>=slimit else ''))
-        QApplication.processEvents()
+        job.title.emit('Search results: %d%s' % (rlen - rdiff, '+' if (rlen-rdiff)>=slimit else ''))
         # format result
         if rlen > cfg['hardlimit'] / 2:
-            self.result_pane.setPlainText('Formatting...')
-            QApplication.processEvents()
+            job.notice.emit('Formatting...')
         re_term = re.compile(term, re.IGNORECASE)
         re_entity = re.compile(r'EntL\d+X?; *$', re.IGNORECASE)
         re_mark = re.compile(r'(\(.+?\))')
@@ -1466,6 +1348,8 @@ class jpMainWindow(QMainWindow):
             hlw.append(word[start:])
             return ''.join(hlw)
         for idx, res in enumerate(result):
+            if job.cancelled.is_set():
+                return
             # handle dictionary caption
             if res.headword == '#':
                 html[idx+1] = '<p>Matches in <span style="color:#bc3031;">%s</span>:</p>' % res.gloss
@@ -1494,83 +1378,14 @@ class jpMainWindow(QMainWindow):
             # assemble display line
             html[idx+1] = '<p>%s%s%s</span>%s %s</p>\n' % (verb_message, lfmt, headword, reading, gloss)
         html[rlen + 1] = '</div>'
-        self.result_pane.setHtml(''.join(html))
-        self.result_pane.setEnabled(True)
-
-
-############################################################
-# dictionary load and lookup
-#
-# edict example lines:
-# 〆日 [しめび] /(n) time limit/closing day/settlement day (payment)/deadline/
-# ハート /(n) heart/(P)/
-
-Entry = namedtuple('Entry', 'headword reading gloss')
-EntryEx = namedtuple('EntryEx', 'headword reading gloss inf')
-
-_dict_lookup = None
-
-_dict = {}      # format: { 'filename_1': [Entry_0, ...], ... }
-
-def _dict_split_line(line):
-    # manually splitting the line is actually faster than regex
-    try:
-        p1 = line.split('[', 1)
-        if len(p1) < 2:
-            p1 = line.split('/', 1)
-            p2 = ['', p1[1]]
-        else:
-            p2 = p1[1].split(']', 1)
-        headword = p1[0].strip()
-        reading = p2[0].strip()
-        gloss = ' ' + p2[1].lstrip('/ ').rstrip(' \t\r\n').replace('/', '; ')
-    except Exception as e:
-        eprint('malformed line:', line, ':', str(e))
-        headword = reading = gloss = ''
-    return Entry(headword, reading, gloss)
-
-def _dict_load(dict_fname):
-    dic = _dict.get(dict_fname, [])
-    if not dic:
-        try:
-            with open(dict_fname) as dict_file:
-                for line in dict_file:
-                    entry = _dict_split_line(line)
-                    if entry.headword:
-                        dic.append(entry)
-            _dict[dict_fname] = dic
-        except Exception as e:
-            eprint('_dict_load:', dict_fname, str(e))
-    return dic
-
-def _dict_matches(dic, pattern, mode, limit):
-    result = []
-    cnt = 0
-    re_pattern = re.compile(pattern, re.IGNORECASE)
-    for entry in dic:
-        if (mode == ScanMode.JAP and (re_pattern.search(kata2hira(entry.headword)) \
-                                   or re_pattern.search(kata2hira(entry.reading)))) \
-        or (mode == ScanMode.ENG and re_pattern.search(entry.gloss)):
-            result.append(entry)
-            cnt += 1
-            if limit and cnt >= limit:
-                break
-    return result
-
-def _dict_lookup_load(dict_fname, pattern, mode, limit=0):
-    dic = _dict_load(dict_fname)
-    if dic:
-        return _dict_matches(dic, pattern, mode, limit), True
-    return [], False
-
-def _dict_lookup_noload(dict_fname, pattern, mode, limit=0):
-    try:
-        with open(dict_fname) as dict_file:
-            dic = map(_dict_split_line, dict_file)
-            return _dict_matches(dic, pattern, mode, limit), True
-    except Exception as e:
-        eprint('_dict_lookup_noload:', dict_fname, str(e))
-    return [], False
+        html = ''.join(html)
+        # record before emitting, _search_done() reports the stats
+        if job.stats:
+            job.stats.add_time('format', time.perf_counter() - t_render)
+        job.result.emit(html)
+        if job.log:
+            _qlog_word(job, job.log[0], job.log[1], rlen - rdiff,
+                       dict(job.timing, render=time.perf_counter() - t_render))
 
 
 ############################################################
@@ -1588,18 +1403,41 @@ def _parse_cmdline():
     parser.add_argument('-v', '--clip-word', action='count', help='look up word from clipboard')
     parser.add_argument('-l', '--kanji-lookup', metavar='KANJI', help='look up KANJI in kanji dictionary')
     parser.add_argument('-w', '--word-lookup', metavar='WORD', help='look up WORD in word dictionary')
+    parser.add_argument('--rebuild-cache', action='count', help='rebuild cache for all configured dictionaries and exit')
+    parser.add_argument('--server', action='count', help='answer lookups from edict.py clients, see README')
+    parser.add_argument('--query-log', metavar='FILE', help='append searches to FILE, see README')
+    parser.add_argument('--search-stats', metavar='FILE', nargs='?', const='', help='show search statistics, and append them to FILE')
+    parser.add_argument('--profile-startup', action='count', help='print start-up time per phase once the window is up and exit')
     return parser.parse_args()
 
+# print time spent per start-up phase since the script started
+def _startup_report():
+    _startup_mark('event loop')
+    t0 = prev = _startup[0][1]
+    eprint('%-12s %9s %9s' % ('phase', 'ms', 'total'))
+    for phase, t in _startup[1:]:
+        eprint('%-12s %9.1f %9.1f' % (phase, (t - prev) * 1000, (t - t0) * 1000))
+        prev = t
+
 def main():
     global app
     _load_cfg()
-    _vconj_load()
     cl_args = _parse_cmdline()
+    if cl_args.rebuild_cache:
+        die(0 if _dict_cache_rebuild() else 1)
+    _qlog_open(cl_args.query_log or cfg['query_log'])
+    _stats_setup(cl_args.search_stats if cl_args.search_stats is not None else os.environ.get('JITENPAI_SEARCH_STATS'))
+    _startup_mark('config')
     # set up window
     os.environ['QT_LOGGING_RULES'] = 'qt5ct.debug=false'
     app = QApplication(sys.argv)
     app.setApplicationName(_JITENPAI_NAME)
+    _startup_mark('QApplication')
     root = jpMainWindow(title=_JITENPAI_NAME + ' ' + _JITENPAI_VERSION, cl_args=cl_args)
+    _startup_mark('window')
+    if cl_args.profile_startup:
+        # runs once pending events, i.e. the first paint, are processed
+        QTimer.singleShot(0, lambda: (_startup_report(), die()))
     die(app.exec_())
 
 # run application
@@ -21,17 +21,20 @@ import os
 import re
 import json
 import base64
+import time
 from argparse import ArgumentParser, RawTextHelpFormatter
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 
+from edict import (
+    _qlog_open, _qlog_active, _qlog_write, _stats_new, _stats_write,
+    _srad, _rad_load, _k2rad, _kanjidic_load, _kanjidic_lookup, _kanjidic_search,
+)
+
 
 _KANJIDIC_VERSION = '0.1.0'
 _KANJIDIC_NAME = 'KanjiDic'
-_KANJIDIC_DIR = 'jiten-pai'
-_KANJIDIC_RADK = ['radkfile.utf8', 'radkfile2.utf8']
-_KANJIDIC_KRAD = ['kradfile.utf8', 'kradfile2.utf8']
 
 _JITENPAI_CFG = 'jiten-pai.conf'
 
@@ -54,22 +57,6 @@ _re_kanji = re.compile('^[' + _u_CJK_Uni + ']$')
 def _is_kanji(s):
     return _re_kanji.match(s)
 
-# try to locate a data file in some common prefixes:
-def _get_dfile_path(fname, mode=os.R_OK):
-    cdirs = []
-    if os.environ.get('APPDATA'):
-        cdirs.append(os.environ.get('APPDATA'))
-    if os.environ.get('HOME'):
-        cdirs.append(os.path.join(os.environ.get('HOME'), '.local/share'))
-    cdirs.append('/usr/local/share')
-    cdirs.append('/usr/share')
-    cdirs.append(os.path.dirname(os.path.realpath(__file__)))
-    for d in cdirs:
-        path = os.path.join(d, fname)
-        if os.access(path, mode):
-            return path
-    return fname
-
 
 ############################################################
 # configuration
@@ -111,260 +98,6 @@ def _load_cfg():
         eprint('_load_cfg:', cfname, str(e))
 
 
-############################################################
-# kanji <--> radical cross-reference
-
-_srad = [''] * 20   # format: [ stroke_cnt -> 'radical_list' ]
-_radk = dict()      # format: { 'radical': [stroke_cnt, 'kanji_list'], ... }
-_krad = dict()      # format: { 'kanji': 'radical_list', ... }
-
-def _rad_load(version):
-    for x in range(len(_srad)):
-        _srad[x] = ''
-    _radk.clear()
-    _krad.clear()
-    res = True
-    for v in range(version):
-        radk_name = _KANJIDIC_RADK[v]
-        if not os.access(radk_name, os.R_OK):
-            radk_name = _get_dfile_path(os.path.join(_KANJIDIC_DIR, radk_name), mode=os.R_OK)
-        try:
-            with open(radk_name) as radk_file:
-                re_radic = re.compile(r'^\$\s+(.)\s+(\d+)')
-                re_kanji = re.compile(r'^([^#$]\S*)')
-                radical = '?'
-                for line in radk_file:
-                    m = re_kanji.search(line)
-                    if m:
-                        _radk[radical][1] += m.group(1)
-                        continue
-                    m = re_radic.search(line)
-                    if m:
-                        radical = m.group(1)
-                        if radical not in _radk:
-                            stroke = int(m.group(2))
-                            _radk[radical] = [stroke, '']
-                            _srad[stroke] += radical
-        except Exception as e:
-            eprint('_rad_load:', radk_name, str(e))
-            res = False
-    for v in range(version):
-        krad_name = _KANJIDIC_KRAD[v]
-        if not os.access(krad_name, os.R_OK):
-            krad_name = _get_dfile_path(os.path.join(_KANJIDIC_DIR, krad_name), mode=os.R_OK)
-        try:
-            with open(krad_name) as krad_file:
-                re_krad = re.compile(r'^([^#\s]) : (.+)$')
-                for line in krad_file:
-                    m = re_krad.search(line)
-                    if m:
-                        _krad[m.group(1)] = m.group(2).replace(' ', '')
-        except Exception as e:
-            eprint('_rad_load:', krad_name, str(e))
-            res = False
-    return res
-
-def _rad2k(rad):
-    try:
-        return _radk[rad]
-    except:
-        return ['', '']
-
-def _k2rad(kanji):
-    try:
-        return _krad[kanji]
-    except:
-        return ''
-
-# load kanjidic
-# See: http://www.edrdg.org/kanjidic/kanjidic_doc_legacy.html#IREF02
-#
-# kanjidic1 example lines:
-#
-# 心 3F34 U5fc3 B61 G2 S4 XJ13D38 F157 J3 N1645 V1780 H11 DP11 DK4 DL4 L595
-# DN639 K139 O49 DO80 MN10295 MP4.0937 E147 IN97 DA97 DS95 DF172 DH164 DT96
-# DC64 DJ172 DB2.14 DG766 DM602 P1-1-3 I4k0.1 Q3300.0 DR358 ZPP4-4-4 Yxin1
-# Wsim シン こころ -ごころ T2 りっしんべん {heart} {mind} {spirit} {heart radical (no. 61)}
-#
-# 逢 3029 U9022 B162 G9 S10 S9 S11 F2116 N4694 V6054 DP4002 DL2774 L2417
-# DN2497 O1516 MN38901X MP11.0075 P3-3-7 I2q7.15 Q3730.4 DR2555 ZRP3-4-7
-# Yfeng2 Wbong ホウ あ.う むか.える T1 あい おう {meeting} {tryst} {date} {rendezvous}
-#
-# 挨 3027 U6328 B64 G8 S10 F2258 N1910 V2160 DP510 DL383 L2248 DN1310 MN12082
-# MP5.0229 DA1101 P1-3-7 I3c7.12 Q5303.4 DR1363 Yai1 Yai2 Wae アイ ひら.く
-# {approach} {draw near} {push open}
-
-_kanjidic = dict()     # format: { 'kanji': {info}, ...}
-
-def _kanjidic1_load(dict_fname):
-    ktable = [
-        ['F', 'freq'],
-        ['G', 'grade'],
-        ['S', 'strokes'],
-        ['W', 'r_korean'],
-        ['Y', 'r_pinyin'],
-    ]
-    re_braces = re.compile(r'\{.*\}.*$')
-    re_tags = re.compile(r'[BCFGJHNVDPSUIQMEKLOWYXZ]\S+')
-    krad_set = 1
-    try:
-        with open(dict_fname) as dict_file:
-            for line in dict_file:
-                if line[0] in '# ':
-                    if 'KANJD212' in line:
-                        krad_set = 2
-                    continue
-                info = {
-                    'strokes': '',
-                    'readings': '',
-                    'r_korean': '',
-                    'r_pinyin': '',
-                    'meaning': '',
-                    'freq': '',
-                    'grade': '',
-                }
-                kanji = line[0]
-                # skip kanji and JIS code
-                line = line[6:]
-                # save meaning
-                m = re_braces.search(line)
-                if m:
-                    info['meaning'] = m.group(0).replace('{', '').replace('}', ';').strip()
-                    line = re_braces.sub('', line)
-                # get tags
-                tlist = []
-                while True:
-                    m = re_tags.search(line)
-                    if m is None:
-                        break;
-                    tlist.append(m.group(0))
-                    line = re_tags.sub('', line, 1)
-                for t in tlist:
-                    for k in ktable:
-                        # if a tag appears more than once the first one wins,
-                        # e.g. 'S<num>' (stroke count)
-                        if t[:len(k[0])] == k[0] and not info[k[1]]:
-                            info[k[1]] = t[len(k[0]):]
-                            break
-                # get readings (i.e. all that's left)
-                info['readings'] = line.strip().replace(' ', ', ').replace('T2,', 'T2').replace('T1,', 'T1')
-                _kanjidic[kanji] = info
-    except Exception as e:
-        eprint('_kanjidic1_load:', dict_fname, str(e))
-        return False, 0, 0
-    return True, 1, krad_set
-
-# load kanjidic2.xml
-# See: http://www.edrdg.org/wiki/index.php/KANJIDIC_Project#Content_.26_Format
-
-import xml.etree.ElementTree as ET
-
-def _kanjidic2_load(dict_fname):
-    try:
-        for char in ET.parse(dict_fname).iterfind('character'):
-            kanji = char.find('literal').text
-            info = {
-                'strokes': '',
-                'readings': '',
-                'r_korean': '',
-                'r_pinyin': '',
-                'meaning': '',
-                'freq': '',
-                'grade': '',
-            }
-            misc = char.find('misc')
-            for strokes in misc.findall('stroke_count'):
-                info['strokes'] = strokes.text
-                break
-            for freq in misc.findall('freq'):
-                info['freq'] = freq.text
-                break
-            for grade in misc.findall('grade'):
-                info['grade'] = grade.text
-                break
-            rm = char.find('reading_meaning')
-            if rm:
-                rm_group = rm.find('rmgroup')
-                for rd in rm_group.findall('reading'):
-                    r_type = rd.attrib['r_type']
-                    if r_type == 'korean_r':
-                        info['r_korean'] = rd.text
-                    elif r_type == 'pinyin':
-                        info['r_pinyin'] = rd.text
-                    elif r_type[:3] == 'ja_':
-                        info['readings'] += '%s, ' % rd.text
-                for m in rm_group.findall('meaning'):
-                    if m.attrib.get('m_lang', 'en') == 'en':
-                        info['meaning'] += '%s; ' % m.text
-                nanori = ''
-                for n in rm.findall('nanori'):
-                    nanori += '%s, ' % n.text
-                if nanori:
-                    info['readings'] += 'T1 %s' % nanori
-            rad_name = ''
-            for n in misc.findall('rad_name'):
-                rad_name +=  '%s, ' % n.text
-            if rad_name:
-                info['readings'] += 'T2 %s' % rad_name
-            info['readings'] = info['readings'].rstrip(', ')
-            _kanjidic[kanji] = info
-    except Exception as e:
-        eprint('_kanjidic2_load:', dict_fname, str(e))
-        return False, 0, 0
-    return True, 2, 2
-
-def _kanjidic_load(dict_fname):
-    _kanjidic.clear()
-    tag_line = ''
-    try:
-        with open(dict_fname) as f:
-            tag_line = f.readline()
-        if '<?xml' in tag_line:
-            return _kanjidic2_load(dict_fname)
-        return _kanjidic1_load(dict_fname)
-    except Exception as e:
-        eprint('_kanjidic_load:', dict_fname, str(e))
-    return False, 0, 0
-
-def _kanjidic_lookup(kanji):
-    try:
-        kanji = kanji[0]
-        res = {
-            'kanji': kanji,
-            'radicals': _k2rad(kanji),
-        }
-        res.update(_kanjidic[kanji])
-    except:
-        res = {}
-    return res
-
-def _kanjidic_full_text_search(dict_fname, text):
-    kanji = ''
-    try:
-        with open(dict_fname) as dict_file:
-            for line in dict_file:
-                if line[0] in '# ':
-                    continue
-                if text in line.lower():
-                    kanji += line[0]
-    except Exception as e:
-        eprint('_kanjidic_full_text_search:', dict_fname, str(e))
-    return kanji
-
-def _s2kanji(min_strokes, max_strokes=-1):
-    if max_strokes < 0:
-        max_strokes = min_strokes
-    res = ''
-    for k, v in _kanjidic.items():
-        try:
-            s = int(v['strokes'])
-        except:
-            continue
-        if min_strokes <= s <= max_strokes:
-            res += k
-    return res
-
-
 ############################################################
 # Icons
 
@@ -765,6 +498,7 @@ class kdMainWindow(QDialog):
 
     def init_cfg(self):
         _load_cfg()
+        _qlog_open(cfg.get('query_log'))
 
     def init_ui(self, title=''):
         jpIcon()
@@ -894,6 +628,10 @@ class kdMainWindow(QDialog):
         main_layout.addWidget(self.opt_group, 1)
         main_layout.addSpacing(5)
         main_layout.addWidget(splitter, 999)
+        # search statistics, see edict.py
+        self.stats_label = QLabel()
+        self.stats_label.setVisible(_stats_new() is not None)
+        main_layout.addWidget(self.stats_label)
         # initialize search options
         self.stroke_search_check.toggled.connect(self.stroke_search_toggle)
         self.stroke_search_num.valueChanged.connect(self.update_search)
@@ -1015,13 +753,13 @@ class kdMainWindow(QDialog):
         self.show_info(btn.text())
 
     def update_search(self, save_rad_hist=False, save_text_hist=False):
-        sets = []
-        # add kanji set based on stroke count
+        # stroke count range
+        strokes = None
         if self.stroke_search_check.isChecked():
-            strokes = self.stroke_search_num.value()
+            num = self.stroke_search_num.value()
             tolerance = self.stroke_search_tol.value()
-            sets.append(set(_s2kanji(strokes - tolerance, strokes + tolerance)))
-        # add kanji set for each radical
+            strokes = (num - tolerance, num + tolerance)
+        # radicals
         rads = ''
         if self.rad_search_check.isChecked():
             rads = self.rad_search_box.currentText().strip()
@@ -1035,12 +773,10 @@ class kdMainWindow(QDialog):
                             break
                     self.rad_search_box.insertItem(0, rads)
                     self.rad_search_box.setCurrentIndex(0)
-                # add sets
-                for rad in rads:
-                    sets.append(set(_rad2k(rad)[1]))
-        # add kanji set based on full text search
+        # full text search
+        text = raw_text = ''
         if self.text_search_check.isChecked():
-            text = self.text_search_box.currentText().strip()
+            text = raw_text = self.text_search_box.currentText().strip()
             if len(text):
                 # save to history
                 text = text.lower()
@@ -1053,14 +789,9 @@ class kdMainWindow(QDialog):
                     self.text_search_box.setCurrentIndex(0)
                 else:
                     self.text_search_box.setCurrentText(text)
-                # add set
-                sets.append(set(_kanjidic_full_text_search(cfg['kanjidic'], text)))
-        # get intersection of all kanji sets
-        res = {}
-        if len(sets) > 0:
-            res = sets[0]
-            for s in sets[1:]:
-                res = res.intersection(s)
+        timing = {}
+        res = _kanjidic_search(cfg['kanjidic'], strokes, rads, text, timing)
+        t_render = time.perf_counter()
         # update search results pane
         self.result_group.setTitle('Search Results: %d' % len(res))
         self.result_area.clear()
@@ -1073,13 +804,27 @@ class kdMainWindow(QDialog):
             tiles.append(btn)
             if self.radlist:
                 av_rads += _k2rad(r)
+        t_fill = time.perf_counter()
         self.result_area.fill(tiles)
+        t_sort = time.perf_counter()
         self.sort_results()
+        t_done = time.perf_counter()
+        st = _stats_new()
+        if st:
+            st.timing.update(timing)
+            st.timing.update({'tiles': t_fill - t_render, 'fill': t_sort - t_fill, 'sort': t_done - t_sort})
+            st.add('results', len(res))
+            self.stats_label.setText(st.summary())
+            _stats_write('kanji_search', raw_text or rads, st)
         if len(res) == 1:
             self.show_info(list(res)[0])
         # update list of possible radicals
         if self.radlist:
             self.radlist.set_avail(set(av_rads) if rads or av_rads else None)
+        if _qlog_active():
+            timing['render'] = time.perf_counter() - t_render
+            options = {'strokes': strokes, 'radicals': rads, 'text': text}
+            _qlog_write('kanji_search', raw_text or rads, options, text, [cfg['kanjidic']], len(res), timing)
 
     def sort_results(self):
         if self.sort_check.isChecked():
@@ -1105,7 +850,9 @@ class kdMainWindow(QDialog):
             while self.info_hist.widget().layout().takeAt(int(cfg['max_hist'])):
                 pass
         info = ['']
+        t_lookup = time.perf_counter()
         res = _kanjidic_lookup(kanji)
+        t_render = time.perf_counter()
         nfmt = '<div style="font-family:%s;font-size:%.1fpt">' % (cfg['nfont'], cfg['nfont_sz'])
         lfmt = '<span style="font-family:%s;font-size:%.1fpt;">' % (cfg['lfont'], cfg['lfont_sz'])
         hlfmt = '<span style="color:%s;">' % cfg['hl_col']
@@ -1135,6 +882,9 @@ class kdMainWindow(QDialog):
             info.append(line)
         info.append('</div>')
         self.info_pane.setHtml(''.join(info))
+        if kanji and _qlog_active():
+            timing = {'lookup': t_render - t_lookup, 'render': time.perf_counter() - t_render}
+            _qlog_write('kanji_info', kanji, {}, kanji, [cfg['kanjidic']], 1 if res else 0, timing)
 
 
 ############################################################
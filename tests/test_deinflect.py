@@ -0,0 +1,83 @@
+"""
+Rule based de-inflection versus the inflected form index (cfg['inflect_index']).
+"""
+
+import os
+import sys
+import unittest
+
+_TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _TOP)
+
+import edict
+
+_SAMPLE = os.path.join(_TOP, 'tests', 'edict_sample.utf8')
+
+# format: { 'inflected form': 'dictionary form', ... }
+_SINGLE = {
+    '食べた': '食べる',
+    '見ない': '見る',
+    '書いて': '書く',
+    '行った': '行く',
+    '買った': '買う',
+    '読みます': '読む',
+    '高かった': '高い',
+    '寒くない': '寒い',
+}
+_CHAINED = {
+    '食べさせられなかった': '食べる',
+    '行きたくなかった': '行く',
+    '読まれた': '読む',
+    '書かせられない': '書く',
+}
+# the VCONJ rules have no entries for する
+_IRREGULAR = {
+    '来た': '来る',
+    '来ます': '来る',
+    '来なかった': '来る',
+}
+
+
+def setUpModule():
+    edict._JITENPAI_VCONJ = os.path.join(_TOP, 'vconj.utf8')
+    edict.cfg.update({
+        'dict_load': True, 'dict_cache': False, 'query_cache': 0, 'deinflect': True,
+    })
+    assert edict._vconj_ready()
+
+
+# de-inflected results of a search for term, format: { (headword, infi), ... }
+def _deinflected(term, inflect_index):
+    edict.cfg['inflect_index'] = inflect_index
+    edict._dict_set_load(False)
+    edict._dict_set_load(True)
+    job = edict.lookupJob(term, edict.ScanMode.JAP, 0, [['sample', _SAMPLE]], 100, False)
+    return {(r.headword, r.inf.infi) for r in edict._search_lookup(job) if len(r) > 3}
+
+
+class deinflectTest(unittest.TestCase):
+    def check(self, cases):
+        for term, infi in cases.items():
+            with self.subTest(term=term):
+                rules = _deinflected(term, False)
+                index = _deinflected(term, True)
+                self.assertIn(_SAMPLE, edict._dict_iidx)
+                self.assertIn(infi, {i for _, i in rules})
+                self.assertEqual({h for h, _ in index}, {h for h, _ in rules})
+
+    def test_single(self):
+        self.check(_SINGLE)
+
+    def test_chained(self):
+        self.check(_CHAINED)
+
+    def test_irregular(self):
+        self.check(_IRREGULAR)
+
+    def test_no_nonsense_chains(self):
+        # passive, then adj. -> adverb: かれる -> く -> い
+        self.assertNotIn('い', [inf.infi for inf in edict._vconj_deinflect('かれる')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Dictionary lookups, with and without loading the dictionary, versus a
+plain regex scan of the dictionary file.
+"""
+
+import os
+import re
+import sys
+import unittest
+
+_TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _TOP)
+
+import edict
+
+_SAMPLE = os.path.join(_TOP, 'tests', 'edict_sample.utf8')
+
+# terms are searched in this order, so later ones may be narrowed down
+# from the results of earlier ones
+_JAP_TERMS = [
+    'ほ', 'ほん', 'ほんと', 'にほん', '日本', '本', 'ね', 'ねこ', '猫',
+    'い', 'く', 'かたかな', 'カタカナ', 'ﾊｰﾄ', 'あめ', '日.', 'し|ほ', '〆',
+]
+_ENG_TERMS = [
+    'h', 'he', 'heart', 'to', 'to eat', 'to go', 'cat', 'day', 'a',
+    'Japan', 'JAPANESE', 'cd', 'e.g.', r'\(organ\)', 'rain|candy',
+]
+_LIMITS = [0, 1, 2, 5]
+
+
+def setUpModule():
+    edict.cfg.update({'dict_cache': False, 'query_cache': 0})
+
+
+def tearDownModule():
+    edict._dict_set_load(False)
+
+
+# reference result: all entries of the file, in file order, with a
+# headword or reading (Japanese) or gloss (English) matching pattern
+def _scan(pattern, mode, limit):
+    rx = re.compile(edict._norm_pattern(pattern))
+    result = []
+    with open(_SAMPLE) as f:
+        for line in f:
+            entry = edict._dict_split_line(line)
+            if not entry.headword:
+                continue
+            fields = entry[:2] if mode == edict.ScanMode.JAP else entry[2:]
+            if any(rx.search(edict._norm_key(s)) for s in fields):
+                result.append(tuple(entry))
+    return result[:limit] if limit else result
+
+
+class lookupTest(unittest.TestCase):
+    def check(self, lookup, mode, terms, nopt):
+        for limit in _LIMITS:
+            for opt in range(nopt):
+                for term in terms:
+                    pattern = edict._search_apply_options(term, mode, opt)
+                    with self.subTest(term=term, opt=opt, limit=limit):
+                        result, ok = lookup(_SAMPLE, pattern, mode, limit)
+                        self.assertTrue(ok)
+                        self.assertEqual([tuple(e) for e in result], _scan(pattern, mode, limit))
+
+    def test_load_jap(self):
+        edict._dict_set_load(True)
+        self.check(edict._dict_lookup_load, edict.ScanMode.JAP, _JAP_TERMS, 4)
+
+    def test_load_eng(self):
+        edict._dict_set_load(True)
+        self.check(edict._dict_lookup_load, edict.ScanMode.ENG, _ENG_TERMS, 3)
+
+    def test_noload_jap(self):
+        edict._dict_set_load(False)
+        self.check(edict._dict_lookup_noload, edict.ScanMode.JAP, _JAP_TERMS, 4)
+
+    def test_noload_eng(self):
+        edict._dict_set_load(False)
+        self.check(edict._dict_lookup_noload, edict.ScanMode.ENG, _ENG_TERMS, 3)
+
+    def test_reference_matches(self):
+        # guard against a vacuous comparison
+        start = edict._search_apply_options('ほん', edict.ScanMode.JAP, 1)
+        self.assertEqual([e[0] for e in _scan(start, edict.ScanMode.JAP, 0)], ['本', '本当'])
+        word = edict._search_apply_options('heart', edict.ScanMode.ENG, 1)
+        self.assertEqual(len(_scan(word, edict.ScanMode.ENG, 0)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()